@@ -0,0 +1,42 @@
+"""Add user cache NOTIFY triggers
+
+Revision ID: b3e8f1d6a275
+Revises: a4d7e2c9f153
+Create Date: 2026-10-19 20:41:17.093518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f1d6a275'
+down_revision = 'a4d7e2c9f153'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tells every worker's app.core.user_cache listener which users changed.
+    # Delivered on commit, and once per user and transaction.
+    op.execute("""
+        CREATE FUNCTION user_cache_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('user_cache', id::text) FROM changed_rows;
+            RETURN NULL;
+        END $$
+    """)
+    for event in ('UPDATE', 'DELETE'):
+        op.execute(f"""
+            CREATE TRIGGER user_cache_{event.lower()}
+            AFTER {event} ON "user"
+            REFERENCING OLD TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION user_cache_notify()
+        """)
+
+
+def downgrade():
+    for event in ('update', 'delete'):
+        op.execute(f'DROP TRIGGER user_cache_{event} ON "user"')
+    op.execute('DROP FUNCTION user_cache_notify()')
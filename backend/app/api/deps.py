@@ -1,16 +1,21 @@
-from collections.abc import Generator
+import uuid
+from collections.abc import AsyncGenerator, Generator
+from dataclasses import dataclass
 from typing import Annotated
 
-import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import async_engine, engine
+from app.core.replicas import WriteTrackingSession, replica_router
+from app.core.revocations import revocations
+from app.core.user_cache import user_cache
 from app.models import TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
@@ -19,39 +24,107 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 
 def get_db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+    # Objects written by the request are returned as they are, without a
+    # SELECT to reload them after the commit
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Not expiring on commit, loading expired attributes lazily would need
+    # an await the response serialization can't do
+    async with AsyncSession(
+        async_engine, expire_on_commit=False, sync_session_class=WriteTrackingSession
+    ) as session:
         yield session
 
 
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+def get_token_data(token: TokenDep) -> TokenPayload:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
+        return security.decode_access_token(token)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+
+
+TokenDataDep = Annotated[TokenPayload, Depends(get_token_data)]
+
+
+async def get_current_user(session: AsyncSessionDep, token_data: TokenDataDep) -> User:
+    user = await user_cache.get(session, token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    # Writes of the request keep the user's next reads on the primary
+    session.info["user_id"] = user.id
     return user
 
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
+@dataclass(frozen=True)
+class AuthorizedUser:
+    id: uuid.UUID
+    is_superuser: bool
+
+
+async def get_authorized_user(
+    session: AsyncSessionDep, token_data: TokenDataDep
+) -> AuthorizedUser:
+    """
+    The token's user for read-only routes. From the token's claims when it
+    has them and the user wasn't revoked since, without a query, otherwise
+    loaded like `get_current_user`.
+    """
+    if (
+        settings.TOKEN_CLAIMS_AUTH
+        and token_data.is_active
+        and token_data.is_superuser is not None
+        and revocations.allows(token_data)
+    ):
+        assert token_data.sub is not None
+        return AuthorizedUser(
+            id=uuid.UUID(token_data.sub), is_superuser=token_data.is_superuser
+        )
+    user = await get_current_user(session, token_data)
+    return AuthorizedUser(id=user.id, is_superuser=user.is_superuser)
+
+
+ReadUser = Annotated[AuthorizedUser, Depends(get_authorized_user)]
+
+
+async def get_read_db(
+    current_user: ReadUser,
+) -> AsyncGenerator[AsyncSession, None]:
+    engine = await replica_router.engine_for(current_user.id)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+# Session of a read-only endpoint, on a replica when there is one
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
+
+
 def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+def get_authorized_superuser(current_user: ReadUser) -> AuthorizedUser:
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=403, detail="The user doesn't have enough privileges"
+        )
+    return current_user
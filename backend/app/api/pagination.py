@@ -0,0 +1,56 @@
+import base64
+import binascii
+import uuid
+from collections.abc import Sequence
+from typing import Any, Protocol, TypeVar
+
+from fastapi import HTTPException
+from sqlmodel.sql.expression import SelectOfScalar
+
+T = TypeVar("T")
+
+
+class _HasId(Protocol):
+    id: uuid.UUID
+
+
+def encode_cursor(last_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(last_id.bytes).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return uuid.UUID(bytes=raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    statement: SelectOfScalar[T],
+    key: Any,
+    *,
+    skip: int,
+    limit: int,
+    cursor: str | None,
+) -> SelectOfScalar[T]:
+    """
+    Order `statement` by the unique `key` column and select one page.
+
+    With a cursor the page starts right after the row it points to, which an
+    index on `key` finds without reading the rows before it. Otherwise the
+    first `skip` rows are skipped.
+    """
+    statement = statement.order_by(key).limit(limit)
+    if cursor is None:
+        return statement.offset(skip)
+    if skip:
+        raise HTTPException(status_code=400, detail="Use either skip or cursor")
+    return statement.where(key > decode_cursor(cursor))
+
+
+def next_cursor(rows: Sequence[_HasId], limit: int) -> str | None:
+    """Cursor of the page after `rows`, None when it was the last one."""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1].id)
@@ -1,52 +1,213 @@
 import uuid
+from collections.abc import Iterable, Sequence
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from sqlalchemy import (
+    ARRAY,
+    Boolean,
+    String,
+    Uuid,
+    any_,
+    bindparam,
+    case,
+    column,
+    delete,
+    insert,
+    update,
+    values,
+)
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app import crud
+from app.api.deps import AsyncSessionDep, CurrentUser, ReadSessionDep, ReadUser
+from app.api.pagination import next_cursor, paginate
+from app.core.config import settings
+from app.models import (
+    Item,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemPublic,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+)
 
 router = APIRouter(prefix="/items", tags=["items"])
 
 
 @router.get("/", response_model=ItemsPublic)
-def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+async def read_items(
+    session: ReadSessionDep,
+    current_user: ReadUser,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    include_count: bool = True,
 ) -> Any:
     """
     Retrieve items.
+
+    Pass the `next_cursor` of a page as `cursor` to get the next one, which
+    stays fast on deep pages unlike `skip`. `count` is left out with
+    `include_count=false`.
     """
 
+    count: int | None = None
     if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
+        if include_count:
+            count = await crud.count_rows_async(session=session, table="item")
+        statement = select(Item)
     else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
+        if include_count:
+            count = await crud.count_items_async(
+                session=session, owner_id=current_user.id
+            )
+        statement = select(Item).where(Item.owner_id == current_user.id)
+    statement = paginate(statement, col(Item.id), skip=skip, limit=limit, cursor=cursor)
+    items = (await session.exec(statement)).all()
+
+    return ItemsPublic(data=items, count=count, next_cursor=next_cursor(items, limit))
+
+
+def _check_bulk_size(size: int) -> None:
+    if size > settings.ITEMS_BULK_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.ITEMS_BULK_MAX} items per request",
         )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
+
+
+def _check_unique(ids: Sequence[uuid.UUID]) -> None:
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Duplicate item ids")
+
+
+async def _check_all_written(
+    session: AsyncSession, ids: Sequence[uuid.UUID], written: Iterable[uuid.UUID]
+) -> None:
+    # Ownership is part of the WHERE clause, so a missing item may just not
+    # be the user's. Nothing is written unless every item was.
+    missing = set(ids) - set(written)
+    if missing:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Items not found or not enough permissions: "
+            f"{', '.join(sorted(map(str, missing)))}",
+        )
+
+
+# Declared before the /{id} routes, which would take "bulk" as an id
+
+
+@router.post("/bulk", response_model=ItemsPublic)
+async def create_items(
+    *, session: AsyncSessionDep, current_user: CurrentUser, items_in: list[ItemCreate]
+) -> Any:
+    """
+    Create many items in one statement.
+    """
+    _check_bulk_size(len(items_in))
+    rows = [
+        Item.model_validate(item_in, update={"owner_id": current_user.id}).model_dump()
+        for item_in in items_in
+    ]
+    if not rows:
+        return ItemsPublic(data=[], count=0)
+    statement = insert(Item).returning(Item, sort_by_parameter_order=True)
+    items = (await session.scalars(statement, rows)).all()
+    await session.commit()
+    return ItemsPublic(data=items, count=len(items))
+
+
+@router.patch("/bulk", response_model=ItemsPublic)
+async def update_items(
+    *,
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    items_in: list[ItemBulkUpdate],
+) -> Any:
+    """
+    Update many items in one statement, either all of them or none.
+    """
+    _check_bulk_size(len(items_in))
+    ids = [item_in.id for item_in in items_in]
+    _check_unique(ids)
+    if not items_in:
+        return ItemsPublic(data=[], count=0)
+    changes = values(
+        column("id", Uuid()),
+        column("title", String()),
+        column("description", String()),
+        column("set_title", Boolean()),
+        column("set_description", Boolean()),
+        name="changes",
+    ).data(
+        [
+            (
+                item_in.id,
+                item_in.title,
+                item_in.description,
+                item_in.title is not None,
+                "description" in item_in.model_fields_set,
+            )
+            for item_in in items_in
+        ]
+    )
+    statement = (
+        update(Item)
+        .where(col(Item.id) == changes.c.id)
+        .values(
+            title=case((changes.c.set_title, changes.c.title), else_=col(Item.title)),
+            description=case(
+                (changes.c.set_description, changes.c.description),
+                else_=col(Item.description),
+            ),
         )
-        items = session.exec(statement).all()
+        .returning(Item)
+        .execution_options(synchronize_session=False)
+    )
+    if not current_user.is_superuser:
+        statement = statement.where(col(Item.owner_id) == current_user.id)
+    items = (await session.scalars(statement)).all()
+    await _check_all_written(session, ids, (item.id for item in items))
+    await session.commit()
+    by_id = {item.id: item for item in items}
+    return ItemsPublic(data=[by_id[id] for id in ids], count=len(items))
 
-    return ItemsPublic(data=items, count=count)
+
+@router.delete("/bulk")
+async def delete_items(
+    *, session: AsyncSessionDep, current_user: CurrentUser, ids: list[uuid.UUID]
+) -> Message:
+    """
+    Delete many items in one statement, either all of them or none.
+    """
+    _check_bulk_size(len(ids))
+    _check_unique(ids)
+    statement = (
+        delete(Item)
+        .where(col(Item.id) == any_(bindparam("ids", ids, type_=ARRAY(Uuid()))))
+        .returning(col(Item.id))
+    )
+    if not current_user.is_superuser:
+        statement = statement.where(col(Item.owner_id) == current_user.id)
+    deleted = (await session.scalars(statement)).all()
+    await _check_all_written(session, ids, deleted)
+    await session.commit()
+    return Message(message=f"{len(deleted)} items deleted successfully")
 
 
 @router.get("/{id}", response_model=ItemPublic)
-def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+async def read_item(
+    session: ReadSessionDep, current_user: ReadUser, id: uuid.UUID
+) -> Any:
     """
     Get item by ID.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
@@ -55,23 +216,21 @@ def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) ->
 
 
 @router.post("/", response_model=ItemPublic)
-def create_item(
-    *, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+async def create_item(
+    *, session: AsyncSessionDep, current_user: CurrentUser, item_in: ItemCreate
 ) -> Any:
     """
     Create new item.
     """
-    item = Item.model_validate(item_in, update={"owner_id": current_user.id})
-    session.add(item)
-    session.commit()
-    session.refresh(item)
-    return item
+    return await crud.create_item_async(
+        session=session, item_in=item_in, owner_id=current_user.id
+    )
 
 
 @router.put("/{id}", response_model=ItemPublic)
-def update_item(
+async def update_item(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     current_user: CurrentUser,
     id: uuid.UUID,
     item_in: ItemUpdate,
@@ -79,31 +238,38 @@ def update_item(
     """
     Update an item.
     """
-    item = session.get(Item, id)
+    update_dict = item_in.model_dump(exclude_unset=True)
+    if update_dict:
+        statement = (
+            update(Item).where(col(Item.id) == id).values(update_dict).returning(Item)
+        )
+        if not current_user.is_superuser:
+            statement = statement.where(col(Item.owner_id) == current_user.id)
+        item = (await session.scalars(statement)).first()
+        if item:
+            await session.commit()
+            return item
+    # Nothing to write, or nothing written, find out why
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    update_dict = item_in.model_dump(exclude_unset=True)
-    item.sqlmodel_update(update_dict)
-    session.add(item)
-    session.commit()
-    session.refresh(item)
     return item
 
 
 @router.delete("/{id}")
-def delete_item(
-    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
+async def delete_item(
+    session: AsyncSessionDep, current_user: CurrentUser, id: uuid.UUID
 ) -> Message:
     """
     Delete an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    session.delete(item)
-    session.commit()
+    await session.delete(item)
+    await session.commit()
     return Message(message="Item deleted successfully")
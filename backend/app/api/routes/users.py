@@ -1,29 +1,40 @@
+import asyncio
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
+from sqlalchemy import update
+from sqlmodel import col, delete, select
 
 from app import crud
 from app.api.deps import (
+    AsyncSessionDep,
     CurrentUser,
-    SessionDep,
+    ReadSessionDep,
+    ReadUser,
+    get_authorized_superuser,
     get_current_active_superuser,
 )
+from app.api.pagination import next_cursor, paginate
 from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
+from app.core.user_cache import user_cache
 from app.models import (
     Item,
     Message,
     UpdatePassword,
     User,
     UserCreate,
+    UserDeletion,
+    UserDeletionPublic,
+    UserDeletionsPublic,
     UserPublic,
     UserRegister,
     UsersPublic,
     UserUpdate,
     UserUpdateMe,
 )
+from app.services import user_deletion
 from app.utils import generate_new_account_email, send_email
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -31,43 +42,56 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get(
     "/",
-    dependencies=[Depends(get_current_active_superuser)],
+    dependencies=[Depends(get_authorized_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+async def read_users(
+    session: ReadSessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    include_count: bool = True,
+) -> Any:
     """
     Retrieve users.
+
+    Pass the `next_cursor` of a page as `cursor` to get the next one.
+    `count` is left out with `include_count=false`.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
+    count = None
+    if include_count:
+        count = await crud.count_rows_async(session=session, table="user")
 
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
+    statement = paginate(
+        select(User), col(User.id), skip=skip, limit=limit, cursor=cursor
+    )
+    users = (await session.exec(statement)).all()
 
-    return UsersPublic(data=users, count=count)
+    return UsersPublic(data=users, count=count, next_cursor=next_cursor(users, limit))
 
 
 @router.post(
     "/", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic
 )
-def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
+async def create_user(*, session: AsyncSessionDep, user_in: UserCreate) -> Any:
     """
     Create new user.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email_async(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
 
-    user = crud.create_user(session=session, user_create=user_in)
+    user = await crud.create_user_async(session=session, user_create=user_in)
     if settings.emails_enabled and user_in.email:
         email_data = generate_new_account_email(
             email_to=user_in.email, username=user_in.email, password=user_in.password
         )
-        send_email(
+        await asyncio.to_thread(
+            send_email,
             email_to=user_in.email,
             subject=email_data.subject,
             html_content=email_data.html_content,
@@ -76,49 +100,61 @@ def create_user(*, session: SessionDep, user_in: UserCreate) -> Any:
 
 
 @router.patch("/me", response_model=UserPublic)
-def update_user_me(
-    *, session: SessionDep, user_in: UserUpdateMe, current_user: CurrentUser
+async def update_user_me(
+    *, session: AsyncSessionDep, user_in: UserUpdateMe, current_user: CurrentUser
 ) -> Any:
     """
     Update own user.
     """
 
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email_async(
+            session=session, email=user_in.email
+        )
         if existing_user and existing_user.id != current_user.id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
     user_data = user_in.model_dump(exclude_unset=True)
-    current_user.sqlmodel_update(user_data)
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
-    return current_user
+    if not user_data:
+        return current_user
+    statement = (
+        update(User)
+        .where(col(User.id) == current_user.id)
+        .values(user_data)
+        .returning(User)
+    )
+    user = (await session.scalars(statement)).one()
+    await session.commit()
+    user_cache.drop(current_user.id)
+    return user
 
 
 @router.patch("/me/password", response_model=Message)
-def update_password_me(
-    *, session: SessionDep, body: UpdatePassword, current_user: CurrentUser
+async def update_password_me(
+    *, session: AsyncSessionDep, body: UpdatePassword, current_user: CurrentUser
 ) -> Any:
     """
     Update own password.
     """
-    if not verify_password(body.current_password, current_user.hashed_password):
+    if not await asyncio.to_thread(
+        verify_password, body.current_password, current_user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect password")
     if body.current_password == body.new_password:
         raise HTTPException(
             status_code=400, detail="New password cannot be the same as the current one"
         )
-    hashed_password = get_password_hash(body.new_password)
+    hashed_password = await asyncio.to_thread(get_password_hash, body.new_password)
     current_user.hashed_password = hashed_password
     session.add(current_user)
-    session.commit()
+    await session.commit()
+    user_cache.drop(current_user.id)
     return Message(message="Password updated successfully")
 
 
 @router.get("/me", response_model=UserPublic)
-def read_user_me(current_user: CurrentUser) -> Any:
+async def read_user_me(current_user: CurrentUser) -> Any:
     """
     Get current user.
     """
@@ -126,7 +162,7 @@ def read_user_me(current_user: CurrentUser) -> Any:
 
 
 @router.delete("/me", response_model=Message)
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+async def delete_user_me(session: AsyncSessionDep, current_user: CurrentUser) -> Any:
     """
     Delete own user.
     """
@@ -134,43 +170,65 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    session.delete(current_user)
-    session.commit()
+    await session.delete(current_user)
+    await session.commit()
+    user_cache.drop(current_user.id)
     return Message(message="User deleted successfully")
 
 
 @router.post("/signup", response_model=UserPublic)
-def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(session: AsyncSessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
-    user = crud.get_user_by_email(session=session, email=user_in.email)
+    user = await crud.get_user_by_email_async(session=session, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = crud.create_user(session=session, user_create=user_create)
+    user = await crud.create_user_async(session=session, user_create=user_create)
     return user
 
 
+@router.get(
+    "/deletions/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=UserDeletionsPublic,
+)
+async def read_user_deletions(
+    session: AsyncSessionDep, skip: int = 0, limit: int = 100
+) -> Any:
+    """
+    Retrieve background user deletions, the ones in progress first.
+    """
+    statement = (
+        select(UserDeletion)
+        .order_by(
+            col(UserDeletion.finished_at).desc().nulls_first(),
+            col(UserDeletion.requested_at).desc(),
+        )
+        .offset(skip)
+        .limit(limit)
+    )
+    deletions = (await session.exec(statement)).all()
+    return UserDeletionsPublic(data=deletions)
+
+
 @router.get("/{user_id}", response_model=UserPublic)
-def read_user_by_id(
-    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+async def read_user_by_id(
+    user_id: uuid.UUID, session: ReadSessionDep, current_user: ReadUser
 ) -> Any:
     """
     Get a specific user by id.
     """
-    user = session.get(User, user_id)
-    if user == current_user:
-        return user
-    if not current_user.is_superuser:
+    if user_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(
             status_code=403,
             detail="The user doesn't have enough privileges",
         )
-    return user
+    return await session.get(User, user_id)
 
 
 @router.patch(
@@ -178,9 +236,9 @@ def read_user_by_id(
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UserPublic,
 )
-def update_user(
+async def update_user(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     user_id: uuid.UUID,
     user_in: UserUpdate,
 ) -> Any:
@@ -188,39 +246,67 @@ def update_user(
     Update a user.
     """
 
-    db_user = session.get(User, user_id)
+    db_user = await session.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
+    if await session.get(UserDeletion, user_id):
+        raise HTTPException(status_code=409, detail="The user is being deleted")
     if user_in.email:
-        existing_user = crud.get_user_by_email(session=session, email=user_in.email)
+        existing_user = await crud.get_user_by_email_async(
+            session=session, email=user_in.email
+        )
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
 
-    db_user = crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    db_user = await crud.update_user_async(
+        session=session, db_user=db_user, user_in=user_in
+    )
     return db_user
 
 
-@router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
-def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
-) -> Message:
+@router.delete(
+    "/{user_id}",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=Message | UserDeletionPublic,
+    responses={202: {"model": UserDeletionPublic}},
+)
+async def delete_user(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    user_id: uuid.UUID,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+) -> Any:
     """
     Delete a user.
+
+    With `background=true` the user is deactivated and 202 returned right
+    away, their items are then deleted in batches. Progress is listed by
+    `GET /users/deletions/`.
     """
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user == current_user:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
+    if background:
+        deletion, _ = await user_deletion.start_deletion(session, user)
+        # Requested again, this also retries a purge that failed. One that's
+        # still running holds its lock and the new one returns right away
+        background_tasks.add_task(user_deletion.purge_in_background, user_id)
+        response.status_code = 202
+        return deletion
     statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
-    session.delete(user)
-    session.commit()
+    await session.exec(statement)  # type: ignore
+    await session.delete(user)
+    await session.commit()
+    user_cache.drop(user_id)
     return Message(message="User deleted successfully")
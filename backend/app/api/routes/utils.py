@@ -1,8 +1,14 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
+from app.core.db import pool_metrics
+from app.core.replicas import replica_router
+from app.core.user_cache import user_cache
 from app.models import Message
+from app.services.model_router import model_router
 from app.utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -29,3 +35,36 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get("/db-pool/", dependencies=[Depends(get_current_active_superuser)])
+def db_pool() -> dict[str, dict[str, Any]]:
+    """
+    Connection pool usage and checkout latency of this worker.
+    """
+    return pool_metrics()
+
+
+@router.get("/replicas/", dependencies=[Depends(get_current_active_superuser)])
+def replicas() -> list[dict[str, Any]]:
+    """
+    Replication lag of the read replicas, as last checked by this worker.
+    """
+    return replica_router.report()
+
+
+@router.get("/user-cache/", dependencies=[Depends(get_current_active_superuser)])
+def user_cache_stats() -> dict[str, Any]:
+    """
+    Hit rate of this worker's current user cache and the database time its
+    hits saved.
+    """
+    return user_cache.report()
+
+
+@router.get("/model-latency/", dependencies=[Depends(get_current_active_superuser)])
+def model_latency() -> dict[str, dict[str, float]]:
+    """
+    Latency and failures of the OpenAI models called by this worker.
+    """
+    return model_router.latency_report()
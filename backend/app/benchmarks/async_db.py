@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models import Item
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def build_app(*, pool_size: int, db_latency: float) -> FastAPI:
+    """
+    The same read as a `def` endpoint on a sync session and as an `async def`
+    one on an async session. `db_latency` adds a server side sleep to each
+    request, standing in for a database farther away than localhost.
+    """
+    url = str(settings.SQLALCHEMY_DATABASE_URI)
+    engine = create_engine(url, pool_size=pool_size, max_overflow=0)
+    async_engine = create_async_engine(url, pool_size=pool_size, max_overflow=0)
+    sleep = text("SELECT pg_sleep(:seconds)").bindparams(seconds=db_latency)
+    app = FastAPI()
+
+    @app.get("/sync")
+    def read_sync() -> int:
+        with Session(engine) as session:
+            if db_latency:
+                session.exec(sleep)  # type: ignore
+            return len(session.exec(select(Item).limit(10)).all())
+
+    @app.get("/async")
+    async def read_async() -> int:
+        async with AsyncSession(async_engine) as session:
+            if db_latency:
+                await session.exec(sleep)  # type: ignore
+            return len((await session.exec(select(Item).limit(10))).all())
+
+    return app
+
+
+async def load(
+    app: FastAPI, path: str, *, requests: int, concurrency: int
+) -> tuple[float, list[float]]:
+    """Issue `requests` GETs, `concurrency` at a time. Returns elapsed, latencies."""
+    latencies: list[float] = []
+    remaining = iter(range(requests))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        async def worker() -> None:
+            for _ in remaining:
+                started = time.perf_counter()
+                resp = await c.get(path)
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark sync vs async database endpoints"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument(
+        "--db-latency", type=float, default=0.005, help="seconds per request"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+async def run(args: argparse.Namespace) -> None:
+    # One event loop for both, pooled async connections are bound to it
+    app = build_app(pool_size=args.pool_size, db_latency=args.db_latency)
+    for path in ("/sync", "/async"):
+        # Warm the pool and the threadpool first
+        await load(app, path, requests=args.pool_size, concurrency=4)
+        elapsed, latencies = await load(
+            app, path, requests=args.requests, concurrency=args.concurrency
+        )
+        latencies.sort()
+        logger.info(
+            "%-6s %d requests, concurrency %d: %.0f req/s, p50 %.1f ms, p99 %.1f ms",
+            path,
+            args.requests,
+            args.concurrency,
+            args.requests / elapsed,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[min(int(0.99 * len(latencies)), len(latencies) - 1)] * 1000,
+        )
+
+
+if __name__ == "__main__":
+    main()
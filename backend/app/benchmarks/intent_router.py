@@ -0,0 +1,58 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from app.services.intent_router import Intent, router
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FIXTURES = (
+    Path(__file__).parent.parent
+    / "tests"
+    / "services"
+    / "fixtures"
+    / "intent_messages.json"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the intent router")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = json.loads(FIXTURES.read_text())
+    texts = [case["text"] for case in cases]
+
+    correct = sum(
+        router.classify(case["text"]).intent == Intent(case["intent"]) for case in cases
+    )
+    routed = sum(not router.classify(text).needs_llm for text in texts)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            router.classify(text)
+    elapsed = time.perf_counter() - start
+    total = args.iterations * len(texts)
+
+    logger.info("Accuracy on fixtures: %d/%d", correct, len(cases))
+    logger.info(
+        "Handled without the LLM: %d/%d (%.0f%%)",
+        routed,
+        len(texts),
+        100 * routed / len(texts),
+    )
+    logger.info(
+        "Classified %d messages in %.3fs: %.0f msg/s, %.1f µs/msg",
+        total,
+        elapsed,
+        total / elapsed,
+        elapsed / total * 1e6,
+    )
+
+
+if __name__ == "__main__":
+    main()
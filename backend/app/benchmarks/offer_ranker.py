@@ -0,0 +1,91 @@
+import argparse
+import logging
+import random
+import re
+import time
+from typing import Any
+
+from app.services.offer_ranker import parse_prices, rank_offers
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_SEP_RE = re.compile(r"[.,]")
+
+
+def generate_offers(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    offers = []
+    for i in range(count):
+        pesos = rng.randint(500_000, 2_000_000)
+        if rng.random() < 0.1:
+            price = f"US$ {pesos // 1200:,}"
+        elif rng.random() < 0.5:
+            price = "$ " + f"{pesos:,}".replace(",", ".") + ",00"
+        else:
+            price = f"$ {pesos:,}".replace(",", ".")
+        installments = rng.choice([1, 3, 6, 12])
+        offers.append(
+            {
+                "store": f"store-{i % 50}",
+                "price": price,
+                "shipping": rng.choice(["Gratis", "$ 5.000", "$ 12.500,50"]),
+                "installments": installments,
+                "installment_price": f"$ {pesos * rng.choice([1, 1.2]) / installments:.2f}",
+                "seller_reputation": rng.random(),
+                "url": f"https://example.com/{i}",
+            }
+        )
+    return offers
+
+
+def parse_price_loop(value: Any) -> int:
+    """Straightforward per-offer parser, used as the baseline."""
+    text = "".join(c for c in str(value) if c.isdigit() or c in ".,")
+    if not text:
+        return 0
+    parts = _SEP_RE.split(text)
+    if len(parts) > 1 and len(parts[-1]) <= 2:
+        return int("".join(parts[:-1]) or 0) * 100 + int(parts[-1].ljust(2, "0"))
+    return int("".join(parts)) * 100
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the offer ranker")
+    parser.add_argument("--offers", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    offers = generate_offers(args.offers)
+    prices = [offer["price"] for offer in offers]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        [parse_price_loop(price) for price in prices]
+    loop_elapsed = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        parse_prices(prices)
+    numpy_elapsed = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        data = rank_offers("benchmark", offers, k=3)
+    rank_elapsed = (time.perf_counter() - start) / args.repeat
+
+    logger.info("Offers: %d, repeats: %d", args.offers, args.repeat)
+    logger.info("Parse prices, Python loop: %.2f ms", loop_elapsed * 1000)
+    logger.info(
+        "Parse prices, NumPy: %.2f ms (%.1fx)",
+        numpy_elapsed * 1000,
+        loop_elapsed / numpy_elapsed,
+    )
+    logger.info(
+        "Full rank_offers (3 price columns + scoring): %.2f ms", rank_elapsed * 1000
+    )
+    logger.info("Best offer: %s", data["best"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import logging
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlmodel import Session, col, select
+
+from app.api.pagination import encode_cursor, paginate
+from app.core.db import engine
+from app.models import Item, User
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def seed(session: Session, rows: int) -> uuid.UUID:
+    """A throwaway user owning `rows` items, inserted server side."""
+    owner = User(email=f"bench-{uuid.uuid4().hex[:8]}@example.com", hashed_password="")
+    session.add(owner)
+    session.commit()
+    session.execute(
+        text(
+            "INSERT INTO item (id, title, owner_id) "
+            "SELECT gen_random_uuid(), 'bench ' || i, :owner "
+            "FROM generate_series(1, :rows) AS i"
+        ),
+        {"owner": owner.id, "rows": rows},
+    )
+    session.commit()
+    session.execute(text("ANALYZE item"))
+    return owner.id
+
+
+def time_page(
+    session: Session,
+    owner_id: uuid.UUID,
+    *,
+    skip: int,
+    cursor: str | None,
+    limit: int,
+    repeat: int,
+) -> float:
+    """Median seconds to read one page of the owner's items."""
+    statement = paginate(
+        select(Item).where(Item.owner_id == owner_id),
+        col(Item.id),
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+    )
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        session.exec(statement).all()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark offset vs cursor pagination of items"
+    )
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = args.page * args.limit
+    with Session(engine) as session:
+        started = time.perf_counter()
+        owner_id = seed(session, rows)
+        logger.info("Seeded %d items in %.1fs", rows, time.perf_counter() - started)
+        try:
+            deep_skip = (args.page - 1) * args.limit
+            # Cursor of the row just before the deep page
+            last_id = session.exec(
+                select(Item.id)
+                .where(Item.owner_id == owner_id)
+                .order_by(col(Item.id))
+                .offset(deep_skip - 1)
+                .limit(1)
+            ).one()
+            pages = {
+                "page 1": (0, None),
+                f"page {args.page}": (deep_skip, encode_cursor(last_id)),
+            }
+            for name, (skip, cursor) in pages.items():
+                offset = time_page(
+                    session,
+                    owner_id,
+                    skip=skip,
+                    cursor=None,
+                    limit=args.limit,
+                    repeat=args.repeat,
+                )
+                keyset = time_page(
+                    session,
+                    owner_id,
+                    skip=0,
+                    cursor=cursor,
+                    limit=args.limit,
+                    repeat=args.repeat,
+                )
+                logger.info(
+                    "%-11s offset %.2f ms, cursor %.2f ms",
+                    name,
+                    offset * 1000,
+                    keyset * 1000,
+                )
+        finally:
+            session.rollback()
+            owner = session.get(User, owner_id)
+            session.execute(
+                text("DELETE FROM item WHERE owner_id = :owner"), {"owner": owner_id}
+            )
+            session.delete(owner)
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import Engine, event, update
+from sqlmodel import Session, col, create_engine
+
+from app import crud
+from app.core.config import settings
+from app.models import Item, ItemCreate, User
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+Write = Callable[[Session, uuid.UUID, int], Any]
+
+
+# Before: the ORM flush, then a SELECT to reload the expired object
+def refresh_create(session: Session, owner_id: uuid.UUID, n: int) -> Item:
+    item = Item(title=f"item {n}", owner_id=owner_id)
+    session.add(item)
+    session.commit()
+    session.refresh(item)
+    return item
+
+
+def refresh_update(session: Session, item_id: uuid.UUID, n: int) -> Item:
+    item = session.get(Item, item_id)
+    assert item
+    item.sqlmodel_update({"title": f"item {n}"})
+    session.add(item)
+    session.commit()
+    session.refresh(item)
+    return item
+
+
+# After: one statement, the row comes back with RETURNING
+def returning_create(session: Session, owner_id: uuid.UUID, n: int) -> Item:
+    item_in = ItemCreate(title=f"item {n}")
+    return crud.create_item(session=session, item_in=item_in, owner_id=owner_id)
+
+
+def returning_update(session: Session, item_id: uuid.UUID, n: int) -> Item:
+    statement = (
+        update(Item)
+        .where(col(Item.id) == item_id)
+        .values(title=f"item {n}")
+        .returning(Item)
+    )
+    item = session.scalars(statement).one()
+    session.commit()
+    return item
+
+
+def add_round_trip_latency(engine: Engine, rtt: float) -> list[int]:
+    """
+    Sleep `rtt` seconds on every statement and COMMIT, standing in for a
+    database farther away than localhost. Returns the round trip counter.
+    """
+    round_trips = [0]
+
+    def round_trip(*_: Any) -> None:
+        round_trips[0] += 1
+        time.sleep(rtt)
+
+    event.listen(engine, "before_cursor_execute", round_trip)
+    event.listen(engine, "commit", round_trip)
+    return round_trips
+
+
+def measure(
+    engine: Engine,
+    round_trips: list[int],
+    write: Write,
+    target: uuid.UUID,
+    *,
+    writes: int,
+    expire_on_commit: bool,
+) -> tuple[float, float]:
+    """Round trips and milliseconds per write, each in a new session."""
+    round_trips[0] = 0
+    started = time.perf_counter()
+    for n in range(writes):
+        with Session(engine, expire_on_commit=expire_on_commit) as session:
+            item = write(session, target, n)
+            # What the endpoint does next, serialize the object
+            item.model_dump()
+    elapsed = time.perf_counter() - started
+    return round_trips[0] / writes, elapsed / writes * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark commit + refresh vs RETURNING writes"
+    )
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument(
+        "--rtt", type=float, default=0.001, help="seconds added per round trip"
+    )
+    args = parser.parse_args()
+
+    engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+    with Session(engine) as session:
+        owner = User(email=f"{uuid.uuid4().hex}@bench.example.com", hashed_password="")
+        session.add(owner)
+        session.commit()
+        owner_id = owner.id
+        item = Item(title="target", owner_id=owner_id)
+        session.add(item)
+        session.commit()
+        item_id = item.id
+    round_trips = add_round_trip_latency(engine, args.rtt)
+
+    cases: list[tuple[str, Write, uuid.UUID, bool]] = [
+        ("create, commit + refresh", refresh_create, owner_id, True),
+        ("create, RETURNING", returning_create, owner_id, False),
+        ("update, commit + refresh", refresh_update, item_id, True),
+        ("update, RETURNING", returning_update, item_id, False),
+    ]
+    try:
+        for name, write, target, expire_on_commit in cases:
+            per_write, ms = measure(
+                engine,
+                round_trips,
+                write,
+                target,
+                writes=args.writes,
+                expire_on_commit=expire_on_commit,
+            )
+            logger.info(
+                "%-25s %.1f round trips, %.2f ms per write (rtt %.1f ms)",
+                name,
+                per_write,
+                ms,
+                args.rtt * 1000,
+            )
+    finally:
+        with Session(engine) as session:
+            session.delete(session.get(User, owner_id))
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,544 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Protocol
+
+from sqlalchemy import Engine, and_, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col
+
+from app.core.config import settings
+from app.models import CacheEntry
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CacheBackend(Protocol):
+    """
+    Key-value cache with per-entry TTL and a bounded number of entries.
+
+    Keys are strings and values plain JSON-like data, shared backends hand
+    back a decoded copy of what was stored.
+
+    The `a`-prefixed methods are for callers on the event loop, they don't
+    block it on backends that do I/O.
+    """
+
+    stats: CacheStats
+
+    def get(self, key: str) -> Any | None: ...
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def ttl_remaining(self, key: str) -> float: ...
+
+    def get_or_set(
+        self, key: str, factory: Callable[[], Any], ttl: float | None = None
+    ) -> Any:
+        """
+        Cached value of `key`, or the value of `factory` stored for it.
+
+        When several callers miss at once, the first value stored wins and
+        every caller returns it.
+        """
+        ...
+
+    def clear(self) -> None: ...
+
+    async def aget(self, key: str) -> Any | None: ...
+
+    async def aset(self, key: str, value: Any, ttl: float | None = None) -> None: ...
+
+    async def adelete(self, key: str) -> None: ...
+
+    async def attl_remaining(self, key: str) -> float: ...
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry TTL and LRU eviction.
+
+    Values should be plain JSON-like data so callers don't depend on the
+    cache handing back the same object they stored.
+    """
+
+    def __init__(self, *, max_entries: int, default_ttl: float) -> None:
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def _store(self, key: str, value: Any, ttl: float | None) -> None:
+        """Write `key` under the lock."""
+        expires = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def ttl_remaining(self, key: str) -> float:
+        """Seconds until `key` expires, 0 if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return max(entry[0] - time.monotonic(), 0.0) if entry else 0.0
+
+    def get_or_set(
+        self, key: str, factory: Callable[[], Any], ttl: float | None = None
+    ) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = factory()
+        if value is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            self._store(key, value, ttl)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # Nothing to wait for in memory
+    async def aget(self, key: str) -> Any | None:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self.set(key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    async def attl_remaining(self, key: str) -> float:
+        return self.ttl_remaining(key)
+
+
+class PostgresCache:
+    """
+    Cache shared by every worker in the UNLOGGED `cacheentry` table.
+
+    UNLOGGED tables skip the WAL, so writes are cheap and the table is
+    emptied after a crash, which is fine for a cache. Entries of each
+    namespace are pruned to `max_entries` every `prune_every` writes,
+    dropping the ones that expire first.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        engine: Engine,
+        max_entries: int,
+        default_ttl: float,
+        prune_every: int = 100,
+    ) -> None:
+        self.namespace = namespace
+        self.engine = engine
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.prune_every = prune_every
+        self.stats = CacheStats()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _where(self, key: str) -> Any:
+        return and_(
+            col(CacheEntry.namespace) == self.namespace, col(CacheEntry.key) == key
+        )
+
+    def _expires_at(self, ttl: float | None) -> datetime:
+        ttl = self.default_ttl if ttl is None else ttl
+        return datetime.now(timezone.utc) + timedelta(seconds=ttl)
+
+    def get(self, key: str) -> Any | None:
+        statement = select(col(CacheEntry.value)).where(
+            self._where(key), col(CacheEntry.expires_at) > func.now()
+        )
+        with self.engine.connect() as connection:
+            value = connection.execute(statement).scalar()
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        return value
+
+    def _insert(self, key: str, value: Any, ttl: float | None) -> Any:
+        return insert(CacheEntry).values(
+            namespace=self.namespace,
+            key=key,
+            value=value,
+            expires_at=self._expires_at(ttl),
+        )
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        statement = self._insert(key, value, ttl)
+        statement = statement.on_conflict_do_update(
+            index_elements=["namespace", "key"],
+            set_={
+                "value": statement.excluded.value,
+                "expires_at": statement.excluded.expires_at,
+            },
+        )
+        with self.engine.begin() as connection:
+            connection.execute(statement)
+        self._wrote()
+
+    def delete(self, key: str) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(delete(CacheEntry).where(self._where(key)))
+
+    def ttl_remaining(self, key: str) -> float:
+        statement = select(
+            func.extract("epoch", col(CacheEntry.expires_at) - func.now())
+        ).where(self._where(key))
+        with self.engine.connect() as connection:
+            remaining = connection.execute(statement).scalar()
+        return max(float(remaining), 0.0) if remaining is not None else 0.0
+
+    def get_or_set(
+        self, key: str, factory: Callable[[], Any], ttl: float | None = None
+    ) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = factory()
+        if value is None:
+            return None
+        # Insert unless another worker stored a live value meanwhile, in
+        # which case RETURNING is empty and that value wins
+        statement = self._insert(key, value, ttl)
+        statement = statement.on_conflict_do_update(
+            index_elements=["namespace", "key"],
+            set_={
+                "value": statement.excluded.value,
+                "expires_at": statement.excluded.expires_at,
+            },
+            where=col(CacheEntry.expires_at) <= func.now(),
+        ).returning(col(CacheEntry.value))
+        with self.engine.begin() as connection:
+            stored = connection.execute(statement).scalar()
+            if stored is None:
+                stored = connection.execute(
+                    select(col(CacheEntry.value)).where(self._where(key))
+                ).scalar()
+        self._wrote()
+        return stored if stored is not None else value
+
+    def clear(self) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                delete(CacheEntry).where(col(CacheEntry.namespace) == self.namespace)
+            )
+
+    # The sync engine blocks, run its round trips in a thread
+    async def aget(self, key: str) -> Any | None:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: float | None = None) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        await asyncio.to_thread(self.delete, key)
+
+    async def attl_remaining(self, key: str) -> float:
+        return await asyncio.to_thread(self.ttl_remaining, key)
+
+    def _wrote(self) -> None:
+        with self._lock:
+            self._writes += 1
+            if self._writes % self.prune_every:
+                return
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete expired entries and the ones over `max_entries`."""
+        keep = (
+            select(col(CacheEntry.key))
+            .where(
+                col(CacheEntry.namespace) == self.namespace,
+                col(CacheEntry.expires_at) > func.now(),
+            )
+            .order_by(col(CacheEntry.expires_at).desc())
+            .limit(self.max_entries)
+        )
+        statement = delete(CacheEntry).where(
+            col(CacheEntry.namespace) == self.namespace,
+            col(CacheEntry.key).not_in(keep),
+        )
+        with self.engine.begin() as connection:
+            deleted = connection.execute(statement).rowcount
+        with self._lock:
+            self.stats.evictions += deleted
+        return deleted
+
+
+# Slot header: key hash (0 for an empty slot), expiry as a Unix timestamp,
+# payload length and CRC-32
+_SLOT_HEADER = struct.Struct("<QdII")
+_PROBES = 8
+
+
+class MmapCache:
+    """
+    Cache shared by the workers of one host through a memory-mapped file.
+
+    The file is a fixed hash table of `max_entries` slots of `slot_bytes`
+    each, so its size never grows. A key lives in one of the 8 slots after
+    its hash; when they're all taken the entry that expires first is
+    evicted. Values that don't fit in a slot are not cached. Processes
+    serialize on an flock of the file, threads on a lock.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        max_entries: int,
+        default_ttl: float,
+        slot_bytes: int = 2048,
+    ) -> None:
+        self.path = Path(path)
+        self.slots = max_entries
+        self.slot_bytes = slot_bytes
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._pid = -1
+        self._fd = -1
+        self._map: mmap.mmap | None = None
+
+    def _mapped(self) -> mmap.mmap:
+        # A forked worker must not share the parent's open file description,
+        # or the flocks wouldn't exclude each other
+        if self._map is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = self.slots * self.slot_bytes
+            if os.fstat(self._fd).st_size != size:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(self._fd).st_size != size:
+                        os.ftruncate(self._fd, 0)
+                        os.ftruncate(self._fd, size)
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(self._fd, size)
+            self._pid = os.getpid()
+        return self._map
+
+    @contextmanager
+    def _locked(self, *, exclusive: bool) -> Iterator[None]:
+        with self._lock:
+            self._mapped()
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # 0 marks an empty slot
+        return int.from_bytes(digest, "little") | 1
+
+    def _read(self, slot: int) -> tuple[int, float, int, int]:
+        offset = slot * self.slot_bytes
+        return _SLOT_HEADER.unpack_from(self._mapped(), offset)
+
+    def _clear_slot(self, slot: int) -> None:
+        _SLOT_HEADER.pack_into(self._mapped(), slot * self.slot_bytes, 0, 0.0, 0, 0)
+
+    def _find(self, key: str, key_hash: int) -> tuple[int, Any] | None:
+        """Slot and [key, value] payload of `key`, expired or not."""
+        data = self._mapped()
+        start = key_hash % self.slots
+        for probe in range(min(_PROBES, self.slots)):
+            slot = (start + probe) % self.slots
+            slot_hash, _, length, checksum = self._read(slot)
+            if slot_hash != key_hash:
+                continue
+            offset = slot * self.slot_bytes + _SLOT_HEADER.size
+            raw = data[
+                offset : offset + min(length, self.slot_bytes - _SLOT_HEADER.size)
+            ]
+            # A write that didn't finish, e.g. its worker was killed, leaves a
+            # torn slot. It's a miss until the slot expires or is evicted
+            if zlib.crc32(raw) != checksum:
+                continue
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                continue
+            if payload[0] == key:
+                return slot, payload
+        return None
+
+    def get(self, key: str) -> Any | None:
+        key_hash = self._hash(key)
+        with self._locked(exclusive=False):
+            found = self._find(key, key_hash)
+            live = found is not None and self._read(found[0])[1] > time.time()
+        with self._lock:
+            if live:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+        return found[1][1] if found is not None and live else None
+
+    def _store(self, key: str, value: Any, ttl: float | None) -> None:
+        """Write `key` under the exclusive lock."""
+        payload = json.dumps([key, value], separators=(",", ":")).encode()
+        key_hash = self._hash(key)
+        found = self._find(key, key_hash)
+        if _SLOT_HEADER.size + len(payload) > self.slot_bytes:
+            # Too big to cache, don't leave an older value behind either
+            if found is not None:
+                self._clear_slot(found[0])
+            return
+        if found is not None:
+            slot = found[0]
+        else:
+            now = time.time()
+            start = key_hash % self.slots
+            window = [
+                (start + probe) % self.slots
+                for probe in range(min(_PROBES, self.slots))
+            ]
+            free = [
+                s for s in window if self._read(s)[0] == 0 or self._read(s)[1] <= now
+            ]
+            if free:
+                slot = free[0]
+            else:
+                slot = min(window, key=lambda s: self._read(s)[1])
+                self.stats.evictions += 1
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        offset = slot * self.slot_bytes
+        data = self._mapped()
+        data[offset + _SLOT_HEADER.size : offset + _SLOT_HEADER.size + len(payload)] = (
+            payload
+        )
+        _SLOT_HEADER.pack_into(
+            data, offset, key_hash, expires, len(payload), zlib.crc32(payload)
+        )
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        with self._locked(exclusive=True):
+            self._store(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._locked(exclusive=True):
+            found = self._find(key, self._hash(key))
+            if found is not None:
+                self._clear_slot(found[0])
+
+    def ttl_remaining(self, key: str) -> float:
+        with self._locked(exclusive=False):
+            found = self._find(key, self._hash(key))
+            expires = self._read(found[0])[1] if found is not None else 0.0
+        return max(expires - time.time(), 0.0)
+
+    def get_or_set(
+        self, key: str, factory: Callable[[], Any], ttl: float | None = None
+    ) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = factory()
+        if value is None:
+            return None
+        with self._locked(exclusive=True):
+            found = self._find(key, self._hash(key))
+            if found is not None and self._read(found[0])[1] > time.time():
+                return found[1][1]
+            self._store(key, value, ttl)
+        return value
+
+    def clear(self) -> None:
+        with self._locked(exclusive=True):
+            for slot in range(self.slots):
+                self._clear_slot(slot)
+
+    # Reads and writes of the mapped page cache don't wait on I/O
+    async def aget(self, key: str) -> Any | None:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self.set(key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    async def attl_remaining(self, key: str) -> float:
+        return self.ttl_remaining(key)
+
+
+def make_cache(namespace: str, *, max_entries: int, default_ttl: float) -> CacheBackend:
+    """Cache for `namespace` on the backend selected by CACHE_BACKEND."""
+    if settings.CACHE_BACKEND == "postgres":
+        # Imported here, app.core.db imports crud, which may use caches
+        from app.core.db import engine
+
+        return PostgresCache(
+            namespace, engine=engine, max_entries=max_entries, default_ttl=default_ttl
+        )
+    if settings.CACHE_BACKEND == "mmap":
+        return MmapCache(
+            Path(settings.CACHE_MMAP_DIR) / f"{namespace}.cache",
+            max_entries=max_entries,
+            default_ttl=default_ttl,
+            slot_bytes=settings.CACHE_MMAP_SLOT_BYTES,
+        )
+    return TTLCache(max_entries=max_entries, default_ttl=default_ttl)
@@ -69,6 +69,58 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # Pool of each engine (sync and async) in every worker. Workers times two
+    # times (size + overflow) must stay below Postgres max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Connections older than this are replaced on checkout, -1 keeps them
+    DB_POOL_RECYCLE_SECONDS: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    # Open DB_POOL_SIZE connections of each engine at startup
+    DB_POOL_WARMUP: bool = True
+    # psycopg prepares a statement after this many runs on a connection.
+    # None disables it, which PgBouncer in transaction mode needs
+    DB_PREPARE_THRESHOLD: int | None = 5
+
+    # Read replicas (full postgresql+psycopg:// URIs) for read-only endpoints.
+    # A user's reads stay on the primary for a while after their own writes,
+    # and replicas lagging behind by more than REPLICA_MAX_LAG_SECONDS, or
+    # unreachable, are skipped until the next check.
+    POSTGRES_REPLICA_URIS: list[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 2.0
+    REPLICA_READ_YOUR_WRITES_SECONDS: float = 10.0
+
+    # Users looked up by get_current_user are kept for this long, 0 turns the
+    # cache off. Triggers NOTIFY the changes of users, every worker and node
+    # drops its copy when it hears about them.
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 10_000
+    # Verified tokens kept per worker, until they expire
+    TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+    # Read-only routes trust the is_active and is_superuser claims of tokens
+    # unless the user was revoked since, the revocations are reloaded this
+    # often. Until then a deactivated user can still read.
+    TOKEN_CLAIMS_AUTH: bool = True
+    TOKEN_REVOCATIONS_REFRESH_SECONDS: float = 5.0
+
+    # Outside production, responses carry X-DB-Queries and X-DB-Time-Ms, and
+    # requests running more statements than this are logged
+    QUERY_COUNT_WARNING_THRESHOLD: int = 30
+
+    # Superuser list counts of whole tables come from the planner's row
+    # estimate (pg_class.reltuples) instead of the trigger kept counters
+    LIST_COUNT_ESTIMATES: bool = False
+
+    # Max items per request of the /items/bulk endpoints
+    ITEMS_BULK_MAX: int = 1000
+
+    # Items deleted per transaction when a user is deleted in the background,
+    # and the pause between transactions
+    USER_DELETE_BATCH_SIZE: int = 1000
+    USER_DELETE_BATCH_PAUSE_SECONDS: float = 0.05
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
@@ -95,6 +147,91 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
 
+    # In-process cache of recent chat turns, flushed to Postgres in batches
+    CONVERSATION_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    CONVERSATION_HISTORY_TURNS: int = 20
+    CONVERSATION_FLUSH_BATCH_SIZE: int = 50
+    CONVERSATION_FLUSH_INTERVAL_SECONDS: float = 5.0
+
+    # Token budget for chat history sent along with each OpenAI call
+    OPENAI_CONTEXT_MAX_TOKENS: int = 1024
+    OPENAI_CONTEXT_KEEP_TURNS: int = 4
+    OPENAI_SUMMARY_STALE_TURNS: int = 6
+    # format_price_msg asks for a typed price_reply tool call instead of
+    # newline separated text
+    OPENAI_STRUCTURED_OUTPUT: bool = True
+
+    # Model route of each OpenAI call: model, fallback chain tried in order
+    # on connection, rate limit or server errors, timeout and max tokens
+    OPENAI_URL_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_URL_FALLBACK_MODELS: list[str] = []
+    OPENAI_URL_TIMEOUT_SECONDS: float = 15.0
+    OPENAI_URL_MAX_TOKENS: int = 200
+    OPENAI_FORMAT_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_FORMAT_FALLBACK_MODELS: list[str] = []
+    OPENAI_FORMAT_TIMEOUT_SECONDS: float = 20.0
+    OPENAI_FORMAT_MAX_TOKENS: int = 200
+    OPENAI_SUMMARY_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_SUMMARY_FALLBACK_MODELS: list[str] = []
+    OPENAI_SUMMARY_TIMEOUT_SECONDS: float = 20.0
+    OPENAI_SUMMARY_MAX_TOKENS: int = 150
+    # Simple lookups go first to the fast model and comparisons to the
+    # strong one, ahead of the route's own chain
+    OPENAI_COMPLEXITY_ROUTING: bool = False
+    OPENAI_FAST_MODEL: str = "gpt-4o-mini"
+    OPENAI_STRONG_MODEL: str = "gpt-4o"
+
+    # Per-user OpenAI token quotas (None for no limit), checked in memory and
+    # synced with the llmusage table
+    LLM_DAILY_TOKEN_QUOTA: int | None = None
+    LLM_MONTHLY_TOKEN_QUOTA: int | None = None
+    LLM_USAGE_SYNC_INTERVAL_SECONDS: float = 30.0
+
+    # Multi-product queries: products resolved concurrently, partial replies
+    # go out at the deadline and stragglers are dropped at the timeout
+    PRODUCT_MAX_PER_MESSAGE: int = 5
+    PRODUCT_FANOUT_LIMIT: int = 4
+    PRODUCT_REPLY_DEADLINE_SECONDS: float = 8.0
+    PRODUCT_REPLY_TIMEOUT_SECONDS: float = 30.0
+    SCRAPER_TIMEOUT_SECONDS: float = 10.0
+
+    # Offer ranking converts USD prices to ARS at this rate
+    USD_ARS_RATE: float = 1200.0
+
+    # Cached product answers (URL, scraped data and WhatsApp messages)
+    PRICE_CACHE_MAX_ENTRIES: int = 10_000
+    PRICE_URL_CACHE_TTL_SECONDS: float = 24 * 60 * 60
+    PRICE_ANSWER_CACHE_TTL_SECONDS: float = 15 * 60
+    # Candidate URLs asked per product, the best ranked ones are scraped in
+    # parallel and the first page with a price wins
+    PRICE_URL_CANDIDATES: int = 4
+    PRICE_URL_PARALLEL_FETCHES: int = 3
+    # Scrape predicted search pages while the LLM resolves the candidates
+    PRICE_SPECULATIVE_SCRAPING: bool = False
+    # Formatted messages are reused as templates, re-filled with new prices
+    FORMAT_TEMPLATE_TTL_SECONDS: float = 6 * 60 * 60
+    FORMAT_TEMPLATE_MAX_REUSES: int = 20
+
+    # Backend of the price, template and other caches: "memory" is per
+    # worker, "postgres" an UNLOGGED table shared by every worker and "mmap"
+    # a memory-mapped file shared by the workers of one host
+    CACHE_BACKEND: Literal["memory", "postgres", "mmap"] = "memory"
+    CACHE_MMAP_DIR: str = "/tmp/wa-gpt-bot-cache"
+    # Larger values aren't cached by the mmap backend
+    CACHE_MMAP_SLOT_BYTES: int = 4096
+
+    # Popular products are tracked with a time-decayed query counter and
+    # refreshed in the background before their cached answer expires
+    QUERY_FREQUENCY_HALF_LIFE_SECONDS: float = 6 * 60 * 60
+    QUERY_FREQUENCY_FLUSH_INTERVAL_SECONDS: float = 30.0
+    CACHE_WARMER_ENABLED: bool = False
+    CACHE_WARMER_INTERVAL_SECONDS: float = 60.0
+    CACHE_WARMER_TOP_N: int = 50
+    CACHE_WARMER_CONCURRENCY: int = 4
+    # Max products refreshed per run, bounds LLM and scraping spend
+    CACHE_WARMER_BUDGET: int = 20
+    CACHE_WARMER_REFRESH_MARGIN_SECONDS: float = 120.0
+
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         if value == "changethis":
             message = (
@@ -1,10 +1,155 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from contextlib import AsyncExitStack, ExitStack
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import (
+    AsyncAdaptedQueuePool,
+    Pool,
+    PoolProxiedConnection,
+    QueuePool,
+)
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Checkout latency of a connection pool, including waits and pre-ping."""
+
+    # Upper bounds in seconds of the latency histogram buckets
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            # One count per bucket plus the overflow bucket
+            self.histogram = [0] * (len(self.BUCKETS) + 1)
+
+    def observe(self, seconds: float, *, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += not timed_out
+            self.timeouts += timed_out
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            self.histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    def snapshot(self, pool: Pool) -> dict[str, Any]:
+        live: dict[str, Any] = {}
+        if isinstance(pool, QueuePool):
+            live = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # Negative while the pool itself isn't full yet
+                "overflow": max(pool.overflow(), 0),
+            }
+        with self._lock:
+            labels = [f"le_{bound}" for bound in self.BUCKETS] + ["le_inf"]
+            return live | {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds": self.wait_seconds,
+                "mean_wait_seconds": (
+                    self.wait_seconds / self.checkouts if self.checkouts else 0.0
+                ),
+                "max_wait_seconds": self.max_wait_seconds,
+                "checkout_latency": dict(zip(labels, self.histogram, strict=True)),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """`QueuePool` that times every checkout into `metrics`."""
+
+    # Per class rather than per instance, so it survives `Pool.recreate`
+    metrics = PoolMetrics()
+
+    def connect(self) -> PoolProxiedConnection:
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def engine_options() -> dict[str, Any]:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {"prepare_threshold": settings.DB_PREPARE_THRESHOLD},
+    }
+
+
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=InstrumentedQueuePool,
+    **engine_options(),
+)
+# Same database through psycopg's asyncio driver, for the async routers
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=InstrumentedAsyncQueuePool,
+    **engine_options(),
+)
+
+
+def pool_metrics() -> dict[str, dict[str, Any]]:
+    return {
+        "sync": InstrumentedQueuePool.metrics.snapshot(engine.pool),
+        "async": InstrumentedAsyncQueuePool.metrics.snapshot(async_engine.pool),
+    }
+
+
+def _warm_sync_pool(connections: int) -> None:
+    with ExitStack() as stack:
+        for _ in range(connections):
+            stack.enter_context(engine.connect())
+
+
+async def warm_up_pools(connections: int | None = None) -> None:
+    """Open `connections` (DB_POOL_SIZE) of each pool ahead of the first requests."""
+    connections = settings.DB_POOL_SIZE if connections is None else connections
+    started = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(
+            *(
+                stack.enter_async_context(async_engine.connect())
+                for _ in range(connections)
+            ),
+            asyncio.to_thread(_warm_sync_pool, connections),
+        )
+    logger.info(
+        "Opened %d connections per pool in %.2fs, up to %d per worker",
+        connections,
+        time.perf_counter() - started,
+        2 * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+    )
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
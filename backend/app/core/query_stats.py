@@ -0,0 +1,64 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Engine, event
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count the SQL statements run in this context and the time they took.
+
+    The context is copied into tasks, threads run by Starlette and
+    SQLAlchemy's greenlets, which all add to the same stats.
+    """
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current_stats() -> QueryStats | None:
+    """Stats of the enclosing `track_queries`, None outside of one."""
+    return _current.get()
+
+
+# Registered on the Engine class, so every engine, the async ones too
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn: Any, *_: Any) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn: Any, *_: Any) -> None:
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started.pop()
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed(context: Any) -> None:
+    started = (
+        context.connection.info.get("query_started") if context.connection else None
+    )
+    if started:
+        started.pop()
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+import psycopg
+from sqlalchemy import event, func, make_url, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import ORMExecuteState
+from sqlalchemy.util import await_only
+from sqlmodel import Session
+
+from app.core.cache import CacheBackend, PostgresCache, TTLCache
+from app.core.config import settings
+from app.core.db import async_engine, engine, engine_options
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind, 0 on a server that isn't replaying WAL.
+# Also 0 once it replayed all the WAL it received: the last replayed
+# transaction then only tells how long the primary has been idle
+_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+# `mark_write` NOTIFYs the id of the user on this channel
+CHANNEL = "replica_sticky"
+
+
+@dataclass
+class ReplicaStatus:
+    engine: AsyncEngine
+    # None until the first check, or when the last one failed
+    lag: float | None = None
+    checked_at: float = 0.0
+
+
+class ReplicaRouter:
+    """
+    Pick the engine of a read-only request.
+
+    Reads go to a random replica that is within `max_lag`, unless the user
+    wrote something in the last `sticky_seconds`, so they see their own
+    writes. Without a usable replica they go to the primary.
+
+    The users who wrote are kept in `sticky`, which must be shared by every
+    worker, as the next request of a user can land on any of them. Each
+    worker also keeps them in `recent`, for its own writes and the ones its
+    listener hears of. Once it has been listening for `sticky_seconds`,
+    `recent` has every user still sticky and `sticky` isn't queried.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        *,
+        max_lag: float,
+        sticky: CacheBackend,
+        sticky_seconds: float,
+    ) -> None:
+        self.primary = primary
+        self.replicas = [ReplicaStatus(engine) for engine in replicas]
+        self.max_lag = max_lag
+        self.sticky = sticky
+        self.sticky_seconds = sticky_seconds
+        self.recent = TTLCache(max_entries=100_000, default_ttl=sticky_seconds)
+        # Monotonic time the listener connected, None while it isn't
+        self.listening_since: float | None = None
+
+    def healthy(self) -> list[AsyncEngine]:
+        return [
+            status.engine
+            for status in self.replicas
+            if status.lag is not None and status.lag <= self.max_lag
+        ]
+
+    async def engine_for(self, user_id: uuid.UUID | None) -> AsyncEngine:
+        if not self.replicas:
+            return self.primary
+        healthy = self.healthy()
+        if not healthy:
+            return self.primary
+        if user_id is not None and await self.is_sticky(user_id):
+            return self.primary
+        return random.choice(healthy)
+
+    async def is_sticky(self, user_id: uuid.UUID) -> bool:
+        key = str(user_id)
+        if self.recent.get(key) is not None:
+            return True
+        # Marks made before the listener connected may still be live
+        if (
+            self.listening_since is not None
+            and time.monotonic() - self.listening_since >= self.sticky_seconds
+        ):
+            return False
+        return await self.sticky.aget(key) is not None
+
+    async def mark_write(self, user_id: uuid.UUID) -> None:
+        if not self.replicas:
+            return
+        key = str(user_id)
+        # First in this worker, so its own reads stick even if the rest fails
+        self.recent.set(key, True, self.sticky_seconds)
+        await self.sticky.aset(key, True, self.sticky_seconds)
+        async with self.primary.connect() as connection:
+            await connection.execute(select(func.pg_notify(CHANNEL, key)))
+            await connection.commit()
+
+    async def check_lag(self) -> None:
+        for status in self.replicas:
+            try:
+                async with status.engine.connect() as connection:
+                    status.lag = float((await connection.execute(_LAG)).scalar_one())
+            except Exception as e:
+                if status.lag is not None:
+                    logger.warning("Replica %s unreachable: %s", status.engine.url, e)
+                status.lag = None
+            status.checked_at = time.monotonic()
+
+    async def dispose(self) -> None:
+        for status in self.replicas:
+            await status.engine.dispose()
+
+    def report(self) -> list[dict[str, object]]:
+        return [
+            {
+                "replica": status.engine.url.render_as_string(hide_password=True),
+                "lag_seconds": status.lag,
+                "healthy": status.lag is not None and status.lag <= self.max_lag,
+            }
+            for status in self.replicas
+        ]
+
+
+class WriteTrackingSession(Session):
+    """
+    Session of the primary that remembers when the request's user wrote.
+
+    `get_current_user` puts the user id in `info`, committed flushes and DML
+    statements then mark the user as sticky to the primary. Only for the sync
+    session of an AsyncSession: the mark is awaited before the commit returns.
+    """
+
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _flushed(session: Session, _: object) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(WriteTrackingSession, "do_orm_execute")
+def _executed(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(WriteTrackingSession, "after_commit")
+def _committed(session: Session) -> None:
+    user_id = session.info.get("user_id")
+    if session.info.pop("wrote", False) and user_id is not None:
+        # The write is committed, failing the request now would hide that.
+        # The other workers may then read from a replica for a while
+        try:
+            # Runs in the AsyncSession's greenlet, which can await on the loop
+            await_only(replica_router.mark_write(user_id))
+        except Exception:
+            logger.exception("Marking user %s as sticky to the primary failed", user_id)
+
+
+@event.listens_for(WriteTrackingSession, "after_rollback")
+def _rolled_back(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+def _make_router() -> ReplicaRouter:
+    return ReplicaRouter(
+        async_engine,
+        [
+            create_async_engine(uri, **engine_options())
+            for uri in settings.POSTGRES_REPLICA_URIS
+        ],
+        max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+        # In Postgres whatever CACHE_BACKEND is, the in-process and mmap
+        # backends aren't shared by the workers of other hosts
+        sticky=PostgresCache(
+            "replica_sticky",
+            engine=engine,
+            max_entries=100_000,
+            default_ttl=settings.REPLICA_READ_YOUR_WRITES_SECONDS,
+        ),
+        sticky_seconds=settings.REPLICA_READ_YOUR_WRITES_SECONDS,
+    )
+
+
+replica_router = _make_router()
+
+
+async def run_replica_sticky_listener(
+    conninfo: str | None = None, *, retry_seconds: float = 5.0
+) -> None:
+    """LISTEN for the writes of other workers and keep them in `recent`."""
+    if conninfo is None:
+        url = make_url(str(settings.SQLALCHEMY_DATABASE_URI))
+        conninfo = url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(
+                conninfo, autocommit=True
+            ) as connection:
+                await connection.execute(f"LISTEN {CHANNEL}")
+                replica_router.listening_since = time.monotonic()
+                async for notify in connection.notifies():
+                    replica_router.recent.set(
+                        notify.payload, True, replica_router.sticky_seconds
+                    )
+        except Exception as e:
+            logger.warning("Replica sticky listener disconnected: %s", e)
+        finally:
+            replica_router.listening_since = None
+        await asyncio.sleep(retry_seconds)
+
+
+async def run_replica_monitor(interval: float | None = None) -> None:
+    interval = (
+        settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS if interval is None else interval
+    )
+    while True:
+        try:
+            await replica_router.check_lag()
+        except Exception:
+            logger.exception("Replica lag check failed")
+        await asyncio.sleep(interval)
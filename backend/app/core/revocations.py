@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import col
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models import TokenPayload, UserRevocation
+
+logger = logging.getLogger(__name__)
+
+
+class Revocations:
+    """
+    Users revoked within the lifetime of a token, with the Unix time they
+    were revoked at, reloaded from the `userrevocation` table.
+
+    Revocations older than a token's lifetime can't apply to any valid token
+    and are pruned on reload.
+    """
+
+    def __init__(self, *, refresh_interval: float) -> None:
+        self.refresh_interval = refresh_interval
+        self.revoked: dict[uuid.UUID, float] = {}
+        # Monotonic time of the last reload, 0 before the first one
+        self.loaded_at = 0.0
+        # When the reload that set `revoked` started
+        self._started_at = 0.0
+
+    def fresh(self) -> bool:
+        return (
+            self.loaded_at > 0
+            and time.monotonic() - self.loaded_at < 2 * self.refresh_interval
+        )
+
+    def allows(self, token_data: TokenPayload) -> bool:
+        """
+        Whether the claims of the token can be trusted. Not when the
+        revocations are stale, or the user was revoked after the token was
+        issued, or in the same second.
+        """
+        if token_data.sub is None or token_data.iat is None or not self.fresh():
+            return False
+        try:
+            user_id = uuid.UUID(token_data.sub)
+        except ValueError:
+            return False
+        revoked_at = self.revoked.get(user_id)
+        return revoked_at is None or token_data.iat > revoked_at
+
+    async def refresh(self, db_engine: AsyncEngine = async_engine) -> None:
+        started = time.monotonic()
+        lifetime = func.make_interval(
+            0, 0, 0, 0, 0, settings.ACCESS_TOKEN_EXPIRE_MINUTES
+        )
+        async with db_engine.begin() as connection:
+            await connection.execute(
+                delete(UserRevocation).where(
+                    col(UserRevocation.revoked_at) < func.now() - lifetime
+                )
+            )
+            rows = await connection.execute(
+                select(
+                    col(UserRevocation.user_id),
+                    func.extract("epoch", col(UserRevocation.revoked_at)),
+                )
+            )
+            revoked = {user_id: float(epoch) for user_id, epoch in rows}
+        # A reload that started later and finished first has newer rows
+        if started < self._started_at:
+            return
+        self._started_at = started
+        self.revoked = revoked
+        self.loaded_at = time.monotonic()
+
+
+revocations = Revocations(refresh_interval=settings.TOKEN_REVOCATIONS_REFRESH_SECONDS)
+
+
+async def run_revocations_refresh(interval: float | None = None) -> None:
+    interval = revocations.refresh_interval if interval is None else interval
+    while True:
+        try:
+            await revocations.refresh()
+        except Exception:
+            logger.exception("Reloading token revocations failed")
+        await asyncio.sleep(interval)
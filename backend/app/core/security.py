@@ -1,10 +1,14 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.models import TokenPayload
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -12,13 +16,54 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
 
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
-    expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+def create_access_token(
+    subject: str | Any,
+    expires_delta: timedelta,
+    *,
+    is_active: bool | None = None,
+    is_superuser: bool | None = None,
+) -> str:
+    """
+    With `is_active` and `is_superuser`, read-only routes can authorize the
+    token from its claims, see `get_authorized_user`.
+    """
+    now = datetime.now(timezone.utc)
+    to_encode: dict[str, Any] = {
+        "exp": now + expires_delta,
+        "iat": now,
+        "sub": str(subject),
+    }
+    if is_active is not None:
+        to_encode["is_active"] = is_active
+    if is_superuser is not None:
+        to_encode["is_superuser"] = is_superuser
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+# Keyed by digest, the cache doesn't hold usable tokens. Kept per worker,
+# verifying a token costs less than looking it up in a shared cache.
+_verified_tokens = TTLCache(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES, default_ttl=0)
+
+
+def decode_access_token(token: str) -> TokenPayload:
+    """
+    Verified claims of `token`. Tokens are verified once and their claims
+    cached until they expire.
+
+    Raises jwt's InvalidTokenError or pydantic's ValidationError for tokens
+    that aren't valid.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    token_data: TokenPayload | None = _verified_tokens.get(key)
+    if token_data is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        token_data = TokenPayload(**payload)
+        if token_data.exp is not None:
+            _verified_tokens.set(key, token_data, token_data.exp - time.time())
+    return token_data
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any
+
+import psycopg
+from sqlalchemy import make_url
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+# Triggers on the user table NOTIFY the id of every updated or deleted user
+# on this channel, see migration b3e8f1d6a275
+CHANNEL = "user_cache"
+
+
+class UserCache:
+    """
+    Active users by id, for `get_current_user`.
+
+    Entries are dropped when the user changes: right away in the worker that
+    made the change, and in every other worker and node when the NOTIFY of
+    the user table's triggers reaches their listener. The cache is only used
+    while the listener is connected, and entries expire after `ttl` seconds
+    in any case.
+
+    Always in the worker's memory whatever CACHE_BACKEND is: NOTIFY already
+    keeps the workers in sync, and `get` runs on the event loop, which a
+    shared backend's round trip would block.
+    """
+
+    def __init__(self, cache: TTLCache, *, ttl: float) -> None:
+        self.cache = cache
+        self.ttl = ttl
+        self.listening = False
+        self.invalidations = 0
+        # Database lookups of missed users, to estimate what hits save
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.listening and self.ttl > 0
+
+    async def get(
+        self, session: AsyncSession, user_id: str | uuid.UUID | None
+    ) -> User | None:
+        """
+        The user, from the cache or loaded by `session`. Cached users are
+        attached to `session` without a query, like loaded ones.
+        """
+        if self.enabled:
+            data = self.cache.get(str(user_id))
+            if data is not None:
+                user = User(**{**data, "id": uuid.UUID(data["id"])})
+                make_transient_to_detached(user)
+                session.add(user)
+                return user
+        invalidations = self.invalidations
+        started = time.perf_counter()
+        loaded = await session.get(User, user_id)
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - started
+        # Not if it changed while it was loaded, the copy may be stale
+        if (
+            loaded is not None
+            and loaded.is_active
+            and self.enabled
+            and invalidations == self.invalidations
+        ):
+            self.cache.set(str(loaded.id), loaded.model_dump(mode="json"), self.ttl)
+        return loaded
+
+    def drop(self, user_id: str | uuid.UUID) -> None:
+        self.invalidations += 1
+        self.cache.delete(str(user_id))
+
+    def clear(self) -> None:
+        self.invalidations += 1
+        self.cache.clear()
+
+    def report(self) -> dict[str, Any]:
+        stats = self.cache.stats
+        lookup = self.lookup_seconds / self.lookups if self.lookups else 0.0
+        return {
+            "enabled": self.enabled,
+            "hits": stats.hits,
+            "misses": stats.misses,
+            "hit_rate": stats.hit_rate,
+            "invalidations": self.invalidations,
+            "db_lookup_ms": lookup * 1000,
+            # Each hit saves a lookup
+            "db_seconds_saved": stats.hits * lookup,
+        }
+
+
+user_cache = UserCache(
+    TTLCache(
+        max_entries=settings.USER_CACHE_MAX_ENTRIES,
+        default_ttl=settings.USER_CACHE_TTL_SECONDS,
+    ),
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+
+async def run_user_cache_listener(
+    conninfo: str | None = None, *, retry_seconds: float = 5.0
+) -> None:
+    """LISTEN for changed users on a dedicated connection and drop them."""
+    if conninfo is None:
+        url = make_url(str(settings.SQLALCHEMY_DATABASE_URI))
+        conninfo = url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(
+                conninfo, autocommit=True
+            ) as connection:
+                await connection.execute(f"LISTEN {CHANNEL}")
+                # Changes made while nobody was listening were missed
+                user_cache.clear()
+                user_cache.listening = True
+                async for notify in connection.notifies():
+                    user_cache.drop(notify.payload)
+        except Exception as e:
+            logger.warning("User cache listener disconnected: %s", e)
+        finally:
+            user_cache.listening = False
+        await asyncio.sleep(retry_seconds)
@@ -1,33 +1,60 @@
+import asyncio
 import uuid
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import ColumnElement, insert, text, update
+from sqlmodel import Session, col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.core.user_cache import user_cache
+from app.models import (
+    Item,
+    ItemCount,
+    ItemCreate,
+    TableCount,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+
+# Writes are INSERT and UPDATE ... RETURNING statements, the row comes back
+# with the write instead of with a SELECT after the commit. Objects stay
+# loaded only in sessions with expire_on_commit=False, like those of
+# get_db and get_async_db.
+
+
+def _user_changes(user_in: UserUpdate, hashed_password: str | None) -> dict[str, Any]:
+    changes = user_in.model_dump(exclude_unset=True, exclude={"password"})
+    if hashed_password is not None:
+        changes["hashed_password"] = hashed_password
+    return changes
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
     db_obj = User.model_validate(
         user_create, update={"hashed_password": get_password_hash(user_create.password)}
     )
-    session.add(db_obj)
+    statement = insert(User).values(db_obj.model_dump()).returning(User)
+    db_obj = session.scalars(statement).one()
     session.commit()
-    session.refresh(db_obj)
     return db_obj
 
 
 def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
-    user_data = user_in.model_dump(exclude_unset=True)
-    extra_data = {}
-    if "password" in user_data:
-        password = user_data["password"]
-        hashed_password = get_password_hash(password)
-        extra_data["hashed_password"] = hashed_password
-    db_user.sqlmodel_update(user_data, update=extra_data)
-    session.add(db_user)
+    hashed_password = None
+    if user_in.password is not None:
+        hashed_password = get_password_hash(user_in.password)
+    changes = _user_changes(user_in, hashed_password)
+    if not changes:
+        return db_user
+    statement = (
+        update(User).where(col(User.id) == db_user.id).values(changes).returning(User)
+    )
+    db_user = session.scalars(statement).one()
     session.commit()
-    session.refresh(db_user)
+    user_cache.drop(db_user.id)
     return db_user
 
 
@@ -48,7 +75,93 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
 
 def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
     db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
-    session.add(db_item)
+    statement = insert(Item).values(db_item.model_dump()).returning(Item)
+    db_item = session.scalars(statement).one()
     session.commit()
-    session.refresh(db_item)
     return db_item
+
+
+# Async versions for the routers on `AsyncSessionDep`. Password hashing is
+# CPU bound, so it runs in a thread instead of blocking the event loop.
+
+
+async def create_user_async(*, session: AsyncSession, user_create: UserCreate) -> User:
+    hashed_password = await asyncio.to_thread(get_password_hash, user_create.password)
+    db_obj = User.model_validate(
+        user_create, update={"hashed_password": hashed_password}
+    )
+    statement = insert(User).values(db_obj.model_dump()).returning(User)
+    db_obj = (await session.scalars(statement)).one()
+    await session.commit()
+    return db_obj
+
+
+async def update_user_async(
+    *, session: AsyncSession, db_user: User, user_in: UserUpdate
+) -> Any:
+    hashed_password = None
+    if user_in.password is not None:
+        hashed_password = await asyncio.to_thread(get_password_hash, user_in.password)
+    changes = _user_changes(user_in, hashed_password)
+    if not changes:
+        return db_user
+    statement = (
+        update(User).where(col(User.id) == db_user.id).values(changes).returning(User)
+    )
+    db_user = (await session.scalars(statement)).one()
+    await session.commit()
+    user_cache.drop(db_user.id)
+    return db_user
+
+
+async def get_user_by_email_async(*, session: AsyncSession, email: str) -> User | None:
+    statement = select(User).where(User.email == email)
+    return (await session.exec(statement)).first()
+
+
+async def authenticate_async(
+    *, session: AsyncSession, email: str, password: str
+) -> User | None:
+    db_user = await get_user_by_email_async(session=session, email=email)
+    if not db_user:
+        return None
+    if not await asyncio.to_thread(verify_password, password, db_user.hashed_password):
+        return None
+    return db_user
+
+
+async def create_item_async(
+    *, session: AsyncSession, item_in: ItemCreate, owner_id: uuid.UUID
+) -> Item:
+    db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
+    statement = insert(Item).values(db_item.model_dump()).returning(Item)
+    db_item = (await session.scalars(statement)).one()
+    await session.commit()
+    return db_item
+
+
+async def estimate_rows_async(*, session: AsyncSession, table: str) -> int | None:
+    """Planner's row estimate of `table`, None before its first ANALYZE."""
+    statement = text(
+        "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+    )
+    estimate = (
+        await session.execute(statement, {"table": f'"{table}"'})
+    ).scalar_one_or_none()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+async def count_rows_async(*, session: AsyncSession, table: str) -> int:
+    """Rows of the item or user table, from the trigger kept counters."""
+    if settings.LIST_COUNT_ESTIMATES:
+        estimate = await estimate_rows_async(session=session, table=table)
+        if estimate is not None:
+            return estimate
+    total: ColumnElement[int] = func.coalesce(func.sum(TableCount.count), 0)
+    statement = select(total).where(TableCount.table_name == table)
+    return int((await session.exec(statement)).one())
+
+
+async def count_items_async(*, session: AsyncSession, owner_id: uuid.UUID) -> int:
+    statement = select(ItemCount.count).where(ItemCount.owner_id == owner_id)
+    return (await session.exec(statement)).first() or 0
@@ -0,0 +1,229 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic import ValidationError
+from sqlalchemy import Engine
+
+from app.core.db import engine
+from app.core.security import get_password_hash
+from app.models import UserCreate
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OnConflict = Literal["skip", "update"]
+
+_STAGING_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS user_import (
+        line integer, id uuid, email text, full_name text, hashed_password text
+    ) ON COMMIT DELETE ROWS
+"""
+# The last line of an email wins within a chunk, ON CONFLICT can't touch a
+# row twice. xmax is 0 for inserted rows and set for updated ones.
+_LOAD = """
+    INSERT INTO "user" (id, email, full_name, hashed_password, is_active, is_superuser)
+    SELECT DISTINCT ON (email) id, email, full_name, hashed_password, true, false
+    FROM user_import
+    ORDER BY email, line DESC
+    ON CONFLICT (email) DO {action}
+    RETURNING xmax = 0
+"""
+_ACTIONS: dict[OnConflict, str] = {
+    "skip": "NOTHING",
+    "update": "UPDATE SET full_name = EXCLUDED.full_name, "
+    "hashed_password = EXCLUDED.hashed_password",
+}
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    # Existing emails left alone, or repeated within the file
+    skipped: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def read_records(path: Path) -> Iterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Line number and fields of each user of a CSV or NDJSON file, or why the
+    line couldn't be read.
+    """
+    with path.open(newline="") as f:
+        if path.suffix.lower() in {".ndjson", ".jsonl"}:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    yield line, f"Invalid JSON: {e}"
+                    continue
+                if isinstance(record, dict):
+                    yield line, record
+                else:
+                    yield line, f"Expected a JSON object, got {type(record).__name__}"
+        else:
+            # Line 1 is the header
+            yield from enumerate(csv.DictReader(f), start=2)
+
+
+def validate(
+    records: Iterable[tuple[int, dict[str, Any] | str]], report: ImportReport
+) -> Iterator[tuple[int, UserCreate]]:
+    for line, record in records:
+        report.read += 1
+        if isinstance(record, str):
+            report.rejected += 1
+            logger.warning("Line %d rejected: %s", line, record)
+            continue
+        try:
+            user = UserCreate(
+                email=record.get("email"),
+                password=record.get("password"),
+                full_name=record.get("full_name") or None,
+            )
+        except ValidationError as e:
+            report.rejected += 1
+            logger.warning("Line %d rejected: %s", line, e.errors()[0]["msg"])
+            continue
+        yield line, user
+
+
+def _existing_emails(cursor: Any, emails: list[str]) -> set[str]:
+    cursor.execute('SELECT email FROM "user" WHERE email = ANY(%s)', (emails,))
+    return {email for (email,) in cursor.fetchall()}
+
+
+def load_chunk(
+    connection: Any,
+    chunk: list[tuple[int, UserCreate]],
+    *,
+    executor: Executor,
+    on_conflict: OnConflict,
+) -> tuple[int, int]:
+    """Hash and COPY one chunk in a transaction. Returns inserted, updated."""
+    # The last line of an email wins, the others would be hashed for nothing
+    chunk = list({user.email: (line, user) for line, user in chunk}.values())
+    with connection.cursor() as cursor:
+        if on_conflict == "skip":
+            # Don't spend bcrypt time on users that won't be written
+            existing = _existing_emails(cursor, [user.email for _, user in chunk])
+            chunk = [(line, user) for line, user in chunk if user.email not in existing]
+            # Not left idle in a transaction while the chunk is hashed
+            connection.commit()
+        hashes = list(
+            executor.map(
+                get_password_hash,
+                [user.password for _, user in chunk],
+                chunksize=max(1, len(chunk) // (4 * (os.cpu_count() or 1))),
+            )
+        )
+        cursor.execute(_STAGING_TABLE)
+        with cursor.copy(
+            "COPY user_import (line, id, email, full_name, hashed_password) FROM STDIN"
+        ) as copy:
+            for (line, user), hashed in zip(chunk, hashes, strict=True):
+                copy.write_row((line, uuid.uuid4(), user.email, user.full_name, hashed))
+        cursor.execute(_LOAD.format(action=_ACTIONS[on_conflict]))
+        written = [inserted for (inserted,) in cursor.fetchall()]
+    connection.commit()
+    inserted = sum(written)
+    return inserted, len(written) - inserted
+
+
+def import_users(
+    path: Path,
+    *,
+    db_engine: Engine = engine,
+    chunk_size: int = 1000,
+    workers: int | None = None,
+    on_conflict: OnConflict = "skip",
+) -> ImportReport:
+    """
+    Stream users from `path` into the user table.
+
+    Passwords are hashed by `workers` processes, all cores by default, and
+    each chunk is copied into a staging table and inserted in one statement
+    and one transaction, so an interrupted import can be run again.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    users = validate(read_records(path), report)
+    raw = db_engine.raw_connection()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while chunk := list(islice(users, chunk_size)):
+                inserted, updated = load_chunk(
+                    raw.driver_connection,
+                    chunk,
+                    executor=executor,
+                    on_conflict=on_conflict,
+                )
+                report.inserted += inserted
+                report.updated += updated
+                report.skipped += len(chunk) - inserted - updated
+                report.seconds = time.perf_counter() - started
+                logger.info(
+                    "%d rows: %d inserted, %d updated, %d skipped, %d rejected "
+                    "(%.0f rows/s)",
+                    report.read,
+                    report.inserted,
+                    report.updated,
+                    report.skipped,
+                    report.rejected,
+                    report.rows_per_second,
+                )
+    finally:
+        raw.close()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Import users from a CSV (with a header) or NDJSON file "
+        "with email, password and optional full_name fields"
+    )
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="hashing processes, all cores"
+    )
+    parser.add_argument(
+        "--on-conflict",
+        choices=["skip", "update"],
+        default="skip",
+        help="for emails already registered: keep them or reset name and password",
+    )
+    args = parser.parse_args()
+
+    logger.info("Importing users from %s", args.path)
+    report = import_users(
+        args.path,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        on_conflict=args.on_conflict,
+    )
+    logger.info("Import done: %s", report)
+
+
+if __name__ == "__main__":
+    main()
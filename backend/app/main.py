@@ -1,10 +1,33 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.core.config import settings
+from app.core.db import async_engine, warm_up_pools
+from app.core.query_stats import track_queries
+from app.core.replicas import (
+    replica_router,
+    run_replica_monitor,
+    run_replica_sticky_listener,
+)
+from app.core.revocations import run_revocations_refresh
+from app.core.user_cache import run_user_cache_listener
+from app.services.conversation_store import (
+    flush_conversations,
+    run_conversation_flush,
+)
+from app.services.llm_usage import run_usage_sync
+from app.services.query_frequency import flush_queries, run_query_flush
+from app.services.user_deletion import resume_deletions
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,10 +37,51 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    if settings.DB_POOL_WARMUP:
+        try:
+            await warm_up_pools()
+        except Exception:
+            logger.exception("Database pool warm-up failed")
+    tasks = [
+        asyncio.create_task(run_usage_sync()),
+        asyncio.create_task(resume_deletions()),
+        asyncio.create_task(run_conversation_flush()),
+        asyncio.create_task(run_query_flush()),
+    ]
+    if replica_router.replicas:
+        tasks.append(asyncio.create_task(run_replica_monitor()))
+        tasks.append(asyncio.create_task(run_replica_sticky_listener()))
+    if settings.USER_CACHE_TTL_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_user_cache_listener()))
+    if settings.TOKEN_CLAIMS_AUTH:
+        tasks.append(asyncio.create_task(run_revocations_refresh()))
+    if settings.CACHE_WARMER_ENABLED:
+        # Imported here, the OpenAI client needs OPENAI_API_KEY at import time
+        from app.services.cache_warmer import run_cache_warmer
+
+        tasks.append(asyncio.create_task(run_cache_warmer()))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Turns and query counts still pending would be lost with the worker
+    for flush in (flush_conversations, flush_queries):
+        try:
+            await asyncio.to_thread(flush)
+        except Exception:
+            logger.exception("%s at shutdown failed", flush.__name__)
+    # Pooled async connections belong to this event loop
+    await async_engine.dispose()
+    await replica_router.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -31,3 +95,22 @@ if settings.all_cors_origins:
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+if settings.ENVIRONMENT != "production":
+
+    @app.middleware("http")
+    async def add_query_stats(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        with track_queries() as stats:
+            response = await call_next(request)
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+        if stats.count > settings.QUERY_COUNT_WARNING_THRESHOLD:
+            logger.warning(
+                "%s %s ran %d SQL statements",
+                request.method,
+                request.url.path,
+                stats.count,
+            )
+        return response
@@ -1,6 +1,10 @@
 import uuid
+from datetime import date, datetime, timezone
+from typing import Any
 
 from pydantic import EmailStr
+from sqlalchemy import BigInteger, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, Relationship, SQLModel
 
 
@@ -44,6 +48,9 @@ class User(UserBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
     items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
+    conversations: list["Conversation"] = Relationship(
+        back_populates="user", cascade_delete=True
+    )
 
 
 # Properties to return via API, id is always required
@@ -53,7 +60,9 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    # None when the count wasn't asked for
+    count: int | None
+    next_cursor: str | None = None
 
 
 # Shared properties
@@ -72,8 +81,16 @@ class ItemUpdate(ItemBase):
     title: str | None = Field(default=None, min_length=1, max_length=255)  # type: ignore
 
 
+# Properties to receive on bulk item update, one per item
+class ItemBulkUpdate(ItemUpdate):
+    id: uuid.UUID
+
+
 # Database model, database table inferred from class name
 class Item(ItemBase, table=True):
+    # Keyset pagination of an owner's items
+    __table_args__ = (Index("ix_item_owner_id_id", "owner_id", "id"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
@@ -89,7 +106,135 @@ class ItemPublic(ItemBase):
 
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    # None when the count wasn't asked for
+    count: int | None
+    next_cursor: str | None = None
+
+
+# Database model, one WhatsApp chat per user
+class Conversation(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    user_id: uuid.UUID = Field(
+        foreign_key="user.id", nullable=False, ondelete="CASCADE", index=True
+    )
+    created_at: datetime = Field(  # type: ignore
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+    user: User | None = Relationship(back_populates="conversations")
+    messages: list["ChatMessage"] = Relationship(
+        back_populates="conversation", cascade_delete=True
+    )
+
+
+# Database model, a single turn of a conversation
+class ChatMessage(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_chatmessage_conversation_id_created_at", "conversation_id", "created_at"
+        ),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    conversation_id: uuid.UUID = Field(
+        foreign_key="conversation.id", nullable=False, ondelete="CASCADE"
+    )
+    role: str = Field(max_length=16)
+    content: str
+    created_at: datetime = Field(  # type: ignore
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+    conversation: Conversation | None = Relationship(back_populates="messages")
+
+
+# Database model, time-decayed query counter per canonical product
+class ProductQueryStat(SQLModel, table=True):
+    product: str = Field(primary_key=True, max_length=255)
+    score: float = 0.0
+    updated_at: datetime = Field(  # type: ignore
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+
+
+# OpenAI tokens spent per user and UTC day
+class LLMUsage(SQLModel, table=True):
+    user_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    day: date = Field(primary_key=True)
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+# Shared cache entries of app.core.cache.PostgresCache. UNLOGGED, the table
+# skips the WAL and is emptied after a crash.
+class CacheEntry(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_cacheentry_namespace_expires_at", "namespace", "expires_at"),
+        {"prefixes": ["UNLOGGED"]},
+    )
+
+    namespace: str = Field(primary_key=True, max_length=64)
+    key: str = Field(primary_key=True)
+    value: Any = Field(sa_type=JSONB)
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True))  # type: ignore
+
+
+# Items of each owner, kept up to date by triggers on item
+class ItemCount(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    count: int = Field(default=0, sa_type=BigInteger)
+
+
+# Rows of the item and user tables, kept up to date by triggers. Each write
+# adds to a random shard so concurrent inserts don't queue on a single row.
+class TableCount(SQLModel, table=True):
+    table_name: str = Field(primary_key=True, max_length=64)
+    shard: int = Field(primary_key=True)
+    count: int = Field(default=0, sa_type=BigInteger)
+
+
+# Users deleted in the background, see app.services.user_deletion. No
+# foreign key, the row outlives the user to report how the purge went.
+class UserDeletion(SQLModel, table=True):
+    user_id: uuid.UUID = Field(primary_key=True)
+    email: str = Field(max_length=255)
+    items_total: int = Field(default=0, sa_type=BigInteger)
+    items_deleted: int = Field(default=0, sa_type=BigInteger)
+    requested_at: datetime = Field(  # type: ignore
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+    finished_at: datetime | None = Field(  # type: ignore
+        default=None, sa_type=DateTime(timezone=True)
+    )
+
+
+# Users whose tokens issued before `revoked_at` can't be authorized from
+# their claims, written by triggers on the user table when a user is
+# deactivated, gains or loses superuser rights, or is deleted. No foreign
+# key, deleted users are revoked too.
+class UserRevocation(SQLModel, table=True):
+    user_id: uuid.UUID = Field(primary_key=True)
+    revoked_at: datetime = Field(sa_type=DateTime(timezone=True))  # type: ignore
+
+
+class UserDeletionPublic(SQLModel):
+    user_id: uuid.UUID
+    email: str
+    items_total: int
+    items_deleted: int
+    requested_at: datetime
+    finished_at: datetime | None
+
+
+class UserDeletionsPublic(SQLModel):
+    data: list[UserDeletionPublic]
 
 
 # Generic message
@@ -106,6 +251,11 @@ class Token(SQLModel):
 # Contents of JWT token
 class TokenPayload(SQLModel):
     sub: str | None = None
+    exp: int | None = None
+    iat: int | None = None
+    # Optional claims of the user as they were when the token was issued
+    is_active: bool | None = None
+    is_superuser: bool | None = None
 
 
 class NewPassword(SQLModel):
@@ -0,0 +1,163 @@
+# backend/app/services/cache_warmer.py
+
+import asyncio
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, col
+
+from app.core.cache import PostgresCache
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.models import CacheEntry
+from app.services import price_cache
+from app.services.query_frequency import canonical_product, query_tracker
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key held by the worker that runs the warmer, "warm" in ASCII
+LOCK_ID = 0x7761726D
+
+# The answer stats of every worker, each under its own key until the worker
+# stops refreshing it, so the warm hit ratio covers the hits of all of them
+worker_stats = PostgresCache(
+    "price_answer_stats",
+    engine=engine,
+    max_entries=10_000,
+    default_ttl=3 * settings.CACHE_WARMER_INTERVAL_SECONDS,
+)
+WORKER_ID = uuid.uuid4().hex
+
+
+@dataclass
+class WarmReport:
+    candidates: int
+    refreshed: int
+    failed: int
+    # Popular products whose answer was still fresh, or left for the next
+    # run because the budget ran out
+    skipped: int
+    warm_hit_ratio: float
+
+
+def _popular_products(top_n: int) -> list[str]:
+    with Session(engine) as session:
+        query_tracker.flush(session=session)
+        return query_tracker.top_products(session=session, limit=top_n)
+
+
+def publish_stats() -> None:
+    worker_stats.set(WORKER_ID, asdict(price_cache.stats))
+
+
+def shared_stats() -> price_cache.AnswerStats:
+    """Answer stats summed over the workers that published them lately."""
+    value = col(CacheEntry.value)
+    statement = select(
+        *(
+            func.coalesce(func.sum(value[field].as_integer()), 0)
+            for field in ("lookups", "hits", "warm_hits")
+        )
+    ).where(
+        col(CacheEntry.namespace) == worker_stats.namespace,
+        col(CacheEntry.expires_at) > func.now(),
+    )
+    with Session(engine) as session:
+        lookups, hits, warm_hits = session.execute(statement).one()
+    return price_cache.AnswerStats(lookups=lookups, hits=hits, warm_hits=warm_hits)
+
+
+async def warm_popular_products(
+    *,
+    top_n: int | None = None,
+    concurrency: int | None = None,
+    budget: int | None = None,
+    margin: float | None = None,
+) -> WarmReport:
+    """
+    Refresh the cached answer of the most queried products.
+
+    Only products whose answer expires within `margin` seconds are refreshed,
+    at most `budget` of them per run and `concurrency` at a time.
+    """
+    top_n = settings.CACHE_WARMER_TOP_N if top_n is None else top_n
+    concurrency = concurrency or settings.CACHE_WARMER_CONCURRENCY
+    budget = settings.CACHE_WARMER_BUDGET if budget is None else budget
+    margin = settings.CACHE_WARMER_REFRESH_MARGIN_SECONDS if margin is None else margin
+
+    products = await asyncio.to_thread(_popular_products, top_n)
+    due = [
+        product
+        for product in products
+        if await price_cache.answer_cache.attl_remaining(canonical_product(product))
+        <= margin
+    ][:budget]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient() as http:
+
+        async def refresh(product: str) -> None:
+            async with semaphore:
+                await price_cache.compute_answer(product, http=http, warmed=True)
+
+        results = await asyncio.gather(
+            *(refresh(product) for product in due), return_exceptions=True
+        )
+    failed = [r for r in results if isinstance(r, BaseException)]
+    for error in failed:
+        logger.warning("Cache warmer refresh failed: %r", error)
+
+    await asyncio.to_thread(publish_stats)
+    totals = await asyncio.to_thread(shared_stats)
+    report = WarmReport(
+        candidates=len(products),
+        refreshed=len(due) - len(failed),
+        failed=len(failed),
+        skipped=len(products) - len(due),
+        warm_hit_ratio=totals.warm_hit_ratio,
+    )
+    logger.info("Cache warmer: %s", report)
+    return report
+
+
+async def warm_if_unlocked(
+    db_engine: AsyncEngine = async_engine,
+) -> WarmReport | None:
+    """
+    `warm_popular_products`, unless another worker is already running it.
+    None when it is.
+    """
+    # Autocommit, the connection isn't left idle in a transaction during the run
+    async with db_engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        if not await connection.scalar(select(func.pg_try_advisory_lock(LOCK_ID))):
+            return None
+        try:
+            return await warm_popular_products()
+        finally:
+            await connection.execute(select(func.pg_advisory_unlock(LOCK_ID)))
+
+
+async def run_cache_warmer(interval: float | None = None) -> None:
+    """
+    Warm the answer cache every `interval` seconds.
+
+    A shared CACHE_BACKEND is warmed by one worker at a time. The in-process
+    one only serves the worker that holds it, so every worker warms its own.
+    Each worker publishes its answer stats either way.
+    """
+    interval = settings.CACHE_WARMER_INTERVAL_SECONDS if interval is None else interval
+    while True:
+        try:
+            if settings.CACHE_BACKEND == "memory":
+                await warm_popular_products()
+            else:
+                await warm_if_unlocked()
+            await asyncio.to_thread(publish_stats)
+        except Exception:
+            logger.exception("Cache warmer run failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,136 @@
+# backend/app/services/context_builder.py
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from app.services.conversation_store import Turn
+
+# Chat formatting adds a few tokens per message on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# (previous summary, turns to fold in, user whose OpenAI usage it counts against)
+Summarizer = Callable[[str | None, Sequence[Turn], uuid.UUID | None], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local estimate of the number of BPE tokens in `text`.
+
+    Each punctuation mark counts as one token and each word as one token per
+    started chunk of four characters, which slightly overestimates for common
+    Spanish and English words and so errs on the side of staying in budget.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECE_RE.findall(text))
+
+
+def message_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+@dataclass
+class _Summary:
+    text: str
+    # created_at of the newest turn folded into the summary
+    covered_until: float
+
+
+class ContextBuilder:
+    """
+    Fit conversation history into a per-call token budget.
+
+    The last `keep_turns` turns go verbatim, older turns are replaced by a
+    rolling summary that is only regenerated once `stale_after` turns have
+    fallen out of the verbatim window since the last summary.
+    """
+
+    def __init__(
+        self,
+        *,
+        summarize: Summarizer,
+        max_tokens: int,
+        keep_turns: int,
+        stale_after: int,
+        max_summaries: int = 10_000,
+    ) -> None:
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.stale_after = stale_after
+        self.max_summaries = max_summaries
+        self._summaries: OrderedDict[uuid.UUID, _Summary] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(
+        self,
+        *,
+        conversation_id: uuid.UUID | None,
+        turns: Sequence[Turn],
+        max_tokens: int | None = None,
+        user_id: uuid.UUID | None = None,
+    ) -> list[dict[str, str]]:
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        if not turns or budget <= 0:
+            return []
+        split = max(len(turns) - self.keep_turns, 0)
+        older, recent = turns[:split], turns[split:]
+
+        messages: list[dict[str, str]] = []
+        used = 0
+        # Newest turns are the most relevant, fill the budget backwards
+        for turn in reversed(recent):
+            cost = message_tokens(turn.content)
+            if used + cost > budget:
+                break
+            messages.append({"role": turn.role, "content": turn.content})
+            used += cost
+        else:
+            summary = self._summary_for(conversation_id, older, user_id)
+            if summary:
+                pending = [t for t in older if t.created_at > summary.covered_until]
+                for turn in reversed(pending):
+                    cost = message_tokens(turn.content)
+                    if used + cost > budget:
+                        break
+                    messages.append({"role": turn.role, "content": turn.content})
+                    used += cost
+                content = f"Resumen de la conversación previa: {summary.text}"
+                if used + message_tokens(content) <= budget:
+                    messages.append({"role": "system", "content": content})
+        messages.reverse()
+        return messages
+
+    def invalidate(self, conversation_id: uuid.UUID) -> None:
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+
+    def _summary_for(
+        self,
+        conversation_id: uuid.UUID | None,
+        older: Sequence[Turn],
+        user_id: uuid.UUID | None,
+    ) -> _Summary | None:
+        if not older:
+            return None
+        with self._lock:
+            cached = self._summaries.get(conversation_id) if conversation_id else None
+        covered_until = cached.covered_until if cached else float("-inf")
+        uncovered = [turn for turn in older if turn.created_at > covered_until]
+        if cached and len(uncovered) < self.stale_after:
+            return cached
+        summary = _Summary(
+            text=self.summarize(cached.text if cached else None, uncovered, user_id),
+            covered_until=older[-1].created_at,
+        )
+        if conversation_id:
+            with self._lock:
+                self._summaries[conversation_id] = summary
+                self._summaries.move_to_end(conversation_id)
+                while len(self._summaries) > self.max_summaries:
+                    self._summaries.popitem(last=False)
+        return summary
@@ -0,0 +1,295 @@
+# backend/app/services/conversation_store.py
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+from sqlmodel import Session, col, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import ChatMessage, Conversation
+
+logger = logging.getLogger(__name__)
+
+
+class Turn:
+    """A single chat turn, kept as small as possible for the in-process cache."""
+
+    __slots__ = ("role", "content", "created_at")
+
+    def __init__(self, role: str, content: str, created_at: float) -> None:
+        self.role = role
+        self.content = content
+        self.created_at = created_at
+
+    def __repr__(self) -> str:
+        return f"Turn(role={self.role!r}, content={self.content!r})"
+
+    @property
+    def nbytes(self) -> int:
+        # Roles come from a small fixed set and are interned, only the content
+        # string and the slot object itself count against the budget
+        return _TURN_OVERHEAD + sys.getsizeof(self.content)
+
+
+_TURN_OVERHEAD = sys.getsizeof(Turn("", "", 0.0))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes_used: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ConversationCache:
+    """
+    LRU of the most recent turns per conversation.
+
+    Conversations are evicted least recently used first once the approximate
+    memory used by the cached turns goes over `max_bytes`.
+    """
+
+    def __init__(self, *, max_bytes: int, max_turns: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self._entries: OrderedDict[uuid.UUID, list[Turn]] = OrderedDict()
+        self._sizes: dict[uuid.UUID, int] = {}
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id: uuid.UUID) -> list[Turn] | None:
+        with self._lock:
+            turns = self._entries.get(conversation_id)
+            if turns is None:
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self._stats.hits += 1
+            return list(turns)
+
+    def put(self, conversation_id: uuid.UUID, turns: list[Turn]) -> None:
+        with self._lock:
+            self._store(conversation_id, turns[-self.max_turns :])
+
+    def append(self, conversation_id: uuid.UUID, turn: Turn) -> None:
+        """Add a turn to a cached conversation, ignored if it is not cached."""
+        with self._lock:
+            turns = self._entries.get(conversation_id)
+            if turns is None:
+                return
+            self._store(conversation_id, (turns + [turn])[-self.max_turns :])
+
+    def discard(self, conversation_id: uuid.UUID) -> None:
+        with self._lock:
+            if conversation_id in self._entries:
+                del self._entries[conversation_id]
+                self._stats.bytes_used -= self._sizes.pop(conversation_id)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=len(self._entries),
+                bytes_used=self._stats.bytes_used,
+            )
+
+    def _store(self, conversation_id: uuid.UUID, turns: list[Turn]) -> None:
+        size = sum(turn.nbytes for turn in turns)
+        self._stats.bytes_used += size - self._sizes.get(conversation_id, 0)
+        self._entries[conversation_id] = turns
+        self._entries.move_to_end(conversation_id)
+        self._sizes[conversation_id] = size
+        # Never evict the entry that was just written, even if it alone is
+        # over budget, otherwise the next read is a guaranteed miss
+        while self._stats.bytes_used > self.max_bytes and len(self._entries) > 1:
+            evicted_id, _ = self._entries.popitem(last=False)
+            self._stats.bytes_used -= self._sizes.pop(evicted_id)
+            self._stats.evictions += 1
+
+
+class ConversationStore:
+    """
+    Conversation history backed by Postgres with a write-behind buffer.
+
+    New turns go to the cache right away and are written to the database in a
+    single multi-row INSERT once `flush_batch_size` turns are pending or the
+    oldest pending turn is older than `flush_interval`.
+    """
+
+    def __init__(
+        self,
+        *,
+        cache: ConversationCache,
+        flush_batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        self.cache = cache
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self._pending: list[tuple[uuid.UUID, Turn]] = []
+        # Taken out of _pending by a flush that hasn't committed yet
+        self._flushing: list[tuple[uuid.UUID, Turn]] = []
+        self._lock = threading.Lock()
+
+    def get_or_create_conversation(
+        self, *, session: Session, user_id: uuid.UUID
+    ) -> Conversation:
+        statement = (
+            select(Conversation)
+            .where(Conversation.user_id == user_id)
+            .order_by(col(Conversation.created_at).desc())
+            .limit(1)
+        )
+        conversation = session.exec(statement).first()
+        if conversation:
+            return conversation
+        conversation = Conversation(user_id=user_id)
+        session.add(conversation)
+        session.commit()
+        session.refresh(conversation)
+        # A brand new conversation has no history, cache it as such to avoid
+        # a pointless query on the first message
+        self.cache.put(conversation.id, [])
+        return conversation
+
+    def recent_turns(
+        self, *, session: Session, conversation_id: uuid.UUID
+    ) -> list[Turn]:
+        turns = self.cache.get(conversation_id)
+        if turns is not None:
+            return turns
+        # Before the query, a flush committing in between would otherwise
+        # leave its turns out of both
+        with self._lock:
+            unwritten = [
+                turn
+                for cid, turn in self._flushing + self._pending
+                if cid == conversation_id
+            ]
+        limit = self.cache.max_turns
+        statement = (
+            select(ChatMessage)
+            .where(ChatMessage.conversation_id == conversation_id)
+            .order_by(col(ChatMessage.created_at).desc())
+            .limit(limit)
+        )
+        rows = session.exec(statement).all()
+        turns = [
+            Turn(sys.intern(row.role), row.content, row.created_at.timestamp())
+            for row in reversed(rows)
+        ]
+        # Postgres keeps microseconds
+        written = {(t.role, t.content, round(t.created_at, 6)) for t in turns}
+        turns += [
+            turn
+            for turn in unwritten
+            if (turn.role, turn.content, round(turn.created_at, 6)) not in written
+        ]
+        turns = turns[-limit:]
+        self.cache.put(conversation_id, turns)
+        return turns
+
+    def add_turn(
+        self,
+        *,
+        session: Session,
+        conversation_id: uuid.UUID,
+        role: str,
+        content: str,
+    ) -> Turn:
+        turn = Turn(sys.intern(role), content, time.time())
+        self.cache.append(conversation_id, turn)
+        with self._lock:
+            self._pending.append((conversation_id, turn))
+            due = len(self._pending) >= self.flush_batch_size or (
+                turn.created_at - self._pending[0][1].created_at >= self.flush_interval
+            )
+        if due:
+            self.flush(session=session)
+        return turn
+
+    def flush(self, *, session: Session) -> int:
+        """Write all pending turns to the database, returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._flushing = pending
+        if not pending:
+            return 0
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "conversation_id": conversation_id,
+                "role": turn.role,
+                "content": turn.content,
+                "created_at": datetime.fromtimestamp(turn.created_at, timezone.utc),
+            }
+            for conversation_id, turn in pending
+        ]
+        try:
+            session.execute(insert(ChatMessage), rows)
+            session.commit()
+        except Exception:
+            # Put the turns back so they are retried on the next flush
+            session.rollback()
+            with self._lock:
+                self._pending = pending + self._pending
+                self._flushing = []
+            raise
+        with self._lock:
+            self._flushing = []
+        logger.debug("Flushed %d chat turns", len(rows))
+        return len(rows)
+
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+conversation_store = ConversationStore(
+    cache=ConversationCache(
+        max_bytes=settings.CONVERSATION_CACHE_MAX_BYTES,
+        max_turns=settings.CONVERSATION_HISTORY_TURNS,
+    ),
+    flush_batch_size=settings.CONVERSATION_FLUSH_BATCH_SIZE,
+    flush_interval=settings.CONVERSATION_FLUSH_INTERVAL_SECONDS,
+)
+
+
+def flush_conversations() -> int:
+    with Session(engine) as session:
+        return conversation_store.flush(session=session)
+
+
+async def run_conversation_flush(interval: float | None = None) -> None:
+    """
+    Flush pending turns every `interval` seconds, so they don't wait for the
+    next message on an idle worker.
+    """
+    interval = (
+        settings.CONVERSATION_FLUSH_INTERVAL_SECONDS if interval is None else interval
+    )
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_conversations)
+        except Exception:
+            logger.exception("Conversation flush failed")
@@ -0,0 +1,258 @@
+# backend/app/services/intent_router.py
+
+import re
+import unicodedata
+from collections.abc import Iterable
+from dataclasses import dataclass
+from enum import Enum
+
+
+class Intent(str, Enum):
+    GREETING = "greeting"
+    HELP = "help"
+    UNSUBSCRIBE = "unsubscribe"
+    PRICE_QUERY = "price_query"
+    OTHER = "other"
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    intent: Intent
+    # Product extracted from the message, only set for price queries
+    product: str | None = None
+    # True when the router couldn't decide and the message should go to the LLM
+    needs_llm: bool = False
+
+
+_NON_WORD_RE = re.compile(r"[^\w$]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+class _Node:
+    __slots__ = ("children", "label")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.label: str | None = None
+
+
+class KeywordTrie:
+    """
+    Trie of token sequences, matches whole words and multi-word phrases.
+    """
+
+    def __init__(self) -> None:
+        self._root = _Node()
+
+    def add(self, phrase: str, label: str) -> None:
+        node = self._root
+        for token in normalize(phrase).split():
+            node = node.children.setdefault(token, _Node())
+        node.label = label
+
+    def update(self, phrases: Iterable[str], label: str) -> None:
+        for phrase in phrases:
+            self.add(phrase, label)
+
+    def matches(self, tokens: list[str]) -> list[tuple[int, int, str]]:
+        """Return the longest (start, end, label) match at each position."""
+        found = []
+        start = 0
+        while start < len(tokens):
+            node = self._root
+            best: tuple[int, int, str] | None = None
+            for end in range(start, len(tokens)):
+                next_node = node.children.get(tokens[end])
+                if next_node is None:
+                    break
+                node = next_node
+                if node.label is not None:
+                    best = (start, end + 1, node.label)
+            if best:
+                found.append(best)
+                start = best[1]
+            else:
+                start += 1
+        return found
+
+
+GREETINGS = (
+    "hola",
+    "holis",
+    "buenas",
+    "buen dia",
+    "buenos dias",
+    "buenas tardes",
+    "buenas noches",
+    "que tal",
+    "hey",
+    "gracias",
+    "muchas gracias",
+    "mil gracias",
+    "genial",
+    "perfecto",
+    "ok",
+    "dale",
+    "chau",
+    "saludos",
+)
+HELP = (
+    "ayuda",
+    "help",
+    "menu",
+    "como funciona",
+    "como te uso",
+    "que haces",
+    "que podes hacer",
+    "que sabes hacer",
+    "comandos",
+    "info",
+)
+UNSUBSCRIBE = (
+    "stop",
+    "baja",
+    "darme de baja",
+    "dar de baja",
+    "desuscribir",
+    "desuscribirme",
+    "cancelar suscripcion",
+    "no me escribas mas",
+    "no quiero mas mensajes",
+    "basta",
+    "unsubscribe",
+)
+PRICE_WORDS = (
+    "precio",
+    "precios",
+    "cuanto sale",
+    "cuanto cuesta",
+    "cuanto esta",
+    "cuanto vale",
+    "a cuanto",
+    "valor",
+    "costo",
+    "mas barato",
+    "mejor precio",
+    "oferta",
+    "ofertas",
+    "donde compro",
+    "donde consigo",
+)
+# Bare product names that are common enough to route without the LLM
+PRODUCTS = (
+    "ps5",
+    "ps4",
+    "playstation",
+    "playstation 5",
+    "xbox",
+    "xbox series x",
+    "xbox series s",
+    "nintendo switch",
+    "switch",
+    "iphone",
+    "iphone 15",
+    "iphone 16",
+    "samsung galaxy",
+    "motorola",
+    "notebook",
+    "smart tv",
+    "televisor",
+    "heladera",
+    "lavarropas",
+    "aire acondicionado",
+    "microondas",
+    "auriculares",
+    "airpods",
+)
+# Words that can surround a product without being part of it
+FILLER = frozenset(
+    "de del el la los las un una unos unas en y para por me mi che que quiero "
+    "saber hoy ahora necesito busco favor porfa pf $ usd ars pesos dolares".split()
+)
+
+
+class IntentRouter:
+    """
+    Classify trivial WhatsApp messages without calling the LLM.
+
+    Messages made only of greetings, help or unsubscribe phrases are answered
+    directly. A price word followed by something that looks like a product, or
+    a bare known product name, is a price query. Anything else is handed to
+    the LLM.
+    """
+
+    def __init__(self, *, products: Iterable[str] = PRODUCTS) -> None:
+        self._trie = KeywordTrie()
+        self._trie.update(GREETINGS, Intent.GREETING.value)
+        self._trie.update(HELP, Intent.HELP.value)
+        self._trie.update(UNSUBSCRIBE, Intent.UNSUBSCRIBE.value)
+        self._trie.update(PRICE_WORDS, Intent.PRICE_QUERY.value)
+        self._products = KeywordTrie()
+        self._products.update(products, "product")
+
+    def classify(self, text: str) -> Route:
+        normalized = normalize(text)
+        tokens = normalized.split()
+        if not tokens:
+            return Route(Intent.OTHER)
+        matches = self._trie.matches(tokens)
+        labels = {label for _, _, label in matches}
+        covered = {i for start, end, _ in matches for i in range(start, end)}
+        rest = self._rest(tokens, covered)
+
+        if Intent.UNSUBSCRIBE.value in labels and not rest:
+            return Route(Intent.UNSUBSCRIBE)
+        if Intent.PRICE_QUERY.value in labels:
+            product = self._product_from(tokens, covered)
+            if product:
+                return Route(Intent.PRICE_QUERY, product=product)
+            return Route(Intent.OTHER, needs_llm=True)
+        if not rest:
+            if Intent.HELP.value in labels:
+                return Route(Intent.HELP)
+            if Intent.GREETING.value in labels:
+                return Route(Intent.GREETING)
+        # "hola, ps5" or just "ps5": a bare known product is a price query
+        if rest and self._is_product(rest):
+            return Route(Intent.PRICE_QUERY, product=" ".join(rest))
+        return Route(Intent.OTHER, needs_llm=True)
+
+    def strip_keywords(self, text: str) -> str:
+        """`text` without routing keywords and filler words."""
+        tokens = normalize(text).split()
+        matches = self._trie.matches(tokens)
+        covered = {i for start, end, _ in matches for i in range(start, end)}
+        return " ".join(self._rest(tokens, covered))
+
+    def _rest(self, tokens: list[str], covered: set[int]) -> list[str]:
+        return [
+            token
+            for i, token in enumerate(tokens)
+            if i not in covered and token not in FILLER
+        ]
+
+    def _product_from(self, tokens: list[str], covered: set[int]) -> str | None:
+        # The product is whatever follows the last matched keyword
+        candidate = [t for t in tokens[max(covered) + 1 :] if t not in FILLER]
+        if candidate:
+            return " ".join(candidate)
+        # "ps5 precio?" is fine, but free text before the keyword is too
+        # ambiguous ("no quiero dejar de recibir ofertas")
+        candidate = [
+            t for i, t in enumerate(tokens) if i not in covered and t not in FILLER
+        ]
+        if candidate and self._is_product(candidate):
+            return " ".join(candidate)
+        return None
+
+    def _is_product(self, tokens: list[str]) -> bool:
+        matches = self._products.matches(tokens)
+        return sum(end - start for start, end, _ in matches) == len(tokens)
+
+
+router = IntentRouter()
@@ -0,0 +1,234 @@
+# backend/app/services/llm_usage.py
+
+import asyncio
+import logging
+import threading
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any
+
+from sqlalchemy import Engine, case, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import LLMUsage
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceededError(Exception):
+    def __init__(self, user_id: uuid.UUID, period: str, used: int, quota: int):
+        super().__init__(
+            f"User {user_id} used {used} of {quota} {period} OpenAI tokens"
+        )
+        self.user_id = user_id
+        self.period = period
+        self.used = used
+        self.quota = quota
+
+
+@dataclass
+class _Totals:
+    # Stored usage as of the last sync
+    day: date
+    day_tokens: int = 0
+    month_tokens: int = 0
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class UsageTracker:
+    """
+    Per-user OpenAI token accounting with daily and monthly quotas.
+
+    Usage is counted in memory and added to the `llmusage` table on `sync`,
+    which also reloads the stored totals of the users it knows about. Quota
+    checks look at memory, so they can run before every completion. Only the
+    first check of a user loads their stored totals from `db_engine`, as
+    they may have used tokens before this worker started.
+    """
+
+    def __init__(
+        self,
+        *,
+        daily_quota: int | None = None,
+        monthly_quota: int | None = None,
+        db_engine: Engine | None = None,
+    ) -> None:
+        self.daily_quota = daily_quota
+        self.monthly_quota = monthly_quota
+        self.db_engine = db_engine
+        # (user, day) -> [requests, prompt tokens, completion tokens]
+        self._pending: dict[tuple[uuid.UUID, date], list[int]] = {}
+        # Flushed by a sync that hasn't reloaded the totals yet
+        self._in_flight: Counter[tuple[uuid.UUID, date]] = Counter()
+        self._totals: dict[uuid.UUID, _Totals] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, user_id: uuid.UUID, *, prompt_tokens: int, completion_tokens: int
+    ) -> None:
+        key = (user_id, _today())
+        with self._lock:
+            counts = self._pending.setdefault(key, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += prompt_tokens
+            counts[2] += completion_tokens
+
+    def used(self, user_id: uuid.UUID) -> tuple[int, int]:
+        """Tokens used by `user_id` today and this month."""
+        today = _today()
+        month = today.replace(day=1)
+        day_tokens = month_tokens = 0
+        with self._lock:
+            totals = self._totals.get(user_id)
+            if totals is not None and totals.day.replace(day=1) == month:
+                month_tokens = totals.month_tokens
+                day_tokens = totals.day_tokens if totals.day == today else 0
+            unsynced = Counter(
+                {key: counts[1] + counts[2] for key, counts in self._pending.items()}
+            )
+            unsynced.update(self._in_flight)
+        for (user, day), tokens in unsynced.items():
+            if user != user_id or day.replace(day=1) != month:
+                continue
+            month_tokens += tokens
+            day_tokens += tokens if day == today else 0
+        return day_tokens, month_tokens
+
+    def check(self, user_id: uuid.UUID) -> None:
+        """Raise `QuotaExceededError` when `user_id` used up a quota."""
+        if self.daily_quota is None and self.monthly_quota is None:
+            return
+        self._load_unseen(user_id)
+        day_tokens, month_tokens = self.used(user_id)
+        if self.daily_quota is not None and day_tokens >= self.daily_quota:
+            raise QuotaExceededError(user_id, "daily", day_tokens, self.daily_quota)
+        if self.monthly_quota is not None and month_tokens >= self.monthly_quota:
+            raise QuotaExceededError(
+                user_id, "monthly", month_tokens, self.monthly_quota
+            )
+
+    def _load_unseen(self, user_id: uuid.UUID) -> None:
+        if self.db_engine is None:
+            return
+        with self._lock:
+            if user_id in self._totals:
+                return
+        try:
+            with Session(self.db_engine) as session:
+                totals = self._load_totals(session=session, users={user_id})
+        except Exception as e:
+            # Checked against what this worker counted, loaded on the next check
+            logger.warning("Loading the usage of user %s failed: %s", user_id, e)
+            return
+        with self._lock:
+            # Unless a sync loaded them meanwhile
+            self._totals.setdefault(user_id, totals[user_id])
+
+    def sync(self, *, session: Session) -> int:
+        """Upsert pending usage in one statement and reload stored totals."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._in_flight.update(
+                {key: counts[1] + counts[2] for key, counts in pending.items()}
+            )
+            users = set(self._totals) | {user for user, _ in pending}
+        try:
+            if pending:
+                self._upsert(session=session, pending=pending)
+        except Exception:
+            session.rollback()
+            with self._lock:
+                for key, counts in pending.items():
+                    merged = self._pending.setdefault(key, [0, 0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+                self._in_flight -= Counter(
+                    {key: counts[1] + counts[2] for key, counts in pending.items()}
+                )
+            raise
+
+        totals = self._load_totals(session=session, users=users)
+        with self._lock:
+            self._totals = totals
+            self._in_flight.clear()
+        return len(pending)
+
+    def _upsert(
+        self, *, session: Session, pending: dict[tuple[uuid.UUID, date], list[int]]
+    ) -> None:
+        rows: list[dict[str, Any]] = [
+            {
+                "user_id": user_id,
+                "day": day,
+                "requests": counts[0],
+                "prompt_tokens": counts[1],
+                "completion_tokens": counts[2],
+            }
+            for (user_id, day), counts in pending.items()
+        ]
+        statement = insert(LLMUsage).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={
+                column: getattr(LLMUsage, column) + statement.excluded[column]
+                for column in ("requests", "prompt_tokens", "completion_tokens")
+            },
+        )
+        session.execute(statement)
+        session.commit()
+
+    def _load_totals(
+        self, *, session: Session, users: set[uuid.UUID]
+    ) -> dict[uuid.UUID, _Totals]:
+        today = _today()
+        if not users:
+            return {}
+        tokens = col(LLMUsage.prompt_tokens) + col(LLMUsage.completion_tokens)
+        statement = (
+            select(
+                col(LLMUsage.user_id),
+                func.sum(case((col(LLMUsage.day) == today, tokens), else_=0)),
+                func.sum(tokens),
+            )
+            .where(col(LLMUsage.day) >= today.replace(day=1))
+            .where(col(LLMUsage.user_id).in_(users))
+            .group_by(col(LLMUsage.user_id))
+        )
+        totals = {user: _Totals(day=today) for user in users}
+        for user_id, day_tokens, month_tokens in session.execute(statement):
+            totals[user_id] = _Totals(
+                day=today, day_tokens=int(day_tokens), month_tokens=int(month_tokens)
+            )
+        return totals
+
+
+usage_tracker = UsageTracker(
+    daily_quota=settings.LLM_DAILY_TOKEN_QUOTA,
+    monthly_quota=settings.LLM_MONTHLY_TOKEN_QUOTA,
+    db_engine=engine,
+)
+
+
+def _sync() -> int:
+    with Session(engine) as session:
+        return usage_tracker.sync(session=session)
+
+
+async def run_usage_sync(interval: float | None = None) -> None:
+    interval = (
+        settings.LLM_USAGE_SYNC_INTERVAL_SECONDS if interval is None else interval
+    )
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_sync)
+        except Exception:
+            logger.exception("LLM usage sync failed")
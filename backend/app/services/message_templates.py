@@ -0,0 +1,233 @@
+# backend/app/services/message_templates.py
+
+import hashlib
+import json
+import re
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.cache import make_cache
+from app.core.config import settings
+from app.services import openai_helper
+from app.services.offer_ranker import format_ars, parse_prices
+from app.services.query_frequency import canonical_product
+
+# Fields whose value changes between scrapes of the same product. They are
+# left out of the template key and re-filled into cached messages.
+NUMERIC_FIELDS = frozenset({"price", "total", "shipping", "installment_price"})
+TEXT_FIELDS = frozenset({"store", "title", "url"})
+# When one of these isn't found verbatim in the text, the model may have
+# written it some other way, so the template is only reused while it doesn't
+# change. A missing url or title was most likely just left out.
+PINNED_FIELDS = NUMERIC_FIELDS | {"store"}
+
+_PLACEHOLDER_RE = re.compile(r"\{\{([\w.]+)\}\}")
+_NUMBER_RE = re.compile(r"\d")
+
+template_cache = make_cache(
+    "format_templates",
+    max_entries=settings.PRICE_CACHE_MAX_ENTRIES,
+    default_ttl=settings.FORMAT_TEMPLATE_TTL_SECONDS,
+)
+
+
+@dataclass
+class TemplateStats:
+    hits: int = 0
+    misses: int = 0
+    # Templates dropped after reaching the reuse cap
+    regenerated: int = 0
+    # Replies built without the model for users over quota
+    degraded: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+stats = TemplateStats()
+_stats_lock = threading.Lock()
+
+
+def _is_volatile(field: str, value: Any) -> bool:
+    if field in TEXT_FIELDS:
+        return isinstance(value, str) and bool(value)
+    # Shipping can be "gratis", which is structure rather than a number
+    return field in NUMERIC_FIELDS and bool(_NUMBER_RE.search(str(value)))
+
+
+def split_fields(data: Any) -> tuple[Any, dict[str, Any]]:
+    """
+    Split `data` into its structure and its volatile values.
+
+    Volatile values are replaced by a marker in the structure and returned
+    by dotted path, e.g. {"best.price": "$ 999.999"}.
+    """
+    volatile: dict[str, Any] = {}
+
+    def walk(node: Any, path: str) -> Any:
+        if isinstance(node, dict):
+            shape = {}
+            for field, value in node.items():
+                child = f"{path}.{field}" if path else str(field)
+                if _is_volatile(str(field), value):
+                    volatile[child] = value
+                    shape[field] = "<volatile>"
+                else:
+                    shape[field] = walk(value, child)
+            return shape
+        if isinstance(node, list):
+            return [walk(value, f"{path}.{i}") for i, value in enumerate(node)]
+        return node
+
+    return walk(data, ""), volatile
+
+
+def template_key(product: str, shape: Any) -> str:
+    digest = hashlib.sha1(
+        json.dumps(shape, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{canonical_product(product)}:{digest[:16]}"
+
+
+def _renderings(value: Any) -> dict[str, str]:
+    """Ways the model may have written a number, by name."""
+    forms = {"raw": str(value)}
+    cents, is_usd, valid = parse_prices([value])
+    if valid[0] and not is_usd[0]:
+        ars = format_ars(int(cents[0]))
+        forms |= {"ars": ars, "ars_tight": ars.replace(" ", "")}
+    return forms
+
+
+def _render(path: str, value: Any, form: str) -> str:
+    if path.rsplit(".", 1)[-1] not in TEXT_FIELDS:
+        return _renderings(value).get(form, str(value))
+    # For text the form is the value as the model wrote it, keep its casing
+    text = str(value)
+    if text.lower() == form.lower():
+        return form
+    return text[:1].upper() + text[1:] if form[:1].isupper() else text
+
+
+def make_template(
+    lines: list[str], volatile: dict[str, Any]
+) -> tuple[list[str], dict[str, str], dict[str, Any]]:
+    """
+    Replace the volatile values found in `lines` with placeholders.
+
+    Returns the templated lines, how each placeholder was written (a number
+    rendering or the text as found) and the pinned values that weren't found.
+    """
+    text = "\n".join(lines)
+    forms: dict[str, str] = {}
+    pinned: dict[str, Any] = {}
+    # Longer values first, so "$ 1.299.999" isn't split by a shorter match
+    for path, value in sorted(volatile.items(), key=lambda kv: -len(str(kv[1]))):
+        placeholder = f"{{{{{path}}}}}"
+        if path.rsplit(".", 1)[-1] in TEXT_FIELDS:
+            match = re.search(re.escape(str(value)), text, re.IGNORECASE)
+            if match:
+                forms[path] = match.group(0)
+                text = text.replace(match.group(0), placeholder)
+                continue
+        else:
+            for form, rendered in sorted(
+                _renderings(value).items(), key=lambda kv: -len(kv[1])
+            ):
+                # Must not match inside a longer number
+                pattern = rf"(?<![\d.,]){re.escape(rendered)}(?!\d|[.,]\d)"
+                text, count = re.subn(pattern, placeholder, text)
+                if count:
+                    forms[path] = form
+                    break
+            if path in forms:
+                continue
+        if path.rsplit(".", 1)[-1] in PINNED_FIELDS:
+            pinned[path] = value
+    return text.split("\n"), forms, pinned
+
+
+def fill_template(
+    lines: list[str], forms: dict[str, str], volatile: dict[str, Any]
+) -> list[str]:
+    def replace(match: re.Match[str]) -> str:
+        path = match.group(1)
+        if path not in forms or path not in volatile:
+            return match.group(0)
+        return _render(path, volatile[path], forms[path])
+
+    return [_PLACEHOLDER_RE.sub(replace, line) for line in lines]
+
+
+def _lookup(
+    product: str, data: dict[str, Any]
+) -> tuple[str, dict[str, Any], dict[str, Any] | None]:
+    """Template key, volatile values and the reusable template, if any."""
+    shape, volatile = split_fields(data)
+    key = template_key(product, shape)
+    entry = template_cache.get(key)
+    if entry is not None and any(
+        volatile.get(path) != value for path, value in entry["pinned"].items()
+    ):
+        entry = None
+    return key, volatile, entry
+
+
+def format_price_msg(
+    product: str, data: dict[str, Any], *, user_id: uuid.UUID | None = None
+) -> list[str]:
+    """
+    `openai_helper.format_price_msg` with cached prose.
+
+    Messages are cached per product and structure of `data`. A hit re-fills
+    the current prices and store into the cached text instead of calling the
+    model. Templates expire after FORMAT_TEMPLATE_TTL_SECONDS and are
+    regenerated after FORMAT_TEMPLATE_MAX_REUSES hits.
+    """
+    key, volatile, entry = _lookup(product, data)
+    if entry is not None and entry["uses"] >= settings.FORMAT_TEMPLATE_MAX_REUSES:
+        with _stats_lock:
+            stats.regenerated += 1
+        entry = None
+    if entry is not None:
+        template_cache.set(
+            key, {**entry, "uses": entry["uses"] + 1}, template_cache.ttl_remaining(key)
+        )
+        with _stats_lock:
+            stats.hits += 1
+        return fill_template(entry["lines"], entry["forms"], volatile)
+
+    messages = openai_helper.format_price_msg(product, data, user_id=user_id)
+    with _stats_lock:
+        stats.misses += 1
+    lines, forms, pinned = make_template(messages, volatile)
+    template_cache.set(
+        key, {"lines": lines, "forms": forms, "pinned": pinned, "uses": 0}
+    )
+    return messages
+
+
+def fallback_messages(product: str, data: dict[str, Any]) -> list[str]:
+    """
+    A reply without calling the model, for users over their OpenAI quota.
+
+    Reuses the template of `data` past its reuse cap, or states the best
+    price plainly when there is none.
+    """
+    with _stats_lock:
+        stats.degraded += 1
+    _, volatile, entry = _lookup(product, data)
+    if entry is not None:
+        return fill_template(entry["lines"], entry["forms"], volatile)
+    offer = data.get("best") if "best" in data else data
+    if not isinstance(offer, dict) or not offer.get("price"):
+        return [f"No encontré el precio de {product}."]
+    price = _render("price", offer.get("total") or offer["price"], "ars")
+    text = f"{data.get('title') or product}: {price}"
+    if offer.get("store"):
+        text += f" en {str(offer['store']).capitalize()}"
+    return [text, offer["url"]] if offer.get("url") else [text]
@@ -0,0 +1,195 @@
+# backend/app/services/model_router.py
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+import openai
+from openai import OpenAI
+from openai.types.chat import ChatCompletion
+
+from app.core.config import settings
+from app.services.intent_router import normalize
+from app.services.llm_usage import usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying on the next model of the chain. Bad requests and auth
+# errors would fail the same way on any model.
+FALLBACK_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.NotFoundError,
+)
+
+COMPARISON_WORDS = frozenset(
+    {"vs", "versus", "comparar", "compara", "comparame", "diferencia", "conviene"}
+)
+
+
+class Tier(str, Enum):
+    FAST = "fast"
+    DEFAULT = "default"
+    STRONG = "strong"
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    model: str
+    fallbacks: tuple[str, ...]
+    timeout: float
+    max_tokens: int
+
+
+def route_for(function: str) -> ModelRoute:
+    """Route of an `openai_helper` function: "urls", "format" or "summary"."""
+    routes = {
+        "urls": ModelRoute(
+            model=settings.OPENAI_URL_MODEL,
+            fallbacks=tuple(settings.OPENAI_URL_FALLBACK_MODELS),
+            timeout=settings.OPENAI_URL_TIMEOUT_SECONDS,
+            max_tokens=settings.OPENAI_URL_MAX_TOKENS,
+        ),
+        "format": ModelRoute(
+            model=settings.OPENAI_FORMAT_MODEL,
+            fallbacks=tuple(settings.OPENAI_FORMAT_FALLBACK_MODELS),
+            timeout=settings.OPENAI_FORMAT_TIMEOUT_SECONDS,
+            max_tokens=settings.OPENAI_FORMAT_MAX_TOKENS,
+        ),
+        "summary": ModelRoute(
+            model=settings.OPENAI_SUMMARY_MODEL,
+            fallbacks=tuple(settings.OPENAI_SUMMARY_FALLBACK_MODELS),
+            timeout=settings.OPENAI_SUMMARY_TIMEOUT_SECONDS,
+            max_tokens=settings.OPENAI_SUMMARY_MAX_TOKENS,
+        ),
+    }
+    return routes[function]
+
+
+def complexity_tier(text: str, *, items: int = 1) -> Tier:
+    """
+    Guess how hard a request is from its text and the number of offers.
+
+    Comparisons and many offers go to the strong model, a short lookup of a
+    single product to the fast one. Only used with OPENAI_COMPLEXITY_ROUTING.
+    """
+    if not settings.OPENAI_COMPLEXITY_ROUTING:
+        return Tier.DEFAULT
+    tokens = normalize(text).split()
+    if items > 2 or COMPARISON_WORDS.intersection(tokens):
+        return Tier.STRONG
+    if len(tokens) <= 4 and items <= 1:
+        return Tier.FAST
+    return Tier.DEFAULT
+
+
+@dataclass
+class ModelLatency:
+    calls: int = 0
+    failures: int = 0
+    # Seconds of the latest successful calls
+    recent: deque[float] = field(default_factory=lambda: deque(maxlen=256))
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    @property
+    def mean(self) -> float:
+        return sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+
+class ModelRouter:
+    """
+    Issue chat completions through the configured route of each function.
+
+    Models of the route are tried in order until one answers, and the
+    latency of every call is recorded per model. Calls made for a user are
+    checked against their token quota first, which raises
+    `QuotaExceededError`, and their usage is recorded.
+    """
+
+    def __init__(self) -> None:
+        self._latency: dict[str, ModelLatency] = {}
+        self._lock = threading.Lock()
+
+    def models_for(self, function: str, tier: Tier = Tier.DEFAULT) -> list[str]:
+        route = route_for(function)
+        chain: Iterable[str] = (route.model, *route.fallbacks)
+        if tier is Tier.FAST:
+            chain = (settings.OPENAI_FAST_MODEL, *chain)
+        elif tier is Tier.STRONG:
+            chain = (settings.OPENAI_STRONG_MODEL, *chain)
+        return list(dict.fromkeys(chain))
+
+    def complete(
+        self,
+        client: OpenAI,
+        function: str,
+        *,
+        tier: Tier = Tier.DEFAULT,
+        user_id: uuid.UUID | None = None,
+        **kwargs: Any,
+    ) -> ChatCompletion:
+        if user_id is not None:
+            usage_tracker.check(user_id)
+        route = route_for(function)
+        error: Exception | None = None
+        for model in self.models_for(function, tier):
+            started = time.monotonic()
+            try:
+                resp: ChatCompletion = client.chat.completions.create(
+                    model=model,
+                    timeout=route.timeout,
+                    max_tokens=route.max_tokens,
+                    **kwargs,
+                )
+            except FALLBACK_ERRORS as e:
+                self._record(model, None)
+                logger.warning("OpenAI %s call on %s failed: %s", function, model, e)
+                error = e
+                continue
+            self._record(model, time.monotonic() - started)
+            if user_id is not None and resp.usage is not None:
+                usage_tracker.record(
+                    user_id,
+                    prompt_tokens=resp.usage.prompt_tokens,
+                    completion_tokens=resp.usage.completion_tokens,
+                )
+            return resp
+        assert error is not None
+        raise error
+
+    def _record(self, model: str, seconds: float | None) -> None:
+        with self._lock:
+            latency = self._latency.setdefault(model, ModelLatency())
+            latency.calls += 1
+            if seconds is None:
+                latency.failures += 1
+            else:
+                latency.recent.append(seconds)
+
+    def latency_report(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                model: {
+                    "calls": latency.calls,
+                    "failures": latency.failures,
+                    "mean_seconds": latency.mean,
+                    "p50_seconds": latency.percentile(0.5),
+                    "p95_seconds": latency.percentile(0.95),
+                }
+                for model, latency in self._latency.items()
+            }
+
+
+model_router = ModelRouter()
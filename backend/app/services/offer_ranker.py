@@ -0,0 +1,179 @@
+# backend/app/services/offer_ranker.py
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from app.core.config import settings
+
+_ZERO, _NINE = ord("0"), ord("9")
+_COMMA, _DOT = ord(","), ord(".")
+_A, _Z = ord("a"), ord("z")
+_U, _S, _D, _DOLLAR = ord("u"), ord("s"), ord("d"), ord("$")
+
+
+@dataclass(frozen=True)
+class RankingWeights:
+    # Lower effective total cost, min-max normalized across the offers
+    cost: float = 0.7
+    # Seller reputation, expected in [0, 1]
+    reputation: float = 0.2
+    free_shipping: float = 0.05
+    interest_free: float = 0.05
+
+
+def _is_letter(chars: npt.NDArray[np.uint32]) -> npt.NDArray[np.bool_]:
+    # Lowercased code points, non-ASCII ones count as letters
+    return ((chars >= _A) & (chars <= _Z)) | (chars >= 0xC0)
+
+
+def parse_prices(
+    values: Sequence[Any],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+    """
+    Parse price strings into integer cents in bulk.
+
+    Handles ARS and US formats ("$ 1.299.999,00", "1,299.99", "US$ 899",
+    "999999"). A separator followed by one or two digits at the end is the
+    decimal separator, any other separator groups thousands.
+
+    Returns (cents, is_usd, valid) arrays. Values without digits, such as
+    None or "Gratis", parse as 0 and are marked as not valid.
+    """
+    text = np.asarray([str(v) if v is not None else "" for v in values], dtype=str)
+    if text.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.astype(bool), empty.astype(bool)
+    # One row of Unicode code points per value, padded with zeros
+    chars = text.view(np.uint32).reshape(len(text), -1)
+    width = chars.shape[1]
+
+    is_digit = (chars >= _ZERO) & (chars <= _NINE)
+    is_sep = (chars == _COMMA) | (chars == _DOT)
+    # "USD", "US$" or "U$S" in any case, as a token of its own: "usado",
+    # "Asus" or "USB" aren't. Zero padded, so the shifted views don't wrap
+    lower = np.pad(chars | 0x20, ((0, 0), (1, 3)))
+    before, c0, c1, c2, after = (lower[:, i : i + width] for i in range(5))
+    usd = (c0 == _U) & (c1 == _S) & (c2 == _D)
+    u_dollar_s = (c0 == _U) & (c1 == _DOLLAR) & (c2 == _S)
+    us_dollar = (c0 == _U) & (c1 == _S) & (c2 == _DOLLAR)
+    token = ((usd | u_dollar_s) & ~_is_letter(after)) | us_dollar
+    is_usd = np.any(token & ~_is_letter(before), axis=1)
+
+    columns = np.arange(width)
+    last_sep = np.where(is_sep, columns, -1).max(axis=1)
+    digits_after = (is_digit & (columns > last_sep[:, None])).sum(axis=1)
+    decimals = np.where((last_sep >= 0) & (digits_after <= 2), digits_after, 0)
+
+    # Weight every digit by its position among the digits, counted from the right
+    rank = np.cumsum(is_digit[:, ::-1], axis=1)[:, ::-1] - 1
+    powers = np.where(is_digit, np.power(10, np.clip(rank, 0, 18), dtype=np.int64), 0)
+    digits = np.where(is_digit, chars - _ZERO, 0).astype(np.int64)
+    value = (digits * powers).sum(axis=1)
+
+    cents: npt.NDArray[np.int64] = value * 100 // np.power(10, decimals, dtype=np.int64)
+    valid = np.asarray(is_digit.any(axis=1), dtype=bool)
+    return cents, np.asarray(is_usd, dtype=bool), valid
+
+
+def _to_ars(
+    cents: npt.NDArray[np.int64], is_usd: npt.NDArray[np.bool_], usd_rate: float
+) -> npt.NDArray[np.int64]:
+    return np.where(is_usd, np.rint(cents * usd_rate), cents).astype(np.int64)
+
+
+def format_ars(cents: int) -> str:
+    pesos = round(cents / 100)
+    return "$ " + f"{pesos:,}".replace(",", ".")
+
+
+def rank_offers(
+    product: str,
+    offers: Sequence[Mapping[str, Any]],
+    *,
+    k: int = 3,
+    weights: RankingWeights | None = None,
+    usd_rate: float | None = None,
+) -> dict[str, Any]:
+    """
+    Rank scraped offers and return the compact `data` for `format_price_msg`.
+
+    Each offer may have "price", "shipping", "installments" (count),
+    "installment_price", "seller_reputation" (0 to 1), "store" and "url".
+    USD prices are converted to ARS. The effective total is price plus
+    shipping plus any financing surcharge of paying in installments.
+    """
+    weights = weights or RankingWeights()
+    usd_rate = settings.USD_ARS_RATE if usd_rate is None else usd_rate
+    if not offers:
+        return {"product": product, "best": None, "alternatives": [], "offers": 0}
+
+    price, price_usd, valid = parse_prices([o.get("price") for o in offers])
+    shipping, shipping_usd, _ = parse_prices([o.get("shipping") for o in offers])
+    installment, installment_usd, _ = parse_prices(
+        [o.get("installment_price") for o in offers]
+    )
+    count = np.array([o.get("installments") or 1 for o in offers], dtype=np.int64)
+    reputation = np.array(
+        [o.get("seller_reputation") or 0.0 for o in offers], dtype=np.float64
+    )
+
+    price = _to_ars(price, price_usd, usd_rate)
+    shipping = _to_ars(shipping, shipping_usd, usd_rate)
+    installment = _to_ars(installment, installment_usd, usd_rate)
+    # Installment amounts are rounded, allow up to one peso per installment
+    # before calling it a financing surcharge
+    surcharge = count * installment - price
+    surcharge = np.where((installment > 0) & (surcharge > count * 100), surcharge, 0)
+    total = price + shipping + surcharge
+    interest_free = (count > 1) & (surcharge == 0)
+
+    valid &= price > 0
+    if not valid.any():
+        return {
+            "product": product,
+            "best": None,
+            "alternatives": [],
+            "offers": len(offers),
+        }
+    low, high = total[valid].min(), total[valid].max()
+    cost_score = (
+        1.0 - (total - low) / (high - low) if high > low else np.ones(len(total))
+    )
+    score = (
+        weights.cost * cost_score
+        + weights.reputation * np.clip(reputation, 0.0, 1.0)
+        + weights.free_shipping * (shipping == 0)
+        + weights.interest_free * interest_free
+    )
+    score = np.where(valid, score, -np.inf)
+
+    k = min(k, int(valid.sum()))
+    top = np.argpartition(-score, k - 1)[:k]
+    top = top[np.argsort(-score[top], kind="stable")]
+
+    def summary(i: int) -> dict[str, Any]:
+        offer = offers[i]
+        installments = None
+        if count[i] > 1:
+            installments = f"{count[i]} cuotas" + (
+                " sin interés" if interest_free[i] else ""
+            )
+        return {
+            "store": offer.get("store"),
+            "price": format_ars(int(price[i])),
+            "shipping": format_ars(int(shipping[i])) if shipping[i] else "gratis",
+            "total": format_ars(int(total[i])),
+            "installments": installments,
+            "url": offer.get("url"),
+        }
+
+    return {
+        "product": product,
+        "best": summary(int(top[0])),
+        "alternatives": [summary(int(i)) for i in top[1:]],
+        "offers": len(offers),
+    }
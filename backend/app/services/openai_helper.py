@@ -1,8 +1,25 @@
 # backend/app/services/openai_helper.py
 
-import os
+import json
 import logging
-from openai import OpenAI, ChatCompletion
+import os
+import re
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, cast
+
+from openai import OpenAI
+from openai.types.chat import (
+    ChatCompletionMessage,
+    ChatCompletionMessageParam,
+    ChatCompletionToolParam,
+)
+
+from app.core.config import settings
+from app.services.context_builder import ContextBuilder
+from app.services.conversation_store import Turn
+from app.services.model_router import complexity_tier, model_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,27 +32,214 @@ if not OPENAI_API_KEY:
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
-def get_price_url(product: str) -> str:
+
+class EmptyReplyError(Exception):
+    """The model answered without any message to send."""
+
+
+def summarize_history(
+    previous: str | None, turns: Sequence[Turn], user_id: uuid.UUID | None = None
+) -> str:
+    transcript = "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+    prompt = (
+        "Resume en dos o tres frases esta conversación de WhatsApp sobre precios, "
+        "conservando productos, comercios y precios mencionados.\n"
+    )
+    if previous:
+        prompt += f"Resumen anterior: {previous}\n"
+    prompt += f"Nuevos mensajes:\n{transcript}"
+    resp = model_router.complete(
+        client,
+        "summary",
+        user_id=user_id,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+context_builder = ContextBuilder(
+    summarize=summarize_history,
+    max_tokens=settings.OPENAI_CONTEXT_MAX_TOKENS,
+    keep_turns=settings.OPENAI_CONTEXT_KEEP_TURNS,
+    stale_after=settings.OPENAI_SUMMARY_STALE_TURNS,
+)
+
+
+def _build_messages(
+    prompt: str,
+    conversation_id: uuid.UUID | None,
+    history: Sequence[Turn],
+    user_id: uuid.UUID | None,
+) -> list[ChatCompletionMessageParam]:
+    # El historial va antes del pedido actual, recortado al presupuesto de tokens
+    messages = context_builder.build(
+        conversation_id=conversation_id, turns=history, user_id=user_id
+    )
+    messages.append({"role": "user", "content": prompt})
+    return cast(list[ChatCompletionMessageParam], messages)
+
+
+def get_price_url(
+    product: str,
+    *,
+    conversation_id: uuid.UUID | None = None,
+    history: Sequence[Turn] = (),
+    user_id: uuid.UUID | None = None,
+) -> str:
     prompt = (
-        f"Dame una URL confiable para scrapear el mejor precio de \"{product}\" "
+        f'Dame una URL confiable para scrapear el mejor precio de "{product}" '
         "(MercadoLibre, Frávega, etc.). Responde solo con la URL."
     )
-    resp = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role":"user", "content": prompt}],
+    resp = model_router.complete(
+        client,
+        "urls",
+        tier=complexity_tier(product),
+        user_id=user_id,
+        messages=_build_messages(prompt, conversation_id, history, user_id),
     )
-    return resp.choices[0].message.content.strip()
+    return (resp.choices[0].message.content or "").strip()
+
+
+_URL_RE = re.compile(r"https?://[^\s<>\"')\]]+")
+
+
+def get_price_urls(
+    product: str,
+    *,
+    k: int | None = None,
+    conversation_id: uuid.UUID | None = None,
+    history: Sequence[Turn] = (),
+    user_id: uuid.UUID | None = None,
+) -> list[str]:
+    """Up to `k` candidate URLs for `product`, best first."""
+    k = k or settings.PRICE_URL_CANDIDATES
+    prompt = (
+        f"Dame hasta {k} URLs de distintos comercios para scrapear el mejor "
+        f'precio de "{product}" (MercadoLibre, Frávega, etc.), de la más a la '
+        "menos confiable. "
+        "Responde solo con las URLs, una por línea."
+    )
+    resp = model_router.complete(
+        client,
+        "urls",
+        tier=complexity_tier(product),
+        user_id=user_id,
+        messages=_build_messages(prompt, conversation_id, history, user_id),
+    )
+    urls = _URL_RE.findall(resp.choices[0].message.content or "")
+    return list(dict.fromkeys(url.rstrip(".,;") for url in urls))[:k]
+
+
+FORMAT_SYSTEM_PROMPT = (
+    "Sos un asistente de precios por WhatsApp. Respondé en español, breve, "
+    "sin listas ni numeración."
+)
+PRICE_REPLY_TOOL: ChatCompletionToolParam = {
+    "type": "function",
+    "function": {
+        "name": "price_reply",
+        "description": "Mensajes de WhatsApp con el precio de un producto.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "price_msg": {
+                    "type": "string",
+                    "description": "Precio y comercio, una sola frase.",
+                },
+                "recommendation": {
+                    "type": "string",
+                    "description": "Recomendación breve.",
+                },
+            },
+            "required": ["price_msg", "recommendation"],
+        },
+    },
+}
+
+
+@dataclass(frozen=True)
+class PriceReply:
+    price_msg: str
+    recommendation: str
+
+    def messages(self) -> list[str]:
+        return [m.strip() for m in (self.price_msg, self.recommendation) if m.strip()]
+
+
+def parse_price_reply(message: ChatCompletionMessage) -> PriceReply | None:
+    """The `price_reply` tool call arguments, None if the model didn't call it."""
+    for call in message.tool_calls or ():
+        if call.type != "function" or call.function.name != "price_reply":
+            continue
+        try:
+            arguments = json.loads(call.function.arguments)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(arguments, dict):
+            return None
+        return PriceReply(
+            price_msg=str(arguments.get("price_msg") or ""),
+            recommendation=str(arguments.get("recommendation") or ""),
+        )
+    return None
+
+
+def _offer_count(data: dict[str, Any]) -> int:
+    alternatives = data.get("alternatives")
+    return 1 + len(alternatives) if isinstance(alternatives, list) else 1
+
+
+def format_price_msg(
+    product: str,
+    data: dict[str, Any],
+    *,
+    conversation_id: uuid.UUID | None = None,
+    history: Sequence[Turn] = (),
+    user_id: uuid.UUID | None = None,
+) -> list[str]:
+    """
+    WhatsApp messages with the price in `data`.
 
-def format_price_msg(product: str, data: dict) -> list[str]:
+    With OPENAI_STRUCTURED_OUTPUT, a reply without a valid `price_reply` tool
+    call is asked again once as plain text. Raises EmptyReplyError when there
+    is still nothing to send, so no empty answer gets cached.
+    """
+    tier = complexity_tier(product, items=_offer_count(data))
+    if settings.OPENAI_STRUCTURED_OUTPUT:
+        prompt = f'Datos JSON sobre "{product}": {json.dumps(data, ensure_ascii=False)}'
+        messages = _build_messages(prompt, conversation_id, history, user_id)
+        resp = model_router.complete(
+            client,
+            "format",
+            tier=tier,
+            user_id=user_id,
+            messages=[{"role": "system", "content": FORMAT_SYSTEM_PROMPT}, *messages],
+            tools=[PRICE_REPLY_TOOL],
+            tool_choice={"type": "function", "function": {"name": "price_reply"}},
+        )
+        reply = parse_price_reply(resp.choices[0].message)
+        if reply is not None and reply.messages():
+            return reply.messages()
+        logger.warning("No valid price_reply for %r, asking for text", product)
     prompt = (
-        f"Tengo estos datos JSON sobre \"{product}\": {data}. "
+        f'Tengo estos datos JSON sobre "{product}": {data}. '
         "Escribe máximo dos mensajes de WhatsApp:"
         "1) precio y comercio"
         "2) recomendación breve"
     )
-    resp = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role":"user", "content": prompt}],
+    resp = model_router.complete(
+        client,
+        "format",
+        tier=tier,
+        user_id=user_id,
+        messages=_build_messages(prompt, conversation_id, history, user_id),
     )
     # Dividimos en líneas o mensajes
-    return [m.strip() for m in resp.choices[0].message.content.split("\n") if m.strip()]
+    lines = [
+        m.strip()
+        for m in (resp.choices[0].message.content or "").split("\n")
+        if m.strip()
+    ]
+    if not lines:
+        raise EmptyReplyError(f"Empty price reply for {product!r}")
+    return lines
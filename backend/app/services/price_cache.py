@@ -0,0 +1,265 @@
+# backend/app/services/price_cache.py
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from app.core.cache import make_cache
+from app.core.config import settings
+from app.services import message_templates, offer_ranker, openai_helper, scraper
+from app.services.intent_router import normalize
+from app.services.llm_usage import QuotaExceededError
+from app.services.query_frequency import canonical_product
+
+logger = logging.getLogger(__name__)
+
+# Search pages that usually list the product, fetched while the LLM resolves
+# the real candidates
+SPECULATIVE_URL_TEMPLATES = ("https://listado.mercadolibre.com.ar/{slug}",)
+
+url_cache = make_cache(
+    "price_urls",
+    max_entries=settings.PRICE_CACHE_MAX_ENTRIES,
+    default_ttl=settings.PRICE_URL_CACHE_TTL_SECONDS,
+)
+answer_cache = make_cache(
+    "price_answers",
+    max_entries=settings.PRICE_CACHE_MAX_ENTRIES,
+    default_ttl=settings.PRICE_ANSWER_CACHE_TTL_SECONDS,
+)
+
+
+@dataclass
+class AnswerStats:
+    lookups: int = 0
+    hits: int = 0
+    # Hits on answers that were last written by the cache warmer
+    warm_hits: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def warm_hit_ratio(self) -> float:
+        return self.warm_hits / self.lookups if self.lookups else 0.0
+
+
+@dataclass
+class SpeculationStats:
+    attempts: int = 0
+    # The LLM picked a predicted retailer and the speculative page had a price
+    hits: int = 0
+    # The LLM disagreed, the speculative fetch was cancelled, or the page was
+    # of the same retailer but not the product
+    misses: int = 0
+    # The LLM agreed but the speculative page had no price
+    wasted: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    @property
+    def mean_saved_seconds(self) -> float:
+        return self.saved_seconds / self.hits if self.hits else 0.0
+
+
+stats = AnswerStats()
+speculation_stats = SpeculationStats()
+_stats_lock = threading.Lock()
+
+
+async def cached_answer(product: str) -> list[str] | None:
+    entry = await answer_cache.aget(canonical_product(product))
+    with _stats_lock:
+        stats.lookups += 1
+        if entry is not None:
+            stats.hits += 1
+            stats.warm_hits += bool(entry["warmed"])
+    return list(entry["messages"]) if entry is not None else None
+
+
+def predict_urls(product: str) -> list[str]:
+    slug = "-".join(canonical_product(product).split())
+    return [template.format(slug=slug) for template in SPECULATIVE_URL_TEMPLATES]
+
+
+# Words that make the rest of a title what an accessory is for, as in
+# "Funda para auriculares JBL"
+ACCESSORY_MARKERS = frozenset({"para", "compatible", "p"})
+
+
+def matches_product(product: str, title: Any) -> bool:
+    """Whether `title` has every word of `product` and isn't an accessory for it."""
+    if not isinstance(title, str):
+        return False
+    words = set(canonical_product(product).split())
+    tokens = normalize(title).split()
+    if not words or not words <= set(tokens):
+        return False
+    first = min(i for i, token in enumerate(tokens) if token in words)
+    return not ACCESSORY_MARKERS.intersection(tokens[:first])
+
+
+def _lists_product(product: str, data: dict[str, Any]) -> bool:
+    offers = data.get("offers") or [data]
+    return any(matches_product(product, offer.get("title")) for offer in offers)
+
+
+def rank_listing(product: str, data: dict[str, Any]) -> dict[str, Any]:
+    """
+    The data to format for a scraped page.
+
+    The offers of a listing page that are `product` are ranked by
+    `offer_ranker.rank_offers`, the rest (accessories, other models) are
+    left out. A page with a single product is returned as is.
+    """
+    offers = data.get("offers")
+    if not offers:
+        return data
+    page = {field: value for field, value in data.items() if field != "offers"}
+    matching = [o for o in offers if matches_product(product, o.get("title"))]
+    if len(matching) == 1:
+        return dict(matching[0])
+    if not matching:
+        return page
+    ranked = offer_ranker.rank_offers(
+        product,
+        [
+            # The ranker tells USD from ARS by the price text
+            {**o, "price": f"US$ {o['price']}"} if o.get("currency") == "USD" else o
+            for o in matching
+        ],
+    )
+    if ranked["best"] is None:
+        return page
+    return {**ranked, "url": ranked["best"]["url"]}
+
+
+async def _speculative_fetch(
+    product: str, *, http: httpx.AsyncClient, user_id: uuid.UUID | None
+) -> tuple[list[str], dict[str, Any] | None]:
+    """
+    Ask the LLM for candidate URLs while scraping the predicted ones.
+
+    The speculative fetch is cancelled unless the LLM picked one of the
+    predicted retailers. Its result is only used when the LLM picked the
+    predicted page itself, or the page has a listing of `product`: a
+    retailer's search page may well lead with something else. Returns the
+    candidates and the speculative data, if it was used.
+    """
+    predicted = predict_urls(product)
+    started = time.monotonic()
+    llm_done = scrape_done = started
+
+    async def speculate() -> dict[str, Any] | None:
+        nonlocal scrape_done
+        data = await scraper.fetch_first_valid(predicted, client=http)
+        scrape_done = time.monotonic()
+        return data
+
+    speculation = asyncio.create_task(speculate())
+    try:
+        urls = await asyncio.to_thread(
+            openai_helper.get_price_urls, product, user_id=user_id
+        )
+        llm_done = time.monotonic()
+        predicted_stores = {scraper.store_from_url(url) for url in predicted}
+        if not any(scraper.store_from_url(url) in predicted_stores for url in urls):
+            with _stats_lock:
+                speculation_stats.attempts += 1
+                speculation_stats.misses += 1
+            return urls, None
+        data = await speculation
+    finally:
+        speculation.cancel()
+    if (
+        data is not None
+        and not set(urls) & set(predicted)
+        and not _lists_product(product, data)
+    ):
+        with _stats_lock:
+            speculation_stats.attempts += 1
+            speculation_stats.misses += 1
+        return urls, None
+
+    # Sequentially this would have taken llm + scrape, speculation overlaps
+    # the shorter of the two
+    saved = min(llm_done, scrape_done) - started if data is not None else 0.0
+    with _stats_lock:
+        speculation_stats.attempts += 1
+        speculation_stats.hits += data is not None
+        speculation_stats.wasted += data is None
+        speculation_stats.saved_seconds += saved
+    if data is not None:
+        logger.info("Speculative scrape for %r saved %.2fs", product, saved)
+    return urls, data
+
+
+async def compute_answer(
+    product: str,
+    *,
+    http: httpx.AsyncClient,
+    warmed: bool = False,
+    user_id: uuid.UUID | None = None,
+) -> list[str]:
+    """
+    Resolve, scrape and format `product`, storing the answer in the cache.
+
+    When `user_id` is over their OpenAI quota, the predicted search pages
+    stand in for the URL candidates and the reply is built from a template
+    or without the model. Those answers are not cached.
+    """
+    key = canonical_product(product)
+    over_quota = False
+    data: dict[str, Any] | None = None
+    urls: list[str] | None = await url_cache.aget(key)
+    if not urls:
+        try:
+            if settings.PRICE_SPECULATIVE_SCRAPING:
+                urls, data = await _speculative_fetch(
+                    product, http=http, user_id=user_id
+                )
+            else:
+                urls = await asyncio.to_thread(
+                    openai_helper.get_price_urls, product, user_id=user_id
+                )
+        except QuotaExceededError:
+            over_quota = True
+            urls = predict_urls(product)
+        else:
+            await url_cache.aset(key, urls)
+    if data is None:
+        ranked = scraper.retailer_stats.rank(urls)
+        data = await scraper.fetch_first_valid(
+            ranked[: settings.PRICE_URL_PARALLEL_FETCHES], client=http
+        )
+    if data is None:
+        # The URLs are probably wrong, ask again next time
+        await url_cache.adelete(key)
+        return [f"No encontré el precio de {product}."]
+    data = rank_listing(product, data)
+    if not over_quota:
+        try:
+            messages = await asyncio.to_thread(
+                message_templates.format_price_msg, product, data, user_id=user_id
+            )
+        except QuotaExceededError:
+            over_quota = True
+    if over_quota:
+        return await asyncio.to_thread(
+            message_templates.fallback_messages, product, data
+        )
+    await answer_cache.aset(
+        key,
+        {"url": data.get("url"), "data": data, "messages": messages, "warmed": warmed},
+    )
+    return messages
@@ -0,0 +1,122 @@
+# backend/app/services/product_pipeline.py
+
+import asyncio
+import logging
+import re
+import uuid
+from collections.abc import AsyncGenerator
+
+import httpx
+
+from app.core.config import settings
+from app.services import price_cache
+from app.services.intent_router import Intent, router
+from app.services.query_frequency import query_tracker
+
+logger = logging.getLogger(__name__)
+
+_SEPARATOR_RE = re.compile(r"\s*(?:[,;\n]|\by\b|\be\b)\s*", re.IGNORECASE)
+
+
+def split_products(message: str) -> list[str]:
+    """
+    Split "precio de ps5, xbox series x y nintendo switch" into products.
+
+    Duplicates are dropped and at most PRODUCT_MAX_PER_MESSAGE products are
+    returned, in the order they were written.
+    """
+    products: list[str] = []
+    for part in _SEPARATOR_RE.split(message):
+        route = router.classify(part)
+        if route.intent in (Intent.GREETING, Intent.HELP, Intent.UNSUBSCRIBE):
+            continue
+        if route.intent == Intent.PRICE_QUERY and route.product:
+            product = route.product
+        else:
+            # "Quiero saber el precio" alone has no product left
+            product = router.strip_keywords(part)
+        if product and product not in products:
+            products.append(product)
+    return products[: settings.PRODUCT_MAX_PER_MESSAGE]
+
+
+async def answer_product(
+    product: str, *, http: httpx.AsyncClient, user_id: uuid.UUID | None = None
+) -> list[str]:
+    query_tracker.record(product)
+    cached = await price_cache.cached_answer(product)
+    if cached is not None:
+        return cached
+    return await price_cache.compute_answer(product, http=http, user_id=user_id)
+
+
+async def stream_replies(
+    message: str,
+    *,
+    fanout: int | None = None,
+    deadline: float | None = None,
+    timeout: float | None = None,
+    user_id: uuid.UUID | None = None,
+) -> AsyncGenerator[list[str], None]:
+    """
+    Answer every product in `message` concurrently, yielding WhatsApp messages.
+
+    The first batch is yielded as soon as all products are done or `deadline`
+    seconds have passed, whichever comes first. It has the finished answers in
+    the order the products were asked for, and a placeholder for the rest.
+    Each late product is then yielded on its own as it finishes. Anything
+    still running after `timeout` seconds is cancelled. OpenAI usage is
+    counted against `user_id`.
+    """
+    fanout = fanout or settings.PRODUCT_FANOUT_LIMIT
+    deadline = settings.PRODUCT_REPLY_DEADLINE_SECONDS if deadline is None else deadline
+    timeout = settings.PRODUCT_REPLY_TIMEOUT_SECONDS if timeout is None else timeout
+    products = split_products(message)
+    if not products:
+        return
+    semaphore = asyncio.Semaphore(fanout)
+
+    async with httpx.AsyncClient() as http:
+
+        async def run(product: str) -> list[str]:
+            async with semaphore:
+                try:
+                    return await answer_product(product, http=http, user_id=user_id)
+                except Exception:
+                    logger.exception("Failed to answer %r", product)
+                    return [f"No pude buscar el precio de {product}, probá de nuevo."]
+
+        tasks = {asyncio.create_task(run(product)): product for product in products}
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # Also covers the first wait and yield, the consumer may stop there
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+            first_batch: list[str] = []
+            for task, product in tasks.items():
+                if task in done:
+                    first_batch.extend(task.result())
+                else:
+                    first_batch.append(
+                        f"Sigo buscando el precio de {product}, te aviso apenas lo tenga."
+                    )
+            yield first_batch
+
+            while pending:
+                remaining = timeout - (loop.time() - started)
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Keep the original order among products finishing together
+                for task in tasks:
+                    if task in done:
+                        yield task.result()
+        finally:
+            # A no-op for the tasks that are done
+            for task in tasks:
+                task.cancel()
+        for task in pending:
+            yield [f"No encontré a tiempo el precio de {tasks[task]}."]
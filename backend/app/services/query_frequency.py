@@ -0,0 +1,111 @@
+# backend/app/services/query_frequency.py
+
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import ProductQueryStat
+from app.services.intent_router import FILLER, normalize
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_product(product: str) -> str:
+    """Cache and counter key for a product, "la PS5 " and "ps5" are the same."""
+    return " ".join(t for t in normalize(product).split() if t not in FILLER)[:255]
+
+
+class QueryFrequencyTracker:
+    """
+    Time-decayed query counter per canonical product.
+
+    Queries are counted in memory and added to the `productquerystat` table
+    on `flush`. A stored score halves every `half_life` seconds, so ranking
+    by the decayed score favors what is popular right now.
+    """
+
+    def __init__(self, *, half_life: float) -> None:
+        self.half_life = half_life
+        self._pending: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, product: str) -> None:
+        key = canonical_product(product)
+        if key:
+            with self._lock:
+                self._pending[key] += 1
+
+    def flush(self, *, session: Session) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        now = datetime.now(timezone.utc)
+        statement = insert(ProductQueryStat).values(
+            [
+                {"product": product, "score": float(count), "updated_at": now}
+                for product, count in pending.items()
+            ]
+        )
+        elapsed = func.extract(
+            "epoch", statement.excluded.updated_at - ProductQueryStat.updated_at
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProductQueryStat.product],
+            set_={
+                "score": ProductQueryStat.score
+                * func.power(0.5, elapsed / self.half_life)
+                + statement.excluded.score,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+        try:
+            session.execute(statement)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return len(pending)
+
+    def top_products(self, *, session: Session, limit: int) -> list[str]:
+        age = func.extract("epoch", func.now() - ProductQueryStat.updated_at)
+        decayed = ProductQueryStat.score * func.power(0.5, age / self.half_life)
+        statement = (
+            select(ProductQueryStat.product).order_by(decayed.desc()).limit(limit)
+        )
+        return list(session.exec(statement).all())
+
+
+query_tracker = QueryFrequencyTracker(
+    half_life=settings.QUERY_FREQUENCY_HALF_LIFE_SECONDS
+)
+
+
+def flush_queries() -> int:
+    with Session(engine) as session:
+        return query_tracker.flush(session=session)
+
+
+async def run_query_flush(interval: float | None = None) -> None:
+    """Add the counted queries to the table every `interval` seconds."""
+    interval = (
+        settings.QUERY_FREQUENCY_FLUSH_INTERVAL_SECONDS
+        if interval is None
+        else interval
+    )
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_queries)
+        except Exception:
+            logger.exception("Query frequency flush failed")
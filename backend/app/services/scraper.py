@@ -0,0 +1,226 @@
+# backend/app/services/scraper.py
+
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept-Language": "es-AR,es;q=0.9",
+}
+
+_JSON_LD_RE = re.compile(
+    r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+_META_PRICE_RE = re.compile(
+    r'<meta[^>]+(?:itemprop=["\']price["\']|property=["\']'
+    r'(?:product|og):price:amount["\'])[^>]+content=["\']([^"\']+)["\']',
+    re.IGNORECASE,
+)
+_META_CURRENCY_RE = re.compile(
+    r'<meta[^>]+(?:itemprop=["\']priceCurrency["\']|property=["\']'
+    r'(?:product|og):price:currency["\'])[^>]+content=["\']([^"\']+)["\']',
+    re.IGNORECASE,
+)
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+def store_from_url(url: str) -> str:
+    """Retailer name from the URL host, e.g. "mercadolibre" for articulo.mercadolibre.com.ar."""
+    host = urlparse(url).hostname or ""
+    parts = [p for p in host.split(".") if p not in ("www", "com", "ar", "net")]
+    return parts[-1] if parts else host
+
+
+def _iter_products(node: Any) -> Any:
+    if isinstance(node, list):
+        for child in node:
+            yield from _iter_products(child)
+    elif isinstance(node, dict):
+        types = node.get("@type")
+        if types == "Product" or (isinstance(types, list) and "Product" in types):
+            yield node
+        for key in ("@graph", "itemListElement", "item"):
+            if key in node:
+                yield from _iter_products(node[key])
+
+
+def _offer_price(offers: Any) -> tuple[Any, Any]:
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    if not isinstance(offers, dict):
+        return None, None
+    price = offers.get("price", offers.get("lowPrice"))
+    return price, offers.get("priceCurrency")
+
+
+def extract_price_data(html: str, url: str) -> dict[str, Any] | None:
+    """
+    Extract the product price from structured data in a retailer page.
+
+    Looks at schema.org Product JSON-LD first and falls back to price meta
+    tags. Returns None when the page has no price.
+
+    The data is that of the first priced product. Listing pages with several
+    also get every one of them under "offers", with its own URL when the
+    JSON-LD has it.
+    """
+    offers = []
+    for block in _JSON_LD_RE.findall(html):
+        try:
+            document = json.loads(block)
+        except ValueError:
+            continue
+        for product in _iter_products(document):
+            price, currency = _offer_price(product.get("offers"))
+            if price is not None:
+                link = product.get("url")
+                offers.append(
+                    {
+                        "title": product.get("name"),
+                        "price": str(price),
+                        "currency": currency or "ARS",
+                        "store": store_from_url(url),
+                        "url": link if isinstance(link, str) and link else url,
+                    }
+                )
+    if offers:
+        data = {**offers[0], "url": url}
+        if len(offers) > 1:
+            data["offers"] = offers
+        return data
+    price_match = _META_PRICE_RE.search(html)
+    if not price_match:
+        return None
+    currency_match = _META_CURRENCY_RE.search(html)
+    title_match = _TITLE_RE.search(html)
+    return {
+        "title": title_match.group(1).strip() if title_match else None,
+        "price": price_match.group(1),
+        "currency": currency_match.group(1) if currency_match else "ARS",
+        "store": store_from_url(url),
+        "url": url,
+    }
+
+
+@dataclass
+class RetailerRecord:
+    attempts: int = 0
+    successes: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace smoothing, an unknown retailer starts at 0.5 and a single
+        # failure doesn't bury it
+        return (self.successes + 1) / (self.attempts + 2)
+
+
+class RetailerStats:
+    """
+    Per-retailer scraping success rates, used to rank candidate URLs.
+
+    Retailers are keyed by `store_from_url`, so every page of a store shares
+    one record.
+    """
+
+    def __init__(self) -> None:
+        self._records: dict[str, RetailerRecord] = {}
+        self._lock = threading.Lock()
+
+    def record(self, url: str, *, ok: bool) -> None:
+        store = store_from_url(url)
+        with self._lock:
+            record = self._records.setdefault(store, RetailerRecord())
+            record.attempts += 1
+            record.successes += ok
+
+    def success_rate(self, url: str) -> float:
+        with self._lock:
+            record = self._records.get(store_from_url(url))
+        return record.success_rate if record else RetailerRecord().success_rate
+
+    def rank(self, urls: Sequence[str]) -> list[str]:
+        """Order `urls` by retailer success rate, keeping the given order on ties."""
+        return sorted(urls, key=self.success_rate, reverse=True)
+
+    def snapshot(self) -> dict[str, RetailerRecord]:
+        with self._lock:
+            return {
+                store: RetailerRecord(r.attempts, r.successes)
+                for store, r in self._records.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+retailer_stats = RetailerStats()
+
+
+async def fetch_price_data(
+    url: str, *, client: httpx.AsyncClient
+) -> dict[str, Any] | None:
+    try:
+        response = await client.get(
+            url,
+            headers=HEADERS,
+            follow_redirects=True,
+            timeout=settings.SCRAPER_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logger.warning("Failed to fetch %s: %s", url, e)
+        return None
+    return extract_price_data(response.text, str(response.url))
+
+
+async def fetch_first_valid(
+    urls: Sequence[str], *, client: httpx.AsyncClient
+) -> dict[str, Any] | None:
+    """
+    Scrape all `urls` in parallel and return the first valid price data.
+
+    The remaining fetches are cancelled as soon as one page yields a price.
+    Finished fetches are recorded in the per-retailer stats, cancelled ones
+    say nothing about the retailer and aren't.
+    """
+    tasks = {
+        asyncio.ensure_future(fetch_price_data(url, client=client)): url for url in urls
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            found = None
+            for task in done:
+                error = task.exception()
+                if error is not None:
+                    logger.warning("Failed to scrape %s: %r", tasks[task], error)
+                data = None if error is not None else task.result()
+                retailer_stats.record(tasks[task], ok=data is not None)
+                found = found or data
+            if found is not None:
+                return found
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,140 @@
+# backend/app/services/user_deletion.py
+
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.user_cache import user_cache
+from app.models import Item, ItemCount, User, UserDeletion
+
+logger = logging.getLogger(__name__)
+
+
+async def start_deletion(
+    session: AsyncSession, user: User
+) -> tuple[UserDeletion, bool]:
+    """
+    Deactivate `user` and record that it's being deleted, so it can't log
+    in while `purge_user` runs. Returns the record and whether it's new, the
+    existing record if there's one.
+    """
+    deletion = await session.get(UserDeletion, user.id)
+    if deletion is not None:
+        return deletion, False
+    statement = select(ItemCount.count).where(col(ItemCount.owner_id) == user.id)
+    items_total = (await session.exec(statement)).first() or 0
+    deletion = UserDeletion(user_id=user.id, email=user.email, items_total=items_total)
+    user.is_active = False
+    session.add(user)
+    session.add(deletion)
+    await session.commit()
+    user_cache.drop(user.id)
+    return deletion, True
+
+
+def _lock_id(user_id: uuid.UUID) -> int:
+    # Advisory lock keys are signed 64-bit
+    return int.from_bytes(user_id.bytes[:8], "big", signed=True)
+
+
+async def purge_user(
+    user_id: uuid.UUID,
+    *,
+    db_engine: AsyncEngine = async_engine,
+    batch_size: int | None = None,
+    pause: float | None = None,
+) -> None:
+    """
+    Delete the items of `user_id` `batch_size` at a time, each batch in its
+    own short transaction, then the user itself.
+
+    Progress is saved with every batch, running it again after an
+    interruption picks up where it stopped. A purge of the same user that is
+    already running, in this or another worker, holds an advisory lock and
+    this one returns right away.
+    """
+    # Autocommit, the lock's connection isn't left idle in a transaction
+    async with db_engine.connect() as lock:
+        lock = await lock.execution_options(isolation_level="AUTOCOMMIT")
+        locked = select(func.pg_try_advisory_lock(_lock_id(user_id)))
+        if not await lock.scalar(locked):
+            logger.info("Deletion of user %s is already running", user_id)
+            return
+        try:
+            await _purge(
+                user_id, db_engine=db_engine, batch_size=batch_size, pause=pause
+            )
+        finally:
+            await lock.execute(select(func.pg_advisory_unlock(_lock_id(user_id))))
+
+
+async def _purge(
+    user_id: uuid.UUID,
+    *,
+    db_engine: AsyncEngine,
+    batch_size: int | None,
+    pause: float | None,
+) -> None:
+    batch_size = settings.USER_DELETE_BATCH_SIZE if batch_size is None else batch_size
+    pause = settings.USER_DELETE_BATCH_PAUSE_SECONDS if pause is None else pause
+    # Rows locked by another transaction are left for a later batch, or the
+    # user's cascade, instead of waiting for them
+    batch = (
+        select(Item.id)
+        .where(col(Item.owner_id) == user_id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    progress = update(UserDeletion).where(col(UserDeletion.user_id) == user_id)
+
+    while True:
+        async with db_engine.begin() as connection:
+            result = await connection.execute(
+                delete(Item).where(col(Item.id).in_(batch))
+            )
+            deleted = result.rowcount
+            if deleted:
+                await connection.execute(
+                    progress.values(
+                        items_deleted=col(UserDeletion.items_deleted) + deleted
+                    )
+                )
+        if not deleted:
+            break
+        # Let the writes queued behind the batch through
+        await asyncio.sleep(pause)
+
+    # Anything added since the last batch goes with the user's cascade
+    async with db_engine.begin() as connection:
+        await connection.execute(delete(User).where(col(User.id) == user_id))
+        await connection.execute(progress.values(finished_at=func.now()))
+    logger.info("User %s deleted", user_id)
+
+
+async def purge_in_background(
+    user_id: uuid.UUID, db_engine: AsyncEngine = async_engine
+) -> None:
+    """`purge_user`, logging a failure instead of raising it."""
+    try:
+        await purge_user(user_id, db_engine=db_engine)
+    except Exception:
+        logger.exception("Deletion of user %s failed", user_id)
+
+
+async def resume_deletions(db_engine: AsyncEngine = async_engine) -> None:
+    """Finish the deletions a previous run of the app was stopped in."""
+    async with db_engine.connect() as connection:
+        statement = select(UserDeletion.user_id).where(
+            col(UserDeletion.finished_at).is_(None)
+        )
+        user_ids = (await connection.execute(statement)).scalars().all()
+    for user_id in user_ids:
+        logger.info("Resuming deletion of user %s", user_id)
+        await purge_in_background(user_id, db_engine=db_engine)
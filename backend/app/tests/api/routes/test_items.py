@@ -1,21 +1,31 @@
 import uuid
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from unittest.mock import patch
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, func, select
 
+from app.api.pagination import encode_cursor
 from app.core.config import settings
+from app.models import Item, ItemCount, TableCount
 from app.tests.utils.item import create_random_item
+from app.tests.utils.user import create_random_user
 
 
 def test_create_item(
-    client: TestClient, superuser_token_headers: dict[str, str]
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    max_queries: Callable[[int], AbstractContextManager[list[str]]],
 ) -> None:
     data = {"title": "Foo", "description": "Fighters"}
-    response = client.post(
-        f"{settings.API_V1_STR}/items/",
-        headers=superuser_token_headers,
-        json=data,
-    )
+    # The user, then INSERT ... RETURNING, no SELECT after the commit
+    with max_queries(2):
+        response = client.post(
+            f"{settings.API_V1_STR}/items/",
+            headers=superuser_token_headers,
+            json=data,
+        )
     assert response.status_code == 200
     content = response.json()
     assert content["title"] == data["title"]
@@ -66,29 +76,141 @@ def test_read_item_not_enough_permissions(
 
 
 def test_read_items(
-    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    max_queries: Callable[[int], AbstractContextManager[list[str]]],
 ) -> None:
     create_random_item(db)
     create_random_item(db)
-    response = client.get(
-        f"{settings.API_V1_STR}/items/",
-        headers=superuser_token_headers,
-    )
+    # The user, the count and the page, however many items there are
+    with max_queries(3):
+        response = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers=superuser_token_headers,
+        )
     assert response.status_code == 200
     content = response.json()
     assert len(content["data"]) >= 2
 
 
-def test_update_item(
+def test_read_items_cursor_pages(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
-    item = create_random_item(db)
-    data = {"title": "Updated title", "description": "Updated description"}
-    response = client.put(
-        f"{settings.API_V1_STR}/items/{item.id}",
+    for _ in range(3):
+        create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/"
+    everything = client.get(
+        url, headers=superuser_token_headers, params={"limit": 1000}
+    )
+    expected = [item["id"] for item in everything.json()["data"]]
+
+    seen: list[str] = []
+    params: dict[str, str | int] = {"limit": 2}
+    while True:
+        response = client.get(url, headers=superuser_token_headers, params=params)
+        assert response.status_code == 200
+        content = response.json()
+        seen += [item["id"] for item in content["data"]]
+        if content["next_cursor"] is None:
+            break
+        params = {"limit": 2, "cursor": content["next_cursor"]}
+    assert seen == expected
+
+    # The cursor of an offset page continues where that page stopped
+    response = client.get(
+        url, headers=superuser_token_headers, params={"skip": 1, "limit": 2}
+    )
+    cursor = response.json()["next_cursor"]
+    response = client.get(
+        url, headers=superuser_token_headers, params={"cursor": cursor, "limit": 1}
+    )
+    assert response.json()["data"][0]["id"] == expected[3]
+
+
+def test_read_items_bad_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    response = client.get(
+        url, headers=superuser_token_headers, params={"cursor": "not a cursor"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+    response = client.get(
+        url,
         headers=superuser_token_headers,
-        json=data,
+        params={"cursor": encode_cursor(uuid.uuid4()), "skip": 5},
     )
+    assert response.status_code == 400
+
+
+def test_read_items_counts(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    before = client.get(url, headers=normal_user_token_headers).json()["count"]
+    ids = [
+        client.post(
+            url, headers=normal_user_token_headers, json={"title": f"Item {i}"}
+        ).json()["id"]
+        for i in range(3)
+    ]
+    client.delete(f"{url}{ids[0]}", headers=normal_user_token_headers)
+
+    content = client.get(url, headers=normal_user_token_headers).json()
+    assert content["count"] == before + 2
+    owner_id = uuid.UUID(content["data"][0]["owner_id"])
+    rows = db.exec(
+        select(func.count()).select_from(Item).where(Item.owner_id == owner_id)
+    ).one()
+    assert content["count"] == rows
+
+    content = client.get(
+        url, headers=normal_user_token_headers, params={"include_count": False}
+    ).json()
+    assert content["count"] is None
+    assert content["data"]
+
+
+def test_item_counters_follow_owner_changes(db: Session) -> None:
+    item = create_random_item(db)
+    old_owner = item.owner_id
+    new_owner = create_random_user(db)
+    item.owner_id = new_owner.id
+    db.add(item)
+    db.commit()
+    assert db.get(ItemCount, old_owner).count == 0  # type: ignore[union-attr]
+    assert db.get(ItemCount, new_owner.id).count == 1  # type: ignore[union-attr]
+
+    def counted() -> int:
+        shards = db.exec(select(TableCount).where(TableCount.table_name == "item"))
+        return sum(shard.count for shard in shards)
+
+    total = counted()
+    db.delete(new_owner)
+    db.commit()
+    after = counted()
+    assert after == total - 1
+    assert after == db.exec(select(func.count()).select_from(Item)).one()
+
+
+def test_update_item(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    max_queries: Callable[[int], AbstractContextManager[list[str]]],
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    data = {"title": "Updated title", "description": "Updated description"}
+    # The user, then UPDATE ... RETURNING
+    with max_queries(2):
+        response = client.put(
+            url,
+            headers=superuser_token_headers,
+            json=data,
+        )
     assert response.status_code == 200
     content = response.json()
     assert content["title"] == data["title"]
@@ -162,3 +284,92 @@ def test_delete_item_not_enough_permissions(
     assert response.status_code == 400
     content = response.json()
     assert content["detail"] == "Not enough permissions"
+
+
+def test_bulk_items(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    before = client.get(url, headers=normal_user_token_headers).json()["count"]
+    response = client.post(
+        f"{url}bulk",
+        headers=normal_user_token_headers,
+        json=[{"title": f"Bulk {i}", "description": "d"} for i in range(5)],
+    )
+    assert response.status_code == 200
+    created = response.json()["data"]
+    assert [item["title"] for item in created] == [f"Bulk {i}" for i in range(5)]
+    assert client.get(url, headers=normal_user_token_headers).json()["count"] == (
+        before + 5
+    )
+
+    changes = [
+        {"id": created[0]["id"], "title": "Renamed"},
+        {"id": created[1]["id"], "description": None},
+    ]
+    response = client.patch(
+        f"{url}bulk", headers=normal_user_token_headers, json=changes
+    )
+    assert response.status_code == 200
+    first, second = response.json()["data"]
+    assert (first["title"], first["description"]) == ("Renamed", "d")
+    assert (second["title"], second["description"]) == ("Bulk 1", None)
+
+    ids = [item["id"] for item in created]
+    response = client.request(
+        "DELETE", f"{url}bulk", headers=normal_user_token_headers, json=ids
+    )
+    assert response.status_code == 200
+    assert response.json()["message"] == "5 items deleted successfully"
+    assert client.get(url, headers=normal_user_token_headers).json()["count"] == before
+
+
+def test_bulk_items_ownership(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    own = client.post(
+        f"{url}bulk", headers=normal_user_token_headers, json=[{"title": "Mine"}]
+    ).json()["data"][0]
+    other = create_random_item(db)
+
+    response = client.patch(
+        f"{url}bulk",
+        headers=normal_user_token_headers,
+        json=[
+            {"id": own["id"], "title": "Changed"},
+            {"id": str(other.id), "title": "Stolen"},
+        ],
+    )
+    assert response.status_code == 400
+    assert str(other.id) in response.json()["detail"]
+    response = client.request(
+        "DELETE",
+        f"{url}bulk",
+        headers=normal_user_token_headers,
+        json=[own["id"], str(other.id)],
+    )
+    assert response.status_code == 400
+
+    # Nothing was written
+    db.refresh(other)
+    assert other.title != "Stolen"
+    response = client.get(f"{url}{own['id']}", headers=normal_user_token_headers)
+    assert response.json()["title"] == "Mine"
+
+
+def test_bulk_items_limits(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/items/bulk"
+    with patch("app.api.routes.items.settings.ITEMS_BULK_MAX", 2):
+        response = client.post(
+            url, headers=superuser_token_headers, json=[{"title": "x"}] * 3
+        )
+    assert response.status_code == 413
+    item_id = str(uuid.uuid4())
+    response = client.request(
+        "DELETE", url, headers=superuser_token_headers, json=[item_id, item_id]
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Duplicate item ids"
@@ -1,13 +1,17 @@
 import uuid
+from collections.abc import Callable
+from contextlib import AbstractContextManager
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
-from sqlmodel import Session, select
+from sqlalchemy import text
+from sqlmodel import Session, func, select
 
 from app import crud
 from app.core.config import settings
 from app.core.security import verify_password
-from app.models import User, UserCreate
+from app.models import Item, ItemCreate, User, UserCreate
+from app.tests.utils.user import create_random_user
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -31,6 +35,9 @@ def test_get_users_normal_user_me(
     assert current_user["is_active"] is True
     assert current_user["is_superuser"] is False
     assert current_user["email"] == settings.EMAIL_TEST_USER
+    # At most the lookup of the user, none when it's cached
+    assert int(r.headers["X-DB-Queries"]) <= 1
+    assert float(r.headers["X-DB-Time-Ms"]) >= 0
 
 
 def test_create_user_new_email(
@@ -75,7 +82,11 @@ def test_get_existing_user(
     assert existing_user.email == api_user["email"]
 
 
-def test_get_existing_user_current_user(client: TestClient, db: Session) -> None:
+def test_get_existing_user_current_user(
+    client: TestClient,
+    db: Session,
+    max_queries: Callable[[int], AbstractContextManager[list[str]]],
+) -> None:
     username = random_email()
     password = random_lower_string()
     user_in = UserCreate(email=username, password=password)
@@ -91,10 +102,12 @@ def test_get_existing_user_current_user(client: TestClient, db: Session) -> None
     a_token = tokens["access_token"]
     headers = {"Authorization": f"Bearer {a_token}"}
 
-    r = client.get(
-        f"{settings.API_V1_STR}/users/{user_id}",
-        headers=headers,
-    )
+    # Only the lookup of the token's user
+    with max_queries(1):
+        r = client.get(
+            f"{settings.API_V1_STR}/users/{user_id}",
+            headers=headers,
+        )
     assert 200 <= r.status_code < 300
     api_user = r.json()
     existing_user = crud.get_user_by_email(session=db, email=username)
@@ -168,6 +181,49 @@ def test_retrieve_users(
         assert "email" in item
 
 
+def test_retrieve_users_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(2):
+        crud.create_user(
+            session=db,
+            user_create=UserCreate(
+                email=random_email(), password=random_lower_string()
+            ),
+        )
+    url = f"{settings.API_V1_STR}/users/"
+    first = client.get(url, headers=superuser_token_headers, params={"limit": 2}).json()
+    assert len(first["data"]) == 2
+    assert first["next_cursor"]
+    second = client.get(
+        url,
+        headers=superuser_token_headers,
+        params={"limit": 2, "cursor": first["next_cursor"]},
+    ).json()
+    first_ids = {user["id"] for user in first["data"]}
+    assert all(user["id"] > max(first_ids) for user in second["data"])
+
+
+def test_retrieve_users_count(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    url = f"{settings.API_V1_STR}/users/"
+    r = client.get(url, headers=superuser_token_headers)
+    assert r.json()["count"] == db.exec(select(func.count()).select_from(User)).one()
+
+    r = client.get(url, headers=superuser_token_headers, params={"include_count": 0})
+    assert r.json()["count"] is None
+
+    db.execute(text('ANALYZE "user"'))
+    db.commit()
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = '\"user\"'::regclass")
+    ).scalar_one()
+    with patch("app.crud.settings.LIST_COUNT_ESTIMATES", True):
+        r = client.get(url, headers=superuser_token_headers)
+    assert r.json()["count"] == estimate
+
+
 def test_update_user_me(
     client: TestClient, normal_user_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -444,6 +500,67 @@ def test_delete_user_super_user(
     assert result is None
 
 
+def test_delete_user_in_background(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db)
+    user_id = user.id
+    for _ in range(5):
+        crud.create_item(session=db, item_in=ItemCreate(title="x"), owner_id=user_id)
+
+    # TestClient runs the background task before returning
+    with patch("app.services.user_deletion.settings.USER_DELETE_BATCH_SIZE", 2):
+        r = client.delete(
+            f"{settings.API_V1_STR}/users/{user_id}",
+            headers=superuser_token_headers,
+            params={"background": True},
+        )
+    assert r.status_code == 202
+    deletion = r.json()
+    assert deletion["user_id"] == str(user_id)
+    assert deletion["items_total"] == 5
+    assert deletion["finished_at"] is None
+
+    db.expire_all()
+    assert db.get(User, user_id) is None
+    assert db.exec(select(Item).where(Item.owner_id == user_id)).first() is None
+    r = client.get(
+        f"{settings.API_V1_STR}/users/deletions/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    progress = next(d for d in r.json()["data"] if d["user_id"] == str(user_id))
+    assert progress["items_deleted"] == 5
+    assert progress["finished_at"] is not None
+
+
+def test_delete_user_in_background_twice_retries_purge(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db)
+    url = f"{settings.API_V1_STR}/users/{user.id}"
+
+    with patch(
+        "app.services.user_deletion.purge_user",
+        side_effect=[RuntimeError("connection lost"), None],
+    ) as purge:
+        for _ in range(2):
+            r = client.delete(
+                url, headers=superuser_token_headers, params={"background": True}
+            )
+            assert r.status_code == 202
+    assert purge.call_count == 2
+    assert r.json()["user_id"] == str(user.id)
+
+
+def test_user_deletions_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/users/deletions/", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
+
+
 def test_delete_user_not_found(
     client: TestClient, superuser_token_headers: dict[str, str]
 ) -> None:
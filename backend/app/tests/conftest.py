@@ -1,11 +1,15 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import Engine, event
 from sqlmodel import Session, delete
 
 from app.core.config import settings
 from app.core.db import engine, init_db
+from app.core.query_stats import current_stats, track_queries
 from app.main import app
 from app.models import Item, User
 from app.tests.utils.user import authentication_token_from_email
@@ -40,3 +44,37 @@ def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]
     return authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
+
+
+@pytest.fixture
+def max_queries() -> Callable[[int], AbstractContextManager[list[str]]]:
+    """
+    Fail when the block runs more SQL statements than `limit`, e.g.
+
+        with max_queries(2):
+            client.get(...)
+    """
+
+    @contextmanager
+    def check(limit: int) -> Iterator[list[str]]:
+        statements: list[str] = []
+
+        def collect(*args: Any) -> None:
+            # Statements of the block and of requests, which the query stats
+            # middleware tracks, not those of the app's background tasks
+            if current_stats() is not None:
+                statements.append(args[2])
+
+        # On every engine and thread, the app runs in TestClient's thread
+        event.listen(Engine, "before_cursor_execute", collect)
+        try:
+            with track_queries():
+                yield statements
+        finally:
+            event.remove(Engine, "before_cursor_execute", collect)
+        assert len(statements) <= limit, (
+            f"{len(statements)} queries, expected at most {limit}:\n"
+            + "\n".join(statements)
+        )
+
+    return check
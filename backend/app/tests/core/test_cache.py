@@ -0,0 +1,192 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from app.core.cache import CacheBackend, MmapCache, PostgresCache, TTLCache
+from app.core.db import engine
+
+
+def test_get_set_and_expire() -> None:
+    cache = TTLCache(max_entries=10, default_ttl=60)
+    cache.set("a", {"price": 1})
+    cache.set("b", 2, ttl=0.01)
+    assert cache.get("a") == {"price": 1}
+    time.sleep(0.02)
+    assert cache.get("b") is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_evicts_least_recently_used() -> None:
+    cache = TTLCache(max_entries=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats.evictions == 1
+
+
+def test_ttl_remaining() -> None:
+    cache = TTLCache(max_entries=10, default_ttl=60)
+    assert cache.ttl_remaining("missing") == 0
+    cache.set("a", 1, ttl=30)
+    assert 29 < cache.ttl_remaining("a") <= 30
+
+
+def test_get_or_set_calls_factory_once() -> None:
+    cache = TTLCache(max_entries=10, default_ttl=60)
+    calls = []
+
+    def factory() -> str:
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_set("a", factory) == "value"
+    assert cache.get_or_set("a", factory) == "value"
+    assert len(calls) == 1
+
+
+def test_get_or_set_concurrent_misses_share_one_value() -> None:
+    cache = TTLCache(max_entries=10, default_ttl=60)
+    barrier = threading.Barrier(8)
+    results: list[str] = []
+
+    def worker(n: int) -> None:
+        def factory() -> str:
+            barrier.wait()
+            return f"value {n}"
+
+        results.append(cache.get_or_set("a", factory))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == 1
+    assert cache.get("a") == results[0]
+
+
+@pytest.fixture(params=["memory", "postgres", "mmap"])
+def backend(
+    request: pytest.FixtureRequest, tmp_path: Path
+) -> Generator[CacheBackend, None, None]:
+    cache: CacheBackend
+    if request.param == "postgres":
+        cache = PostgresCache(
+            "test", engine=engine, max_entries=10, default_ttl=60, prune_every=1
+        )
+    elif request.param == "mmap":
+        cache = MmapCache(tmp_path / "test.cache", max_entries=64, default_ttl=60)
+    else:
+        cache = TTLCache(max_entries=10, default_ttl=60)
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def test_backend_get_set_delete_and_expire(backend: CacheBackend) -> None:
+    backend.set("a", {"price": "1000", "messages": ["Termo: $ 1.000"]})
+    backend.set("b", [1, 2], ttl=0.05)
+    assert backend.get("a") == {"price": "1000", "messages": ["Termo: $ 1.000"]}
+    assert backend.get("b") == [1, 2]
+    assert 59 < backend.ttl_remaining("a") <= 60
+    time.sleep(0.1)
+    assert backend.get("b") is None
+    assert backend.ttl_remaining("b") == 0
+    backend.delete("a")
+    assert backend.get("a") is None
+
+
+def test_backend_async_methods(backend: CacheBackend) -> None:
+    async def run() -> None:
+        await backend.aset("a", ["Termo: $ 1.000"])
+        assert await backend.aget("a") == ["Termo: $ 1.000"]
+        assert 59 < await backend.attl_remaining("a") <= 60
+        await backend.adelete("a")
+        assert await backend.aget("a") is None
+
+    asyncio.run(run())
+
+
+def test_backend_get_or_set_keeps_first_value(backend: CacheBackend) -> None:
+    assert backend.get_or_set("a", lambda: "first") == "first"
+    assert backend.get_or_set("a", lambda: "second") == "first"
+
+    # A value stored while the factory ran wins over the factory's
+    def racing_factory() -> str:
+        backend.set("b", "stored meanwhile")
+        return "computed"
+
+    assert backend.get_or_set("b", racing_factory) == "stored meanwhile"
+    assert backend.get("b") == "stored meanwhile"
+
+
+def test_postgres_cache_is_bounded_and_namespaced() -> None:
+    cache = PostgresCache(
+        "bounded", engine=engine, max_entries=3, default_ttl=60, prune_every=1
+    )
+    other = PostgresCache("other", engine=engine, max_entries=3, default_ttl=60)
+    other.set("k0", "other")
+    for i in range(5):
+        cache.set(f"k{i}", i, ttl=60 + i)
+
+    assert [cache.get(f"k{i}") for i in range(5)] == [None, None, 2, 3, 4]
+    assert other.get("k0") == "other"
+    cache.clear()
+    other.clear()
+
+
+def test_mmap_cache_bounds_slots_and_value_size(tmp_path: Path) -> None:
+    cache = MmapCache(tmp_path / "small.cache", max_entries=4, default_ttl=60)
+    for i in range(10):
+        cache.set(f"k{i}", i)
+    assert sum(cache.get(f"k{i}") is not None for i in range(10)) <= 4
+    assert cache.stats.evictions >= 6
+    assert (tmp_path / "small.cache").stat().st_size == 4 * 2048
+
+    cache.set("big", "small")
+    cache.set("big", "x" * 4096)
+    assert cache.get("big") is None
+
+
+def test_mmap_cache_misses_torn_slots(tmp_path: Path) -> None:
+    path = tmp_path / "torn.cache"
+    cache = MmapCache(path, max_entries=4, default_ttl=60)
+    cache.set("key", {"answer": "first"})
+    # A writer killed halfway through overwriting the payload
+    with path.open("r+b") as f:
+        data = f.read()
+        offset = data.index(b'"first"')
+        f.seek(offset)
+        f.write(b'"sec')
+    assert cache.get("key") is None
+    assert asyncio.run(cache.aget("key")) is None
+
+    cache.set("key", {"answer": "second"})
+    assert cache.get("key") == {"answer": "second"}
+
+
+def _store_in_child(path: Path) -> None:
+    MmapCache(path, max_entries=64, default_ttl=60).set("from child", {"pid": 1})
+
+
+def test_mmap_cache_is_shared_between_processes(tmp_path: Path) -> None:
+    path = tmp_path / "shared.cache"
+    cache = MmapCache(path, max_entries=64, default_ttl=60)
+    cache.set("warm", True)
+    process = multiprocessing.get_context("spawn").Process(
+        target=_store_in_child, args=(path,)
+    )
+    process.start()
+    process.join(30)
+
+    assert process.exitcode == 0
+    assert cache.get("from child") == {"pid": 1}
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+from app.core.config import settings
+from app.core.db import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    PoolMetrics,
+    async_engine,
+    engine,
+    warm_up_pools,
+)
+
+
+def test_pool_metrics_histogram() -> None:
+    metrics = PoolMetrics()
+    metrics.observe(0.0005)
+    metrics.observe(0.02)
+    metrics.observe(30.0, timed_out=True)
+
+    snapshot = metrics.snapshot(engine.pool)
+    assert snapshot["checkouts"] == 2
+    assert snapshot["timeouts"] == 1
+    assert snapshot["max_wait_seconds"] == 30.0
+    assert snapshot["checkout_latency"]["le_0.001"] == 1
+    assert snapshot["checkout_latency"]["le_0.05"] == 1
+    assert snapshot["checkout_latency"]["le_inf"] == 1
+    assert sum(snapshot["checkout_latency"].values()) == 3
+
+
+def test_engine_checkouts_are_counted() -> None:
+    metrics = InstrumentedQueuePool.metrics
+    before = metrics.checkouts
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        assert metrics.snapshot(engine.pool)["checked_out"] >= 1
+    assert metrics.checkouts == before + 1
+    assert metrics.snapshot(engine.pool)["size"] == settings.DB_POOL_SIZE
+
+
+def test_pool_timeout_is_counted() -> None:
+    small = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    metrics = InstrumentedQueuePool.metrics
+    before = metrics.timeouts
+    try:
+        with small.connect():
+            with pytest.raises(exc.TimeoutError):
+                small.connect()
+    finally:
+        small.dispose()
+    assert metrics.timeouts == before + 1
+
+
+def test_warm_up_opens_the_pools() -> None:
+    async def run() -> tuple[int, int]:
+        try:
+            await warm_up_pools(2)
+            return (
+                InstrumentedQueuePool.metrics.snapshot(engine.pool)["checked_in"],
+                InstrumentedAsyncQueuePool.metrics.snapshot(async_engine.pool)[
+                    "checked_in"
+                ],
+            )
+        finally:
+            await async_engine.dispose()
+
+    engine.dispose()
+    sync_idle, async_idle = asyncio.run(run())
+    assert sync_idle >= 2
+    assert async_idle >= 2
+    assert InstrumentedAsyncQueuePool.metrics.checkouts >= 2
+
+
+def test_db_pool_endpoint(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/db-pool/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert set(body) == {"sync", "async"}
+    assert body["async"]["checkouts"] > 0
+    assert "le_inf" in body["sync"]["checkout_latency"]
+
+
+def test_db_pool_endpoint_needs_superuser(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/db-pool/", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
@@ -0,0 +1,38 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.db import async_engine, engine
+from app.core.query_stats import track_queries
+
+
+def test_track_queries_counts_sync_and_async_statements() -> None:
+    async def run_async() -> None:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    with track_queries() as stats:
+        with Session(engine) as session:
+            session.execute(text("SELECT 1"))
+            session.execute(text("SELECT pg_sleep(0.01)"))
+        asyncio.run(run_async())
+
+    assert stats.count == 3
+    assert stats.seconds >= 0.01
+
+    # Nothing is counted outside the block
+    with Session(engine) as session:
+        session.execute(text("SELECT 1"))
+    assert stats.count == 3
+
+
+def test_failed_statements_are_not_counted() -> None:
+    with track_queries() as stats:
+        with Session(engine) as session:
+            try:
+                session.execute(text("SELECT missing_column"))
+            except Exception:
+                session.rollback()
+            session.execute(text("SELECT 1"))
+    assert stats.count == 1
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+import uuid
+from collections.abc import Generator
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.cache import CacheBackend, PostgresCache, TTLCache
+from app.core.config import settings
+from app.core.db import engine
+from app.core.replicas import ReplicaRouter, run_replica_sticky_listener
+
+# Point at a second local Postgres, e.g. a streaming replica of the test
+# database, to run these against a real one. Defaults to the primary.
+REPLICA_URI = os.getenv("TEST_REPLICA_URI", str(settings.SQLALCHEMY_DATABASE_URI))
+
+
+def make_router(
+    replicas: list[AsyncEngine],
+    *,
+    sticky_seconds: float = 10.0,
+    sticky: CacheBackend | None = None,
+) -> ReplicaRouter:
+    return ReplicaRouter(
+        create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool),
+        replicas,
+        max_lag=5.0,
+        sticky=sticky or TTLCache(max_entries=100, default_ttl=sticky_seconds),
+        sticky_seconds=sticky_seconds,
+    )
+
+
+def test_engine_for_skips_lagging_and_unchecked_replicas() -> None:
+    fresh = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    behind = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    router = make_router([fresh, behind])
+
+    def engine_for() -> AsyncEngine:
+        return asyncio.run(router.engine_for(None))
+
+    # Nothing checked yet
+    assert engine_for() is router.primary
+    router.replicas[0].lag = 0.5
+    router.replicas[1].lag = 60.0
+    assert {engine_for() for _ in range(20)} == {fresh}
+    router.replicas[0].lag = None
+    assert engine_for() is router.primary
+
+
+def test_reads_stick_to_primary_after_a_write() -> None:
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    router = make_router([replica], sticky_seconds=0.05)
+    router.replicas[0].lag = 0.0
+    user_id = uuid.uuid4()
+
+    async def run() -> None:
+        await router.mark_write(user_id)
+        assert await router.engine_for(user_id) is router.primary
+        assert await router.engine_for(None) is replica
+        await asyncio.sleep(0.06)
+        assert await router.engine_for(user_id) is replica
+
+    asyncio.run(run())
+
+
+def test_writes_stick_in_every_worker() -> None:
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    # Two workers, each with its own router over the shared table
+    workers = [
+        make_router(
+            [replica],
+            sticky=PostgresCache(
+                "replica_sticky_test", engine=engine, max_entries=10, default_ttl=10
+            ),
+        )
+        for _ in range(2)
+    ]
+    for router in workers:
+        router.replicas[0].lag = 0.0
+    user_id = uuid.uuid4()
+
+    async def run() -> None:
+        await workers[0].mark_write(user_id)
+        assert await workers[1].engine_for(user_id) is workers[1].primary
+
+    asyncio.run(run())
+    workers[0].sticky.clear()
+
+
+def test_check_lag() -> None:
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    down = create_async_engine(
+        "postgresql+psycopg://postgres:x@localhost:1/app", poolclass=NullPool
+    )
+    router = make_router([replica, down])
+
+    asyncio.run(router.check_lag())
+
+    assert router.replicas[0].lag is not None
+    assert router.replicas[0].lag <= router.max_lag
+    assert router.replicas[1].lag is None
+    report = router.report()
+    assert [entry["healthy"] for entry in report] == [True, False]
+    assert "x@" not in str(report[1]["replica"])
+
+
+@pytest.fixture
+def replica_queries() -> Generator[list[str], None, None]:
+    """Route reads to a replica engine and collect the statements it runs."""
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    statements: list[str] = []
+
+    def collect(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(replica.sync_engine, "before_cursor_execute", collect)
+    router = make_router([replica])
+    router.replicas[0].lag = 0.0
+    with (
+        patch("app.api.deps.replica_router", router),
+        patch("app.core.replicas.replica_router", router),
+    ):
+        yield statements
+
+
+def test_read_endpoints_use_the_replica(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    replica_queries: list[str],
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 200
+    assert any("FROM item" in statement for statement in replica_queries)
+
+    # After their own write, the user reads from the primary
+    replica_queries.clear()
+    response = client.post(url, headers=normal_user_token_headers, json={"title": "x"})
+    assert response.status_code == 200
+    response = client.get(
+        f"{url}{response.json()['id']}", headers=normal_user_token_headers
+    )
+    assert response.status_code == 200
+    assert replica_queries == []
+
+
+class FailingCache(TTLCache):
+    async def aset(self, key: str, value: Any, ttl: float | None = None) -> None:
+        raise ConnectionError("primary unreachable")
+
+
+def test_failed_mark_keeps_the_write_and_sticks_in_the_worker(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    router = make_router([replica], sticky=FailingCache(max_entries=10, default_ttl=10))
+    router.replicas[0].lag = 0.0
+    me = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    )
+    url = f"{settings.API_V1_STR}/items/"
+    with (
+        patch("app.api.deps.replica_router", router),
+        patch("app.core.replicas.replica_router", router),
+    ):
+        response = client.post(
+            url, headers=normal_user_token_headers, json={"title": "x"}
+        )
+    assert response.status_code == 200
+    assert router.recent.get(me.json()["id"]) is not None
+
+
+def test_listener_keeps_other_workers_writes() -> None:
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    # Separate markers, the listening worker only learns of the write by NOTIFY
+    writer, reader = make_router([replica]), make_router([replica])
+    for router in (writer, reader):
+        router.replicas[0].lag = 0.0
+    user_id = uuid.uuid4()
+
+    async def run() -> bool:
+        listener = asyncio.create_task(run_replica_sticky_listener())
+        try:
+            while reader.listening_since is None:
+                await asyncio.sleep(0.01)
+            await writer.mark_write(user_id)
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if reader.recent.get(str(user_id)) is not None:
+                    return await reader.engine_for(user_id) is reader.primary
+                await asyncio.sleep(0.01)
+            return False
+        finally:
+            listener.cancel()
+
+    with patch("app.core.replicas.replica_router", reader):
+        assert asyncio.run(run())
+
+
+def test_listening_worker_skips_the_shared_markers() -> None:
+    replica = create_async_engine(REPLICA_URI, poolclass=NullPool)
+    router = make_router([replica], sticky_seconds=10)
+    router.replicas[0].lag = 0.0
+    user_id = uuid.uuid4()
+    router.sticky.set(str(user_id), True)
+
+    async def engine_for() -> AsyncEngine:
+        return await router.engine_for(user_id)
+
+    # Just connected, a mark from before may only be in `sticky`
+    router.listening_since = time.monotonic()
+    assert asyncio.run(engine_for()) is router.primary
+    # Listening long enough, `recent` has every live mark
+    router.listening_since = time.monotonic() - 10
+    assert asyncio.run(engine_for()) is replica
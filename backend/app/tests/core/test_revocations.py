@@ -0,0 +1,108 @@
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session
+
+from app.core import security
+from app.core.config import settings
+from app.core.revocations import Revocations, revocations
+from app.models import TokenPayload
+from app.tests.utils.user import create_random_user, user_authentication_headers
+from app.tests.utils.utils import random_lower_string
+
+
+def make_engine() -> AsyncEngine:
+    return create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+
+
+def test_allows() -> None:
+    checker = Revocations(refresh_interval=5)
+    user_id = uuid.uuid4()
+    token_data = TokenPayload(sub=str(user_id), iat=int(time.time()))
+    # Not loaded yet
+    assert not checker.allows(token_data)
+
+    checker.loaded_at = time.monotonic()
+    assert checker.allows(token_data)
+    assert not checker.allows(TokenPayload(sub=str(user_id)))
+    checker.revoked[user_id] = time.time() + 1
+    assert not checker.allows(token_data)
+    checker.revoked[user_id] = time.time() - 10
+    assert checker.allows(token_data)
+
+    checker.loaded_at = time.monotonic() - 11
+    assert not checker.allows(token_data)
+
+
+def test_refresh_loads_deactivated_users(db: Session) -> None:
+    user = create_random_user(db)
+    checker = Revocations(refresh_interval=5)
+    asyncio.run(checker.refresh(make_engine()))
+    assert user.id not in checker.revoked
+
+    user.is_active = False
+    db.add(user)
+    db.commit()
+    asyncio.run(checker.refresh(make_engine()))
+    assert checker.revoked[user.id] <= time.time()
+
+
+def test_read_routes_authorize_from_claims(client: TestClient, db: Session) -> None:
+    password = random_lower_string()
+    user = create_random_user(db)
+    user.hashed_password = security.get_password_hash(password)
+    db.add(user)
+    db.commit()
+    headers = user_authentication_headers(
+        client=client, email=user.email, password=password
+    )
+    asyncio.run(revocations.refresh(make_engine()))
+
+    url = f"{settings.API_V1_STR}/items/"
+    r = client.get(url, headers=headers, params={"include_count": False})
+    assert r.status_code == 200
+    # Only the page of items, no user lookup
+    assert r.headers["X-DB-Queries"] == "1"
+
+    # Deactivated, the token's claims aren't trusted anymore
+    user.is_active = False
+    db.add(user)
+    db.commit()
+    asyncio.run(revocations.refresh(make_engine()))
+    r = client.get(url, headers=headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Inactive user"
+
+
+def test_tokens_without_claims_load_the_user(client: TestClient, db: Session) -> None:
+    user = create_random_user(db)
+    token = security.create_access_token(user.id, timedelta(minutes=5))
+    asyncio.run(revocations.refresh(make_engine()))
+    r = client.get(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert r.status_code == 200
+    assert r.json()["email"] == user.email
+
+
+def test_refresh_ignores_reloads_overtaken_by_newer_ones(db: Session) -> None:
+    user = create_random_user(db)
+    user.is_active = False
+    db.add(user)
+    db.commit()
+    checker = Revocations(refresh_interval=5)
+    # As if a reload that started after this one had already finished
+    checker._started_at = time.monotonic() + 60
+
+    asyncio.run(checker.refresh(make_engine()))
+
+    assert checker.revoked == {}
+    assert checker.loaded_at == 0
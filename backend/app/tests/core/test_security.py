@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import jwt
+import pytest
+
+from app.core import security
+
+
+def test_access_token_claims() -> None:
+    token = security.create_access_token(
+        "user", timedelta(minutes=5), is_active=True, is_superuser=False
+    )
+    token_data = security.decode_access_token(token)
+    assert token_data.sub == "user"
+    assert token_data.is_active is True
+    assert token_data.is_superuser is False
+    assert token_data.iat is not None
+    assert token_data.iat <= time.time()
+
+    plain = security.decode_access_token(
+        security.create_access_token("user", timedelta(minutes=5))
+    )
+    assert plain.is_active is None
+    assert plain.is_superuser is None
+
+
+def test_tokens_are_verified_once() -> None:
+    token = security.create_access_token("cached", timedelta(minutes=5))
+    with patch("app.core.security.jwt.decode", wraps=jwt.decode) as decode:
+        first = security.decode_access_token(token)
+        second = security.decode_access_token(token)
+    assert decode.call_count == 1
+    assert second == first
+
+    with pytest.raises(jwt.InvalidTokenError):
+        security.decode_access_token(token + "x")
+
+
+def test_cached_tokens_expire() -> None:
+    token = security.create_access_token("expiring", timedelta(seconds=1))
+    security.decode_access_token(token)
+    time.sleep(1.1)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        security.decode_access_token(token)
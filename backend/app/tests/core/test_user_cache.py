@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, col, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.query_stats import track_queries
+from app.core.user_cache import UserCache, run_user_cache_listener, user_cache
+from app.models import User
+from app.tests.utils.user import create_random_user
+
+
+def make_user_cache() -> UserCache:
+    cache = UserCache(TTLCache(max_entries=10, default_ttl=30), ttl=30)
+    cache.listening = True
+    return cache
+
+
+def test_hits_skip_the_database(db: Session) -> None:
+    user = create_random_user(db)
+    user_id, email = str(user.id), user.email
+    cache = make_user_cache()
+    db_engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+
+    async def lookup() -> User | None:
+        async with AsyncSession(db_engine) as session:
+            return await cache.get(session, user_id)
+
+    with track_queries() as stats:
+        first = asyncio.run(lookup())
+        second = asyncio.run(lookup())
+    assert first and second
+    assert second.email == first.email == email
+    assert second.hashed_password == first.hashed_password
+    assert stats.count == 1
+
+    report = cache.report()
+    assert report["hits"] == 1
+    assert report["hit_rate"] == 0.5
+    assert report["db_seconds_saved"] > 0
+
+    # Inactive users aren't cached
+    cache.drop(user_id)
+    user.is_active = False
+    db.add(user)
+    db.commit()
+    asyncio.run(lookup())
+    assert cache.cache.get(user_id) is None
+
+
+def test_listener_drops_users_changed_by_any_connection(db: Session) -> None:
+    user = create_random_user(db)
+
+    async def run() -> bool:
+        listener = asyncio.create_task(run_user_cache_listener())
+        try:
+            while not user_cache.listening:
+                await asyncio.sleep(0.01)
+            user_cache.cache.set(str(user.id), {"id": str(user.id)})
+            # A write that doesn't go through the app
+            statement = update(User).where(col(User.id) == user.id)
+            db.exec(statement.values(full_name="Changed"))  # type: ignore
+            db.commit()
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if user_cache.cache.get(str(user.id)) is None:
+                    return True
+                await asyncio.sleep(0.01)
+            return False
+        finally:
+            listener.cancel()
+
+    assert asyncio.run(run())
+    assert not user_cache.listening
+
+
+def test_updates_are_seen_by_the_next_request(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/users/me"
+    client.get(url, headers=normal_user_token_headers)
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.headers["X-DB-Queries"] == "0"
+
+    r = client.patch(url, headers=normal_user_token_headers, json={"full_name": "New"})
+    assert r.status_code == 200
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.json()["full_name"] == "New"
@@ -1,7 +1,11 @@
+import asyncio
+
 from fastapi.encoders import jsonable_encoder
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud
+from app.core.db import async_engine
 from app.core.security import verify_password
 from app.models import User, UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
@@ -89,3 +93,57 @@ def test_update_user(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+def test_create_and_authenticate_user_async() -> None:
+    email = random_email()
+    password = random_lower_string()
+
+    async def run() -> tuple[User, User | None, User | None]:
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                user = await crud.create_user_async(
+                    session=session,
+                    user_create=UserCreate(email=email, password=password),
+                )
+                authenticated = await crud.authenticate_async(
+                    session=session, email=email, password=password
+                )
+                wrong = await crud.authenticate_async(
+                    session=session, email=email, password=password + "x"
+                )
+                return user, authenticated, wrong
+        finally:
+            await async_engine.dispose()
+
+    user, authenticated, wrong = asyncio.run(run())
+    assert authenticated is not None
+    assert authenticated.id == user.id
+    assert wrong is None
+    assert verify_password(password, user.hashed_password)
+
+
+def test_update_user_async(db: Session) -> None:
+    user = crud.create_user(
+        session=db,
+        user_create=UserCreate(email=random_email(), password=random_lower_string()),
+    )
+    new_password = random_lower_string()
+
+    async def run() -> User:
+        try:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                db_user = await session.get(User, user.id)
+                assert db_user is not None
+                await crud.update_user_async(
+                    session=session,
+                    db_user=db_user,
+                    user_in=UserUpdate(password=new_password, is_superuser=True),
+                )
+                return db_user
+        finally:
+            await async_engine.dispose()
+
+    updated = asyncio.run(run())
+    assert updated.is_superuser
+    assert verify_password(new_password, updated.hashed_password)
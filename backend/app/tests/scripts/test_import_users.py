@@ -0,0 +1,140 @@
+import json
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, TypeVar
+
+from psycopg.pq import TransactionStatus
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.core.security import verify_password
+from app.import_users import import_users, load_chunk
+from app.models import UserCreate
+from app.tests.utils.utils import random_email, random_lower_string
+
+T = TypeVar("T")
+
+
+class InlineExecutor(Executor):
+    """Hashes in the test's thread, noting what and in which transaction state."""
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self.passwords: list[str] = []
+        self.statuses: list[TransactionStatus] = []
+
+    def map(
+        self, fn: Callable[..., T], *iterables: Iterable[Any], **_: Any
+    ) -> Iterator[T]:
+        self.statuses.append(self.connection.info.transaction_status)
+        (passwords,) = iterables
+        self.passwords.extend(passwords)
+        return map(fn, self.passwords)
+
+
+def test_import_users_csv(tmp_path: Path, db: Session) -> None:
+    emails = [random_email() for _ in range(3)]
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "email,password,full_name\n"
+        f"{emails[0]},{'a' * 10},Ana\n"
+        f"{emails[1]},{'b' * 10},\n"
+        "not-an-email,password123,X\n"
+        f"{emails[2]},short,Y\n"
+        f"{emails[0]},{'c' * 10},Ana again\n"
+    )
+
+    report = import_users(path, chunk_size=2, workers=2)
+
+    assert (report.read, report.inserted, report.skipped, report.rejected) == (
+        5,
+        2,
+        1,
+        2,
+    )
+    user = crud.get_user_by_email(session=db, email=emails[0])
+    assert user is not None
+    assert user.full_name == "Ana"
+    assert user.is_active and not user.is_superuser
+    assert verify_password("a" * 10, user.hashed_password)
+    assert crud.get_user_by_email(session=db, email=emails[2]) is None
+
+
+def test_import_users_ndjson_update(tmp_path: Path, db: Session) -> None:
+    email = random_email()
+    existing = crud.create_user(
+        session=db,
+        user_create=UserCreate(email=email, password=random_lower_string()),
+    )
+    new_email = random_email()
+    path = tmp_path / "users.ndjson"
+    path.write_text(
+        "\n".join(
+            json.dumps(record)
+            for record in (
+                {"email": email, "password": "new password", "full_name": "Renamed"},
+                {"email": new_email, "password": "password123"},
+            )
+        )
+    )
+
+    report = import_users(path, workers=1, on_conflict="update")
+
+    assert (report.inserted, report.updated) == (1, 1)
+    db.refresh(existing)
+    assert existing.full_name == "Renamed"
+    assert verify_password("new password", existing.hashed_password)
+    assert crud.get_user_by_email(session=db, email=new_email) is not None
+
+
+def test_import_users_ndjson_rejects_unreadable_lines(
+    tmp_path: Path, db: Session
+) -> None:
+    email = random_email()
+    path = tmp_path / "users.jsonl"
+    path.write_text(
+        "\n".join(
+            [
+                '{"email": "broken',
+                json.dumps(["not", "an", "object"]),
+                json.dumps({"email": email, "password": "password123"}),
+            ]
+        )
+    )
+
+    report = import_users(path, workers=1)
+
+    assert (report.read, report.rejected, report.inserted) == (3, 2, 1)
+    assert crud.get_user_by_email(session=db, email=email) is not None
+
+
+def test_load_chunk_hashes_each_new_email_once_outside_a_transaction(
+    db: Session,
+) -> None:
+    existing = crud.create_user(
+        session=db,
+        user_create=UserCreate(email=random_email(), password=random_lower_string()),
+    )
+    email = random_email()
+    chunk = [
+        (1, UserCreate(email=email, password="first password")),
+        (2, UserCreate(email=existing.email, password="password123")),
+        (3, UserCreate(email=email, password="last password")),
+    ]
+    raw = engine.raw_connection()
+    try:
+        executor = InlineExecutor(raw.driver_connection)
+        inserted, updated = load_chunk(
+            raw.driver_connection, chunk, executor=executor, on_conflict="skip"
+        )
+    finally:
+        raw.close()
+
+    assert (inserted, updated) == (1, 0)
+    assert executor.passwords == ["last password"]
+    assert executor.statuses == [TransactionStatus.IDLE]
+    user = crud.get_user_by_email(session=db, email=email)
+    assert user is not None
+    assert verify_password("last password", user.hashed_password)
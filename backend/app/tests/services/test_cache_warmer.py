@@ -0,0 +1,118 @@
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.services import cache_warmer, price_cache
+
+
+def test_compute_answer_is_served_from_cache() -> None:
+    async def fake_fetch(url: str, **_: Any) -> dict[str, Any]:
+        return {"price": "1000", "url": url}
+
+    async def run() -> list[str]:
+        async with httpx.AsyncClient() as http:
+            return await price_cache.compute_answer("Termo Stanley", http=http)
+
+    with (
+        patch(
+            "app.services.openai_helper.get_price_urls",
+            return_value=["https://example.com/termo"],
+        ),
+        patch("app.services.scraper.fetch_price_data", fake_fetch),
+        patch(
+            "app.services.openai_helper.format_price_msg",
+            return_value=["Termo: $ 1.000"],
+        ) as format_mock,
+    ):
+        assert asyncio.run(run()) == ["Termo: $ 1.000"]
+
+    assert asyncio.run(price_cache.cached_answer("termo stanley")) == ["Termo: $ 1.000"]
+    assert format_mock.call_count == 1
+    price_cache.answer_cache.delete("termo stanley")
+
+
+def test_warmer_refreshes_expiring_products_within_budget() -> None:
+    fresh = "warm fresh"
+    price_cache.answer_cache.set(fresh, {"messages": ["ok"], "warmed": False}, ttl=3600)
+    refreshed: list[str] = []
+
+    async def fake_compute(product: str, **kwargs: Any) -> list[str]:
+        assert kwargs["warmed"] is True
+        refreshed.append(product)
+        if product == "warm broken":
+            raise RuntimeError("scrape failed")
+        price_cache.answer_cache.set(product, {"messages": [product], "warmed": True})
+        return [product]
+
+    popular = [fresh, "warm a", "warm broken", "warm b", "warm c"]
+    with (
+        patch.object(cache_warmer, "_popular_products", return_value=popular),
+        patch.object(price_cache, "compute_answer", fake_compute),
+    ):
+        report = asyncio.run(
+            cache_warmer.warm_popular_products(
+                top_n=5, concurrency=2, budget=3, margin=60
+            )
+        )
+
+    assert refreshed == ["warm a", "warm broken", "warm b"]
+    assert report.candidates == 5
+    assert report.refreshed == 2
+    assert report.failed == 1
+    assert report.skipped == 2
+
+    lookups = price_cache.stats.lookups
+    warm_hits = price_cache.stats.warm_hits
+    assert asyncio.run(price_cache.cached_answer("warm a")) == ["warm a"]
+    assert price_cache.stats.lookups == lookups + 1
+    assert price_cache.stats.warm_hits == warm_hits + 1
+    for product in popular:
+        price_cache.answer_cache.delete(product)
+
+
+def test_warmer_runs_in_one_worker_at_a_time() -> None:
+    engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+
+    async def run() -> list[cache_warmer.WarmReport | None]:
+        async with engine.connect() as other_worker:
+            await other_worker.scalar(
+                select(func.pg_advisory_lock(cache_warmer.LOCK_ID))
+            )
+            skipped = await cache_warmer.warm_if_unlocked(engine)
+            await other_worker.scalar(
+                select(func.pg_advisory_unlock(cache_warmer.LOCK_ID))
+            )
+        return [skipped, await cache_warmer.warm_if_unlocked(engine)]
+
+    with patch.object(cache_warmer, "_popular_products", return_value=[]):
+        skipped, report = asyncio.run(run())
+
+    assert skipped is None
+    assert report is not None
+    assert report.candidates == 0
+
+
+def test_warm_hit_ratio_covers_every_worker() -> None:
+    cache_warmer.worker_stats.clear()
+    cache_warmer.worker_stats.set(
+        "other-worker", {"lookups": 10, "hits": 6, "warm_hits": 4}
+    )
+    with patch.object(
+        price_cache, "stats", price_cache.AnswerStats(lookups=10, hits=4, warm_hits=1)
+    ):
+        cache_warmer.publish_stats()
+        totals = cache_warmer.shared_stats()
+        with patch.object(cache_warmer, "_popular_products", return_value=[]):
+            report = asyncio.run(cache_warmer.warm_popular_products())
+    cache_warmer.worker_stats.clear()
+
+    assert (totals.lookups, totals.hits, totals.warm_hits) == (20, 10, 5)
+    assert report.warm_hit_ratio == totals.warm_hit_ratio
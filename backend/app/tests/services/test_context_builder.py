@@ -0,0 +1,96 @@
+import uuid
+from collections.abc import Sequence
+
+from app.services.context_builder import (
+    ContextBuilder,
+    estimate_tokens,
+    message_tokens,
+)
+from app.services.conversation_store import Turn
+
+
+class FakeSummarizer:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str | None, list[str]]] = []
+        self.user_ids: list[uuid.UUID | None] = []
+
+    def __call__(
+        self, previous: str | None, turns: Sequence[Turn], user_id: uuid.UUID | None
+    ) -> str:
+        self.calls.append((previous, [turn.content for turn in turns]))
+        self.user_ids.append(user_id)
+        return f"resumen {len(self.calls)}"
+
+
+def _turns(count: int) -> list[Turn]:
+    return [Turn("user", f"mensaje {i}", float(i)) for i in range(count)]
+
+
+def test_estimate_tokens() -> None:
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hola") == 1
+    assert estimate_tokens("¿precio?") == 4
+    assert estimate_tokens("x" * 40) == 10
+
+
+def test_short_history_goes_verbatim() -> None:
+    summarizer = FakeSummarizer()
+    builder = ContextBuilder(
+        summarize=summarizer, max_tokens=1000, keep_turns=4, stale_after=2
+    )
+    messages = builder.build(conversation_id=uuid.uuid4(), turns=_turns(3))
+    assert [m["content"] for m in messages] == ["mensaje 0", "mensaje 1", "mensaje 2"]
+    assert summarizer.calls == []
+
+
+def test_older_turns_are_summarized() -> None:
+    summarizer = FakeSummarizer()
+    builder = ContextBuilder(
+        summarize=summarizer, max_tokens=1000, keep_turns=2, stale_after=2
+    )
+    user_id = uuid.uuid4()
+    messages = builder.build(
+        conversation_id=uuid.uuid4(), turns=_turns(5), user_id=user_id
+    )
+    assert messages[0]["role"] == "system"
+    assert "resumen 1" in messages[0]["content"]
+    assert [m["content"] for m in messages[1:]] == ["mensaje 3", "mensaje 4"]
+    # The summary counts against the user's OpenAI quota
+    assert summarizer.user_ids == [user_id]
+    assert summarizer.calls == [(None, ["mensaje 0", "mensaje 1", "mensaje 2"])]
+
+
+def test_summary_is_reused_until_stale() -> None:
+    summarizer = FakeSummarizer()
+    builder = ContextBuilder(
+        summarize=summarizer, max_tokens=1000, keep_turns=2, stale_after=2
+    )
+    conversation_id = uuid.uuid4()
+    turns = _turns(5)
+    builder.build(conversation_id=conversation_id, turns=turns)
+
+    # One more turn leaves "mensaje 3" uncovered, still under the threshold
+    turns.append(Turn("user", "mensaje 5", 5.0))
+    messages = builder.build(conversation_id=conversation_id, turns=turns)
+    assert len(summarizer.calls) == 1
+    assert [m["content"] for m in messages[1:]] == [
+        "mensaje 3",
+        "mensaje 4",
+        "mensaje 5",
+    ]
+
+    turns.append(Turn("user", "mensaje 6", 6.0))
+    builder.build(conversation_id=conversation_id, turns=turns)
+    assert summarizer.calls[1] == ("resumen 1", ["mensaje 3", "mensaje 4"])
+
+
+def test_budget_drops_oldest_turns_first() -> None:
+    summarizer = FakeSummarizer()
+    turns = _turns(4)
+    budget = sum(message_tokens(turn.content) for turn in turns[-2:])
+    builder = ContextBuilder(
+        summarize=summarizer, max_tokens=budget, keep_turns=4, stale_after=2
+    )
+    messages = builder.build(conversation_id=uuid.uuid4(), turns=turns)
+    assert [m["content"] for m in messages] == ["mensaje 2", "mensaje 3"]
+    assert summarizer.calls == []
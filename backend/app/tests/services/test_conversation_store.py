@@ -0,0 +1,162 @@
+import uuid
+
+from sqlmodel import Session, select
+
+from app.models import ChatMessage
+from app.services.conversation_store import (
+    ConversationCache,
+    ConversationStore,
+    Turn,
+    conversation_store,
+    flush_conversations,
+)
+from app.tests.utils.user import create_random_user
+
+
+def _store(**kwargs: int) -> ConversationStore:
+    cache = ConversationCache(
+        max_bytes=kwargs.get("max_bytes", 1024 * 1024),
+        max_turns=kwargs.get("max_turns", 10),
+    )
+    return ConversationStore(
+        cache=cache,
+        flush_batch_size=kwargs.get("flush_batch_size", 3),
+        flush_interval=3600,
+    )
+
+
+def test_turn_has_no_instance_dict() -> None:
+    turn = Turn("user", "hola", 0.0)
+    assert not hasattr(turn, "__dict__")
+
+
+def test_cache_tracks_hits_and_misses() -> None:
+    cache = ConversationCache(max_bytes=1024 * 1024, max_turns=10)
+    conversation_id = uuid.uuid4()
+    assert cache.get(conversation_id) is None
+    cache.put(conversation_id, [Turn("user", "hola", 0.0)])
+    assert cache.get(conversation_id) is not None
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.hit_rate == 0.5
+
+
+def test_cache_evicts_least_recently_used_over_budget() -> None:
+    turn = Turn("user", "x" * 100, 0.0)
+    cache = ConversationCache(max_bytes=turn.nbytes * 2, max_turns=10)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    cache.put(first, [turn])
+    cache.put(second, [turn])
+    cache.get(first)
+    cache.put(third, [turn])
+    assert cache.get(second) is None
+    assert cache.get(first) is not None
+    assert cache.get(third) is not None
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.bytes_used <= cache.max_bytes
+
+
+def test_cache_keeps_only_last_turns() -> None:
+    cache = ConversationCache(max_bytes=1024 * 1024, max_turns=2)
+    conversation_id = uuid.uuid4()
+    cache.put(conversation_id, [])
+    for content in ("a", "b", "c"):
+        cache.append(conversation_id, Turn("user", content, 0.0))
+    turns = cache.get(conversation_id)
+    assert turns is not None
+    assert [turn.content for turn in turns] == ["b", "c"]
+
+
+def test_store_flushes_turns_in_batches(db: Session) -> None:
+    store = _store(flush_batch_size=3)
+    user = create_random_user(db)
+    conversation = store.get_or_create_conversation(session=db, user_id=user.id)
+    for content in ("precio de ps5", "$ 999.999 en MercadoLibre"):
+        store.add_turn(
+            session=db,
+            conversation_id=conversation.id,
+            role="user",
+            content=content,
+        )
+    statement = select(ChatMessage).where(
+        ChatMessage.conversation_id == conversation.id
+    )
+    assert db.exec(statement).all() == []
+    assert store.pending_count == 2
+
+    store.add_turn(
+        session=db,
+        conversation_id=conversation.id,
+        role="user",
+        content="¿y en Frávega?",
+    )
+    assert store.pending_count == 0
+    assert len(db.exec(statement).all()) == 3
+
+
+def test_store_reloads_history_after_eviction(db: Session) -> None:
+    store = _store(flush_batch_size=2)
+    user = create_random_user(db)
+    conversation = store.get_or_create_conversation(session=db, user_id=user.id)
+    for content in ("uno", "dos", "tres"):
+        store.add_turn(
+            session=db,
+            conversation_id=conversation.id,
+            role="user",
+            content=content,
+        )
+    store.cache.discard(conversation.id)
+
+    turns = store.recent_turns(session=db, conversation_id=conversation.id)
+
+    # "uno" and "dos" come from Postgres, "tres" is still pending
+    assert [turn.content for turn in turns] == ["uno", "dos", "tres"]
+    assert (
+        store.get_or_create_conversation(session=db, user_id=user.id).id
+        == conversation.id
+    )
+
+
+def test_store_history_skips_turns_flushed_during_the_query(db: Session) -> None:
+    store = _store(flush_batch_size=10)
+    user = create_random_user(db)
+    conversation = store.get_or_create_conversation(session=db, user_id=user.id)
+    for content in ("uno", "dos"):
+        store.add_turn(
+            session=db,
+            conversation_id=conversation.id,
+            role="user",
+            content=content,
+        )
+    in_flight = list(store._pending)
+    store.flush(session=db)
+    # As seen by a read that started while the flush was committing
+    store._flushing = in_flight
+    store.cache.discard(conversation.id)
+
+    turns = store.recent_turns(session=db, conversation_id=conversation.id)
+
+    assert [turn.content for turn in turns] == ["uno", "dos"]
+
+
+def test_flush_conversations_writes_pending_turns(db: Session) -> None:
+    user = create_random_user(db)
+    conversation = conversation_store.get_or_create_conversation(
+        session=db, user_id=user.id
+    )
+    conversation_store.add_turn(
+        session=db,
+        conversation_id=conversation.id,
+        role="user",
+        content="hola",
+    )
+
+    flush_conversations()
+
+    assert conversation_store.pending_count == 0
+    statement = select(ChatMessage).where(
+        ChatMessage.conversation_id == conversation.id
+    )
+    assert [m.content for m in db.exec(statement).all()] == ["hola"]
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.services.intent_router import (
+    Intent,
+    IntentRouter,
+    KeywordTrie,
+    normalize,
+    router,
+)
+
+FIXTURES = json.loads(
+    (Path(__file__).parent / "fixtures" / "intent_messages.json").read_text()
+)
+
+
+@pytest.mark.parametrize(
+    "case", FIXTURES, ids=[c["text"] or "<empty>" for c in FIXTURES]
+)
+def test_classify_labelled_messages(case: dict[str, Any]) -> None:
+    route = router.classify(case["text"])
+    assert route.intent == Intent(case["intent"])
+    assert route.needs_llm == case.get("needs_llm", case["intent"] == "other")
+    if "product" in case:
+        assert route.product == case["product"]
+
+
+def test_normalize_strips_accents_and_punctuation() -> None:
+    assert normalize("  ¿Cuánto SALE   la Frávega?! ") == "cuanto sale la fravega"
+
+
+def test_trie_prefers_longest_phrase() -> None:
+    trie = KeywordTrie()
+    trie.add("xbox", "short")
+    trie.add("xbox series x", "long")
+    assert trie.matches("la xbox series x".split()) == [(1, 4, "long")]
+    assert trie.matches("la xbox one".split()) == [(1, 2, "short")]
+
+
+def test_custom_product_vocabulary() -> None:
+    custom = IntentRouter(products=["termo stanley"])
+    assert custom.classify("Termo Stanley").intent == Intent.PRICE_QUERY
+    assert custom.classify("ps5").needs_llm
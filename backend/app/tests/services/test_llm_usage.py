@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.core.query_stats import track_queries
+from app.models import LLMUsage
+from app.services import llm_usage, price_cache
+from app.services.llm_usage import QuotaExceededError, UsageTracker
+from app.services.model_router import ModelRouter
+from app.tests.utils.user import create_random_user
+
+
+def test_check_enforces_daily_and_monthly_quotas() -> None:
+    user_id = uuid.uuid4()
+    tracker = UsageTracker(daily_quota=100)
+    tracker.check(user_id)
+    tracker.record(user_id, prompt_tokens=60, completion_tokens=40)
+
+    with pytest.raises(QuotaExceededError) as exc_info:
+        tracker.check(user_id)
+    assert exc_info.value.period == "daily"
+    tracker.check(uuid.uuid4())
+
+    tracker = UsageTracker(monthly_quota=100)
+    tracker.record(user_id, prompt_tokens=100, completion_tokens=0)
+    with pytest.raises(QuotaExceededError) as exc_info:
+        tracker.check(user_id)
+    assert exc_info.value.period == "monthly"
+
+
+def test_sync_upserts_usage_and_reloads_totals(db: Session) -> None:
+    user = create_random_user(db)
+    today = datetime.now(timezone.utc).date()
+    # Earlier this month, or the last day of last month on the 1st
+    earlier = today - timedelta(days=1)
+    db.add(
+        LLMUsage(user_id=user.id, day=earlier, prompt_tokens=500, completion_tokens=0)
+    )
+    db.commit()
+
+    tracker = UsageTracker(daily_quota=1000)
+    tracker.record(user.id, prompt_tokens=100, completion_tokens=20)
+    tracker.record(user.id, prompt_tokens=50, completion_tokens=10)
+    assert tracker.sync(session=db) == 1
+    tracker.record(user.id, prompt_tokens=5, completion_tokens=5)
+    assert tracker.sync(session=db) == 1
+
+    usage = db.get(LLMUsage, (user.id, today))
+    assert usage is not None
+    db.refresh(usage)
+    assert (usage.requests, usage.prompt_tokens, usage.completion_tokens) == (
+        3,
+        155,
+        35,
+    )
+    month_tokens = 190 + (500 if earlier.month == today.month else 0)
+    assert tracker.used(user.id) == (190, month_tokens)
+    # Totals come back from the table, a fresh tracker sees them after a sync
+    fresh = UsageTracker()
+    fresh.record(user.id, prompt_tokens=0, completion_tokens=0)
+    fresh.sync(session=db)
+    assert fresh.used(user.id) == (190, month_tokens)
+
+    db.delete(user)
+    db.commit()
+
+
+def test_first_check_loads_stored_usage(db: Session) -> None:
+    user = create_random_user(db)
+    today = datetime.now(timezone.utc).date()
+    db.add(LLMUsage(user_id=user.id, day=today, prompt_tokens=80, completion_tokens=20))
+    db.commit()
+
+    # A worker that started after the user's earlier requests
+    tracker = UsageTracker(daily_quota=100, db_engine=engine)
+    with pytest.raises(QuotaExceededError) as exc_info:
+        tracker.check(user.id)
+    assert exc_info.value.used == 100
+    with track_queries() as stats:
+        with pytest.raises(QuotaExceededError):
+            tracker.check(user.id)
+    assert stats.count == 0
+
+    db.delete(user)
+    db.commit()
+
+
+def test_model_router_records_usage_and_blocks_over_quota() -> None:
+    user_id = uuid.uuid4()
+    tracker = UsageTracker(daily_quota=100)
+    client = MagicMock()
+    client.chat.completions.create.return_value.usage.prompt_tokens = 70
+    client.chat.completions.create.return_value.usage.completion_tokens = 30
+
+    with patch("app.services.model_router.usage_tracker", tracker):
+        ModelRouter().complete(client, "urls", messages=[], user_id=user_id)
+        assert tracker.used(user_id) == (100, 100)
+        with pytest.raises(QuotaExceededError):
+            ModelRouter().complete(client, "urls", messages=[], user_id=user_id)
+    assert client.chat.completions.create.call_count == 1
+
+
+def test_compute_answer_degrades_over_quota() -> None:
+    user_id = uuid.uuid4()
+    tracker = UsageTracker(daily_quota=1)
+    tracker.record(user_id, prompt_tokens=1, completion_tokens=0)
+    fetched: list[str] = []
+
+    async def fake_fetch(url: str, **_: Any) -> dict[str, Any]:
+        fetched.append(url)
+        return {"title": "Yerba", "price": "4500", "store": "mercadolibre", "url": url}
+
+    async def run() -> list[str]:
+        async with httpx.AsyncClient() as http:
+            return await price_cache.compute_answer(
+                "yerba playadito", http=http, user_id=user_id
+            )
+
+    client = MagicMock()
+    with (
+        patch("app.services.model_router.usage_tracker", tracker),
+        patch("app.services.openai_helper.client", client),
+        patch("app.services.scraper.fetch_price_data", fake_fetch),
+    ):
+        messages = asyncio.run(run())
+
+    listing = "https://listado.mercadolibre.com.ar/yerba-playadito"
+    assert fetched == [listing]
+    assert messages == ["Yerba: $ 4.500 en Mercadolibre", listing]
+    client.chat.completions.create.assert_not_called()
+    assert asyncio.run(price_cache.cached_answer("yerba playadito")) is None
+    assert price_cache.url_cache.get("yerba playadito") is None
+
+
+def test_used_ignores_other_months() -> None:
+    user_id = uuid.uuid4()
+    tracker = UsageTracker()
+    with patch.object(llm_usage, "_today", return_value=date(2026, 9, 30)):
+        tracker.record(user_id, prompt_tokens=10, completion_tokens=0)
+    with patch.object(llm_usage, "_today", return_value=date(2026, 10, 1)):
+        tracker.record(user_id, prompt_tokens=1, completion_tokens=0)
+        assert tracker.used(user_id) == (1, 1)
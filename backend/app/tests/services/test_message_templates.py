@@ -0,0 +1,107 @@
+from typing import Any
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services import message_templates
+from app.services.message_templates import (
+    fill_template,
+    make_template,
+    split_fields,
+    template_key,
+)
+
+
+def _data(price: str, store: str = "mercadolibre", **extra: Any) -> dict[str, Any]:
+    return {
+        "title": "Consola PS5",
+        "price": price,
+        "currency": "ARS",
+        "store": store,
+        "url": f"https://{store}.com/ps5",
+        **extra,
+    }
+
+
+def test_split_fields_abstracts_volatile_values() -> None:
+    shape, volatile = split_fields(
+        {"best": {"price": "$ 999.999", "shipping": "gratis", "store": "fravega"}}
+    )
+
+    assert shape == {
+        "best": {"price": "<volatile>", "shipping": "gratis", "store": "<volatile>"}
+    }
+    assert volatile == {"best.price": "$ 999.999", "best.store": "fravega"}
+    other_price = {"best": {"price": "$ 1", "shipping": "gratis", "store": "oscar"}}
+    assert template_key("PS5", shape) == template_key(
+        "la ps5", split_fields(other_price)[0]
+    )
+
+
+def test_template_round_trip_keeps_rendering() -> None:
+    _, volatile = split_fields(_data("999999"))
+    lines, forms, pinned = make_template(
+        ["Consola PS5 a $ 999.999 en Mercadolibre", "Stock: 9999990 unidades"],
+        volatile,
+    )
+
+    assert lines == ["{{title}} a {{price}} en {{store}}", "Stock: 9999990 unidades"]
+    assert forms == {"title": "Consola PS5", "price": "ars", "store": "Mercadolibre"}
+    assert pinned == {}
+
+    _, current = split_fields(_data("1049999.50", store="fravega"))
+    assert fill_template(lines, forms, current) == [
+        "Consola PS5 a $ 1.050.000 en Fravega",
+        "Stock: 9999990 unidades",
+    ]
+
+
+def test_values_written_another_way_are_pinned() -> None:
+    _, volatile = split_fields(_data("999999"))
+    _, forms, pinned = make_template(["Sale un palo en Mercado Libre"], volatile)
+
+    assert forms == {}
+    assert pinned == {"price": "999999", "store": "mercadolibre"}
+
+
+def test_format_price_msg_reuses_template_until_cap() -> None:
+    product = "ps5 template"
+    with (
+        patch(
+            "app.services.openai_helper.format_price_msg",
+            side_effect=lambda _, data, **__: [
+                f"PS5 a {data['price']} en MercadoLibre"
+            ],
+        ) as format_mock,
+        patch.object(settings, "FORMAT_TEMPLATE_MAX_REUSES", 2),
+    ):
+        first = message_templates.format_price_msg(product, _data("999999"))
+        second = message_templates.format_price_msg(product, _data("949999"))
+        third = message_templates.format_price_msg(product, _data("899999"))
+        assert format_mock.call_count == 1
+        # Reuse cap reached, the template is regenerated
+        message_templates.format_price_msg(product, _data("849999"))
+        assert format_mock.call_count == 2
+        # A different structure never shares a template
+        message_templates.format_price_msg(
+            product, _data("849999", installments="12 cuotas")
+        )
+        assert format_mock.call_count == 3
+
+    assert first == ["PS5 a 999999 en MercadoLibre"]
+    assert second == ["PS5 a 949999 en MercadoLibre"]
+    assert third == ["PS5 a 899999 en MercadoLibre"]
+    message_templates.template_cache.clear()
+
+
+def test_format_price_msg_regenerates_when_pinned_value_changes() -> None:
+    product = "ps5 pinned"
+    with patch(
+        "app.services.openai_helper.format_price_msg",
+        return_value=["PS5 a un palo en Mercado Libre"],
+    ) as format_mock:
+        message_templates.format_price_msg(product, _data("999999"))
+        message_templates.format_price_msg(product, _data("999999"))
+        assert format_mock.call_count == 1
+        message_templates.format_price_msg(product, _data("949999"))
+        assert format_mock.call_count == 2
+    message_templates.template_cache.clear()
@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock, patch
+
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services.model_router import (
+    ModelRouter,
+    Tier,
+    complexity_tier,
+    model_router,
+)
+
+
+def _rate_limited() -> openai.RateLimitError:
+    response = MagicMock(status_code=429, headers={})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_complete_uses_route_settings() -> None:
+    client = MagicMock()
+    router = ModelRouter()
+
+    with (
+        patch.object(settings, "OPENAI_URL_MODEL", "url-model"),
+        patch.object(settings, "OPENAI_URL_TIMEOUT_SECONDS", 3.0),
+        patch.object(settings, "OPENAI_URL_MAX_TOKENS", 64),
+    ):
+        router.complete(client, "urls", messages=[])
+
+    kwargs = client.chat.completions.create.call_args.kwargs
+    assert (kwargs["model"], kwargs["timeout"], kwargs["max_tokens"]) == (
+        "url-model",
+        3.0,
+        64,
+    )
+    report = router.latency_report()
+    assert report["url-model"]["calls"] == 1
+    assert report["url-model"]["failures"] == 0
+
+
+def test_complete_falls_back_down_the_chain() -> None:
+    client = MagicMock()
+    ok = MagicMock()
+    client.chat.completions.create.side_effect = [_rate_limited(), ok]
+    router = ModelRouter()
+
+    with (
+        patch.object(settings, "OPENAI_FORMAT_MODEL", "primary"),
+        patch.object(settings, "OPENAI_FORMAT_FALLBACK_MODELS", ["backup"]),
+    ):
+        assert router.complete(client, "format", messages=[]) is ok
+
+    models = [c.kwargs["model"] for c in client.chat.completions.create.call_args_list]
+    assert models == ["primary", "backup"]
+    assert router.latency_report()["primary"]["failures"] == 1
+
+
+def test_complete_raises_when_every_model_fails() -> None:
+    client = MagicMock()
+    client.chat.completions.create.side_effect = _rate_limited()
+
+    with (
+        patch.object(settings, "OPENAI_SUMMARY_FALLBACK_MODELS", ["backup"]),
+        pytest.raises(openai.RateLimitError),
+    ):
+        ModelRouter().complete(client, "summary", messages=[])
+    assert client.chat.completions.create.call_count == 2
+
+
+def test_complexity_tier() -> None:
+    with patch.object(settings, "OPENAI_COMPLEXITY_ROUTING", True):
+        assert complexity_tier("ps5") is Tier.FAST
+        assert complexity_tier("ps5 vs xbox series x") is Tier.STRONG
+        assert complexity_tier("ps5", items=3) is Tier.STRONG
+        assert (
+            complexity_tier("notebook lenovo ideapad 3 con 16 gb de ram")
+            is Tier.DEFAULT
+        )
+    assert complexity_tier("ps5") is Tier.DEFAULT
+
+
+def test_models_for_puts_tier_model_first() -> None:
+    router = ModelRouter()
+    with (
+        patch.object(settings, "OPENAI_URL_MODEL", "default"),
+        patch.object(settings, "OPENAI_URL_FALLBACK_MODELS", ["backup", "fast"]),
+        patch.object(settings, "OPENAI_FAST_MODEL", "fast"),
+    ):
+        assert router.models_for("urls", Tier.FAST) == ["fast", "default", "backup"]
+        assert router.models_for("urls") == ["default", "backup", "fast"]
+
+
+def test_model_latency_endpoint(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    with patch.object(settings, "OPENAI_URL_MODEL", "latency-model"):
+        model_router.complete(MagicMock(), "urls", messages=[])
+    url = f"{settings.API_V1_STR}/utils/model-latency/"
+
+    r = client.get(url, headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.json()["latency-model"]["calls"] >= 1
+    r = client.get(url, headers=normal_user_token_headers)
+    assert r.status_code == 403
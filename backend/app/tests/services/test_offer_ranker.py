@@ -0,0 +1,117 @@
+from typing import Any
+
+import numpy as np
+
+from app.services.offer_ranker import (
+    RankingWeights,
+    format_ars,
+    parse_prices,
+    rank_offers,
+)
+
+
+def test_parse_prices_formats() -> None:
+    cents, is_usd, valid = parse_prices(
+        [
+            "$ 1.299.999,00",
+            "1,299.99",
+            "US$ 899",
+            "U$S 1.000",
+            "999999",
+            999999.5,
+            "ARS 3.999,9",
+            "Gratis",
+            None,
+        ]
+    )
+    assert cents.tolist() == [
+        129999900,
+        129999,
+        89900,
+        100000,
+        99999900,
+        99999950,
+        399990,
+        0,
+        0,
+    ]
+    assert is_usd.tolist() == [False, False, True, True] + [False] * 5
+    assert valid.tolist() == [True] * 7 + [False, False]
+
+
+def test_parse_prices_usd_is_a_token_of_its_own() -> None:
+    _, is_usd, _ = parse_prices(
+        [
+            "Usado $ 150.000",
+            "Notebook Asus $ 899.999",
+            "$ 12.999 incluye USB",
+            "USD899",
+            "usd 10",
+            "Precio: u$s 1.200",
+            "USDT 5",
+            "150.000 US",
+        ]
+    )
+    assert is_usd.tolist() == [False, False, False, True, True, True, False, False]
+
+
+def test_parse_prices_empty() -> None:
+    cents, is_usd, valid = parse_prices([])
+    assert cents.size == is_usd.size == valid.size == 0
+
+
+def test_format_ars() -> None:
+    assert format_ars(129999900) == "$ 1.299.999"
+    assert format_ars(99) == "$ 1"
+
+
+def test_rank_offers_uses_effective_total() -> None:
+    offers: list[dict[str, Any]] = [
+        # Cheapest sticker price but expensive shipping and financing
+        {
+            "store": "a",
+            "price": "$ 900.000",
+            "shipping": "$ 50.000",
+            "installments": 12,
+            "installment_price": "$ 100.000",
+        },
+        {
+            "store": "b",
+            "price": "$ 1.000.000,00",
+            "shipping": "Gratis",
+            "installments": 6,
+            "installment_price": "$ 166.666,67",
+        },
+        {"store": "c", "price": "US$ 1.000", "shipping": "$ 10.000"},
+        {"store": "d", "price": "sin stock"},
+    ]
+    data = rank_offers("ps5", offers, k=5, usd_rate=1000)
+
+    assert data["offers"] == 4
+    assert data["best"]["store"] == "b"
+    assert data["best"]["shipping"] == "gratis"
+    assert data["best"]["installments"] == "6 cuotas sin interés"
+    assert [o["store"] for o in data["alternatives"]] == ["c", "a"]
+    assert data["alternatives"][1]["total"] == "$ 1.250.000"
+
+
+def test_rank_offers_weights() -> None:
+    offers = [
+        {"store": "cheap", "price": "100", "seller_reputation": 0.1},
+        {"store": "trusted", "price": "110", "seller_reputation": 1.0},
+    ]
+    assert rank_offers("x", offers)["best"]["store"] == "cheap"
+    weights = RankingWeights(cost=0.1, reputation=0.9)
+    assert rank_offers("x", offers, weights=weights)["best"]["store"] == "trusted"
+
+
+def test_rank_offers_without_valid_prices() -> None:
+    data = rank_offers("x", [{"price": "consultar"}])
+    assert data["best"] is None
+    assert rank_offers("x", [])["offers"] == 0
+
+
+def test_parse_prices_is_vectorized_over_many_offers() -> None:
+    values = [f"$ {i:,}".replace(",", ".") for i in range(10_000)]
+    cents, _, _ = parse_prices(values)
+    assert np.array_equal(cents, np.arange(10_000) * 100)
@@ -1,6 +1,17 @@
 from unittest.mock import MagicMock, patch
 
-from app.services.openai_helper import format_price_msg, get_price_url
+import pytest
+
+from app.core.config import settings
+from app.services.conversation_store import Turn
+from app.services.openai_helper import (
+    EmptyReplyError,
+    PriceReply,
+    format_price_msg,
+    get_price_url,
+    get_price_urls,
+    parse_price_reply,
+)
 
 
 def test_get_price_url_returns_stripped_url() -> None:
@@ -19,6 +30,16 @@ def test_get_price_url_returns_stripped_url() -> None:
     client_mock.chat.completions.create.assert_called_once()
 
 
+def test_get_price_url_without_content() -> None:
+    mock_choice = MagicMock()
+    mock_choice.message.content = None
+    client_mock = MagicMock()
+    client_mock.chat.completions.create.return_value.choices = [mock_choice]
+
+    with patch("app.services.openai_helper.client", client_mock):
+        assert get_price_url("PlayStation") == ""
+
+
 def test_format_price_msg_splits_lines() -> None:
     message = "Precio: 100\nRecomendado.\n"
     mock_resp = MagicMock()
@@ -28,8 +49,133 @@ def test_format_price_msg_splits_lines() -> None:
     client_mock = MagicMock()
     client_mock.chat.completions.create.return_value = mock_resp
 
-    with patch("app.services.openai_helper.client", client_mock):
+    with (
+        patch("app.services.openai_helper.client", client_mock),
+        patch.object(settings, "OPENAI_STRUCTURED_OUTPUT", False),
+    ):
         result = format_price_msg("PlayStation", {"price": 100})
 
     assert result == ["Precio: 100", "Recomendado."]
     client_mock.chat.completions.create.assert_called_once()
+
+
+def test_get_price_url_sends_history_before_prompt() -> None:
+    mock_resp = MagicMock()
+    mock_choice = MagicMock()
+    mock_choice.message.content = "https://example.com/fravega"
+    mock_resp.choices = [mock_choice]
+    client_mock = MagicMock()
+    client_mock.chat.completions.create.return_value = mock_resp
+    history = [
+        Turn("user", "precio de ps5", 0.0),
+        Turn("assistant", "$ 999.999 en MercadoLibre", 1.0),
+    ]
+
+    with patch("app.services.openai_helper.client", client_mock):
+        get_price_url("ps5 en Frávega", history=history)
+
+    messages = client_mock.chat.completions.create.call_args.kwargs["messages"]
+    assert [m["content"] for m in messages[:2]] == [
+        "precio de ps5",
+        "$ 999.999 en MercadoLibre",
+    ]
+    assert messages[-1]["role"] == "user"
+    assert "ps5 en Frávega" in messages[-1]["content"]
+
+
+def test_get_price_urls_parses_and_dedupes_candidates() -> None:
+    mock_resp = MagicMock()
+    mock_choice = MagicMock()
+    mock_choice.message.content = (
+        "1. https://www.fravega.com/p/ps5\n"
+        "2. https://articulo.mercadolibre.com.ar/MLA-1-ps5.\n"
+        "https://www.fravega.com/p/ps5\n"
+        "- <https://www.garbarino.com/ps5>\n"
+    )
+    mock_resp.choices = [mock_choice]
+    client_mock = MagicMock()
+    client_mock.chat.completions.create.return_value = mock_resp
+
+    with patch("app.services.openai_helper.client", client_mock):
+        urls = get_price_urls("PlayStation", k=3)
+
+    assert urls == [
+        "https://www.fravega.com/p/ps5",
+        "https://articulo.mercadolibre.com.ar/MLA-1-ps5",
+        "https://www.garbarino.com/ps5",
+    ]
+
+
+def _tool_call_response(arguments: str) -> MagicMock:
+    call = MagicMock()
+    call.type = "function"
+    call.function.name = "price_reply"
+    call.function.arguments = arguments
+    mock_resp = MagicMock()
+    mock_choice = MagicMock()
+    mock_choice.message.tool_calls = [call]
+    mock_choice.message.content = None
+    mock_resp.choices = [mock_choice]
+    return mock_resp
+
+
+def test_format_price_msg_uses_structured_reply() -> None:
+    client_mock = MagicMock()
+    client_mock.chat.completions.create.return_value = _tool_call_response(
+        '{"price_msg": "PS5: $ 999.999 en Frávega\\n", "recommendation": " Conviene."}'
+    )
+
+    with patch("app.services.openai_helper.client", client_mock):
+        result = format_price_msg("PlayStation", {"price": "999999"})
+
+    assert result == ["PS5: $ 999.999 en Frávega", "Conviene."]
+    kwargs = client_mock.chat.completions.create.call_args.kwargs
+    assert kwargs["tool_choice"]["function"]["name"] == "price_reply"
+    assert kwargs["max_tokens"] == settings.OPENAI_FORMAT_MAX_TOKENS
+    assert kwargs["messages"][0]["role"] == "system"
+
+
+def test_parse_price_reply_rejects_invalid_arguments() -> None:
+    message = _tool_call_response("{not json").choices[0].message
+    assert parse_price_reply(message) is None
+
+    message = _tool_call_response('{"price_msg": "PS5: $ 1"}').choices[0].message
+    assert parse_price_reply(message) == PriceReply("PS5: $ 1", "")
+
+
+def _text_response(content: str | None) -> MagicMock:
+    mock_resp = MagicMock()
+    mock_choice = MagicMock()
+    mock_choice.message.tool_calls = None
+    mock_choice.message.content = content
+    mock_resp.choices = [mock_choice]
+    return mock_resp
+
+
+def test_format_price_msg_retries_as_text_without_tool_call() -> None:
+    client_mock = MagicMock()
+    client_mock.chat.completions.create.side_effect = [
+        _tool_call_response("{not json"),
+        _text_response("PS5: $ 999.999\n"),
+    ]
+
+    with patch("app.services.openai_helper.client", client_mock):
+        result = format_price_msg("PlayStation", {"price": "999999"})
+
+    assert result == ["PS5: $ 999.999"]
+    retry = client_mock.chat.completions.create.call_args.kwargs
+    assert "tools" not in retry
+
+
+def test_format_price_msg_raises_on_empty_reply() -> None:
+    client_mock = MagicMock()
+    client_mock.chat.completions.create.side_effect = [
+        _text_response(None),
+        _text_response(" \n"),
+    ]
+
+    with (
+        patch("app.services.openai_helper.client", client_mock),
+        pytest.raises(EmptyReplyError),
+    ):
+        format_price_msg("PlayStation", {"price": "999999"})
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+from app.services import price_cache, scraper
+
+LISTING = "https://listado.mercadolibre.com.ar/auriculares-jbl"
+
+
+def _compute(product: str) -> list[str]:
+    async def run() -> list[str]:
+        async with httpx.AsyncClient() as http:
+            return await price_cache.compute_answer(product, http=http)
+
+    return asyncio.run(run())
+
+
+def _slow_urls(urls: list[str]) -> Any:
+    def get_price_urls(*_: Any, **__: Any) -> list[str]:
+        time.sleep(0.05)
+        return urls
+
+    return get_price_urls
+
+
+def test_predict_urls() -> None:
+    assert price_cache.predict_urls("los Auriculares JBL") == [LISTING]
+
+
+def test_speculative_scrape_is_used_when_llm_agrees() -> None:
+    fetched: list[str] = []
+
+    async def fake_fetch(url: str, **_: Any) -> dict[str, Any]:
+        fetched.append(url)
+        return {"title": "Auriculares JBL Tune 520", "price": "50000", "url": url}
+
+    before = price_cache.speculation_stats.hits
+    saved = price_cache.speculation_stats.saved_seconds
+    with (
+        patch.object(settings, "PRICE_SPECULATIVE_SCRAPING", True),
+        patch(
+            "app.services.openai_helper.get_price_urls",
+            _slow_urls(["https://articulo.mercadolibre.com.ar/MLA-1-jbl"]),
+        ),
+        patch.object(scraper, "fetch_price_data", fake_fetch),
+        patch(
+            "app.services.openai_helper.format_price_msg", return_value=["JBL"]
+        ) as format_mock,
+    ):
+        assert _compute("auriculares jbl") == ["JBL"]
+
+    assert fetched == [LISTING]
+    assert format_mock.call_args.args[1]["url"] == LISTING
+    assert price_cache.speculation_stats.hits == before + 1
+    assert price_cache.speculation_stats.saved_seconds > saved
+    price_cache.url_cache.delete("auriculares jbl")
+    price_cache.answer_cache.delete("auriculares jbl")
+
+
+def test_speculative_scrape_is_cancelled_when_llm_disagrees() -> None:
+    cancelled: list[str] = []
+
+    async def fake_fetch(url: str, **_: Any) -> dict[str, Any]:
+        if url == LISTING:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+        return {"price": "60000", "url": url}
+
+    misses = price_cache.speculation_stats.misses
+    with (
+        patch.object(settings, "PRICE_SPECULATIVE_SCRAPING", True),
+        patch(
+            "app.services.openai_helper.get_price_urls",
+            _slow_urls(["https://www.fravega.com/p/jbl"]),
+        ),
+        patch.object(scraper, "fetch_price_data", fake_fetch),
+        patch(
+            "app.services.openai_helper.format_price_msg", return_value=["JBL"]
+        ) as format_mock,
+    ):
+        assert _compute("auriculares jbl") == ["JBL"]
+
+    assert cancelled == [LISTING]
+    assert format_mock.call_args.args[1]["url"] == "https://www.fravega.com/p/jbl"
+    assert price_cache.speculation_stats.misses == misses + 1
+    price_cache.url_cache.delete("auriculares jbl")
+    price_cache.answer_cache.delete("auriculares jbl")
+
+
+def _offer(title: str, price: str, url: str) -> dict[str, Any]:
+    return {"title": title, "price": price, "store": "mercadolibre", "url": url}
+
+
+def test_rank_listing_ranks_the_offers_of_the_product() -> None:
+    offers = [
+        _offer("Funda para auriculares JBL", "5000", "https://x/funda"),
+        _offer("Auriculares JBL Tune 520", "60000", "https://x/520"),
+        _offer("Auriculares JBL Tune 720", "50000", "https://x/720"),
+    ]
+    data = {**offers[0], "url": LISTING, "offers": offers}
+
+    ranked = price_cache.rank_listing("auriculares jbl", data)
+
+    assert ranked["url"] == "https://x/720"
+    assert ranked["best"]["price"] == "$ 50.000"
+    assert [o["url"] for o in ranked["alternatives"]] == ["https://x/520"]
+
+
+def test_rank_listing_keeps_single_products() -> None:
+    data = _offer("Auriculares JBL", "60000", LISTING)
+    assert price_cache.rank_listing("auriculares jbl", data) == data
+
+    offers = [
+        _offer("Funda JBL", "5000", "https://x/funda"),
+        _offer("Auriculares JBL Tune 520", "60000", "https://x/520"),
+    ]
+    data = {**offers[0], "url": LISTING, "offers": offers}
+    assert price_cache.rank_listing("auriculares jbl", data) == offers[1]
+
+
+def test_matches_product() -> None:
+    assert price_cache.matches_product("ps5", "Consola Sony PS5 Slim")
+    assert not price_cache.matches_product("ps5", "Funda para PS5")
+    assert not price_cache.matches_product("ps5 slim", "Consola PS5")
+    assert not price_cache.matches_product("ps5", None)
+
+
+def test_speculative_scrape_of_another_listing_is_not_used() -> None:
+    article = "https://articulo.mercadolibre.com.ar/MLA-1-jbl"
+
+    async def fake_fetch(url: str, **_: Any) -> dict[str, Any]:
+        title = "Funda para auriculares JBL" if url == LISTING else "Auriculares JBL"
+        return {"title": title, "price": "5000", "url": url}
+
+    misses = price_cache.speculation_stats.misses
+    with (
+        patch.object(settings, "PRICE_SPECULATIVE_SCRAPING", True),
+        patch("app.services.openai_helper.get_price_urls", _slow_urls([article])),
+        patch.object(scraper, "fetch_price_data", fake_fetch),
+        patch(
+            "app.services.openai_helper.format_price_msg", return_value=["JBL"]
+        ) as format_mock,
+    ):
+        assert _compute("auriculares jbl") == ["JBL"]
+
+    # Same retailer, but the listing led with an accessory
+    assert format_mock.call_args.args[1]["url"] == article
+    assert price_cache.speculation_stats.misses == misses + 1
+    price_cache.url_cache.delete("auriculares jbl")
+    price_cache.answer_cache.delete("auriculares jbl")
@@ -0,0 +1,124 @@
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+from app.services import product_pipeline
+from app.services.product_pipeline import split_products, stream_replies
+
+
+def test_split_products() -> None:
+    assert split_products("precio de ps5, xbox series x y nintendo switch") == [
+        "ps5",
+        "xbox series x",
+        "nintendo switch",
+    ]
+    assert split_products("cuánto sale la PS5?; ps5") == ["ps5"]
+    assert split_products("hola! heladera y gracias") == ["heladera"]
+    assert split_products("notebook 14/16 gb") == ["notebook 14 16 gb"]
+
+
+def test_split_products_drops_parts_without_a_product() -> None:
+    assert split_products("Quiero saber el precio") == []
+    assert split_products("precios?") == []
+    assert split_products("precios? ps5 y el mejor precio") == ["ps5"]
+
+
+def _run(message: str, **kwargs: Any) -> list[list[str]]:
+    async def collect() -> list[list[str]]:
+        return [batch async for batch in stream_replies(message, **kwargs)]
+
+    return asyncio.run(collect())
+
+
+def test_stream_replies_sends_partial_results_at_deadline() -> None:
+    delays = {"ps5": 0.0, "xbox series x": 0.3, "nintendo switch": 0.0}
+
+    async def fake_answer(product: str, **_: Any) -> list[str]:
+        await asyncio.sleep(delays[product])
+        return [f"{product}: $ 1"]
+
+    with patch.object(product_pipeline, "answer_product", fake_answer):
+        batches = _run(
+            "precio de ps5, xbox series x y nintendo switch",
+            deadline=0.1,
+            timeout=5,
+        )
+
+    assert batches[0] == [
+        "ps5: $ 1",
+        "Sigo buscando el precio de xbox series x, te aviso apenas lo tenga.",
+        "nintendo switch: $ 1",
+    ]
+    assert batches[1:] == [["xbox series x: $ 1"]]
+
+
+def test_stream_replies_respects_fanout_limit() -> None:
+    running = 0
+    peak = 0
+
+    async def fake_answer(product: str, **_: Any) -> list[str]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return [product]
+
+    with patch.object(product_pipeline, "answer_product", fake_answer):
+        batches = _run("ps5, ps4, xbox, iphone, notebook", fanout=2, deadline=5)
+
+    assert batches == [["ps5", "ps4", "xbox", "iphone", "notebook"]]
+    assert peak == 2
+
+
+def test_stream_replies_gives_up_after_timeout() -> None:
+    async def fake_answer(product: str, **_: Any) -> list[str]:
+        await asyncio.sleep(0 if product == "ps5" else 10)
+        return [product]
+
+    with patch.object(product_pipeline, "answer_product", fake_answer):
+        batches = _run("ps5 y heladera", deadline=0.05, timeout=0.1)
+
+    assert batches[0][0] == "ps5"
+    assert batches[-1] == ["No encontré a tiempo el precio de heladera."]
+
+
+def test_stream_replies_cancels_pending_when_closed_at_first_batch() -> None:
+    cancelled: list[str] = []
+
+    async def fake_answer(product: str, **_: Any) -> list[str]:
+        try:
+            await asyncio.sleep(0 if product == "ps5" else 10)
+        except asyncio.CancelledError:
+            cancelled.append(product)
+            raise
+        return [product]
+
+    async def close_after_first() -> list[str]:
+        replies = stream_replies("ps5 y heladera", deadline=0.05, timeout=5)
+        first = await anext(replies)
+        await replies.aclose()
+        # Let the cancelled task run its handler, before asyncio.run would
+        # cancel it on its own
+        await asyncio.sleep(0)
+        assert cancelled == ["heladera"]
+        return first
+
+    with patch.object(product_pipeline, "answer_product", fake_answer):
+        assert asyncio.run(close_after_first())[0] == "ps5"
+
+
+def test_answer_product_reports_missing_price() -> None:
+    async def no_data(*_: Any, **__: Any) -> None:
+        return None
+
+    with (
+        patch(
+            "app.services.openai_helper.get_price_urls",
+            return_value=["https://example.com"],
+        ),
+        patch("app.services.scraper.fetch_price_data", no_data),
+    ):
+        batches = _run("ps5")
+
+    assert batches == [["No encontré el precio de ps5."]]
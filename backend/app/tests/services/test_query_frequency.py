@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session, col, delete
+
+from app.models import ProductQueryStat
+from app.services.query_frequency import (
+    QueryFrequencyTracker,
+    canonical_product,
+    flush_queries,
+    query_tracker,
+)
+from app.tests.utils.utils import random_lower_string
+
+
+def test_canonical_product() -> None:
+    assert canonical_product("  la PS5 ") == "ps5"
+    assert canonical_product("Precio de la Heladera") == "precio heladera"
+
+
+def test_flush_accumulates_counts(db: Session) -> None:
+    tracker = QueryFrequencyTracker(half_life=3600)
+    product = random_lower_string()
+    for _ in range(3):
+        tracker.record(product)
+    assert tracker.flush(session=db) == 1
+    tracker.record(product)
+    tracker.flush(session=db)
+
+    stat = db.get(ProductQueryStat, product)
+    assert stat is not None
+    db.refresh(stat)
+    # A few ms of decay between the two flushes
+    assert 3.99 < stat.score <= 4
+    assert tracker.flush(session=db) == 0
+
+    db.exec(delete(ProductQueryStat).where(col(ProductQueryStat.product) == product))  # type: ignore
+    db.commit()
+
+
+def test_top_products_decays_old_queries(db: Session) -> None:
+    tracker = QueryFrequencyTracker(half_life=3600)
+    old, recent = random_lower_string(), random_lower_string()
+    now = datetime.now(timezone.utc)
+    # 10 queries two hours ago are worth 2.5 now, less than 3 fresh ones
+    db.add(ProductQueryStat(product=old, score=10, updated_at=now - timedelta(hours=2)))
+    db.add(ProductQueryStat(product=recent, score=3, updated_at=now))
+    db.commit()
+
+    top = tracker.top_products(session=db, limit=1000)
+    assert top.index(recent) < top.index(old)
+
+    db.exec(  # type: ignore
+        delete(ProductQueryStat).where(col(ProductQueryStat.product).in_([old, recent]))
+    )
+    db.commit()
+
+
+def test_flush_queries_writes_pending_counts(db: Session) -> None:
+    product = random_lower_string()
+    query_tracker.record(product)
+
+    flush_queries()
+
+    stat = db.get(ProductQueryStat, product)
+    assert stat is not None
+    assert stat.score == 1
+    db.exec(delete(ProductQueryStat).where(col(ProductQueryStat.product) == product))  # type: ignore
+    db.commit()
@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+
+from app.services import scraper
+from app.services.scraper import RetailerStats, extract_price_data, store_from_url
+
+URL = "https://articulo.mercadolibre.com.ar/MLA-123-consola-ps5"
+
+
+def test_extract_price_from_json_ld() -> None:
+    html = """
+    <html><head>
+    <script type="application/ld+json">
+    {"@context": "https://schema.org", "@type": "Product", "name": "Consola PS5",
+     "offers": {"@type": "Offer", "price": 999999, "priceCurrency": "ARS"}}
+    </script>
+    </head></html>
+    """
+    assert extract_price_data(html, URL) == {
+        "title": "Consola PS5",
+        "price": "999999",
+        "currency": "ARS",
+        "store": "mercadolibre",
+        "url": URL,
+    }
+
+
+def test_extract_price_keeps_every_offer_of_a_listing() -> None:
+    html = """
+    <script type="application/ld+json">
+    {"@type": "ItemList", "itemListElement": [
+      {"@type": "Product", "name": "Funda PS5", "url": "https://x.com/funda",
+       "offers": {"price": 9999}},
+      {"@type": "Product", "name": "Consola PS5",
+       "offers": {"price": 999999, "priceCurrency": "ARS"}}
+    ]}
+    </script>
+    """
+    data = extract_price_data(html, URL)
+    assert data is not None
+    assert data["title"] == "Funda PS5"
+    assert data["url"] == URL
+    assert [(o["title"], o["url"]) for o in data["offers"]] == [
+        ("Funda PS5", "https://x.com/funda"),
+        ("Consola PS5", URL),
+    ]
+
+
+def test_extract_price_from_meta_tags() -> None:
+    html = """
+    <html><head><title> Consola PS5 | Frávega </title>
+    <meta itemprop="price" content="1049999.00">
+    <meta itemprop="priceCurrency" content="ARS">
+    </head></html>
+    """
+    data = extract_price_data(html, "https://www.fravega.com/p/consola-ps5")
+    assert data is not None
+    assert data["price"] == "1049999.00"
+    assert data["title"] == "Consola PS5 | Frávega"
+    assert data["store"] == "fravega"
+
+
+def test_extract_price_returns_none_without_price() -> None:
+    assert extract_price_data("<html><title>404</title></html>", URL) is None
+
+
+def test_store_from_url() -> None:
+    assert store_from_url("https://www.fravega.com/p/x") == "fravega"
+    assert store_from_url(URL) == "mercadolibre"
+
+
+def test_retailer_stats_ranks_reliable_retailers_first() -> None:
+    stats = RetailerStats()
+    for ok in (True, True, True, False):
+        stats.record("https://www.fravega.com/p/a", ok=ok)
+    for ok in (False, False):
+        stats.record("https://www.garbarino.com/b", ok=ok)
+    urls = [
+        "https://www.garbarino.com/ps5",
+        "https://www.musimundo.com/ps5",
+        "https://www.fravega.com/p/ps5",
+    ]
+
+    assert stats.rank(urls) == [
+        "https://www.fravega.com/p/ps5",
+        "https://www.musimundo.com/ps5",
+        "https://www.garbarino.com/ps5",
+    ]
+    assert stats.success_rate(urls[2]) == 4 / 6
+
+
+def test_fetch_first_valid_cancels_slower_fetches() -> None:
+    cancelled: list[str] = []
+
+    async def fake_fetch(url: str, **_: Any) -> dict[str, Any] | None:
+        delay = {"https://a.com/x": 0.01, "https://b.com/x": 0.02}.get(url, 10)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return {"url": url} if url == "https://b.com/x" else None
+
+    async def run() -> dict[str, Any] | None:
+        async with httpx.AsyncClient() as http:
+            urls = ["https://a.com/x", "https://b.com/x", "https://c.com/x"]
+            return await scraper.fetch_first_valid(urls, client=http)
+
+    stats = RetailerStats()
+    with (
+        patch.object(scraper, "fetch_price_data", fake_fetch),
+        patch.object(scraper, "retailer_stats", stats),
+    ):
+        data = asyncio.run(run())
+
+    assert data == {"url": "https://b.com/x"}
+    assert cancelled == ["https://c.com/x"]
+    records = stats.snapshot()
+    assert (records["a"].attempts, records["a"].successes) == (1, 0)
+    assert (records["b"].attempts, records["b"].successes) == (1, 1)
+    assert "c" not in records
+
+
+def test_fetch_first_valid_returns_none_when_every_page_fails() -> None:
+    async def no_data(*_: Any, **__: Any) -> None:
+        return None
+
+    async def run() -> dict[str, Any] | None:
+        async with httpx.AsyncClient() as http:
+            return await scraper.fetch_first_valid(
+                ["https://a.com/x", "https://b.com/x"], client=http
+            )
+
+    with (
+        patch.object(scraper, "fetch_price_data", no_data),
+        patch.object(scraper, "retailer_stats", RetailerStats()),
+    ):
+        assert asyncio.run(run()) is None
@@ -0,0 +1,105 @@
+import asyncio
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import crud
+from app.core.config import settings
+from app.models import Item, ItemCreate, User, UserDeletion
+from app.services import user_deletion
+from app.services.user_deletion import purge_user, resume_deletions, start_deletion
+from app.tests.utils.user import create_random_user
+
+
+def test_start_deletion_deactivates_the_user(db: Session) -> None:
+    user = create_random_user(db)
+    crud.create_item(session=db, item_in=ItemCreate(title="x"), owner_id=user.id)
+    db_engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+
+    async def start() -> list[tuple[UserDeletion, bool]]:
+        async with AsyncSession(db_engine, expire_on_commit=False) as session:
+            db_user = await session.get(User, user.id)
+            assert db_user
+            first = await start_deletion(session, db_user)
+            return [first, await start_deletion(session, db_user)]
+
+    (first, created), (again, created_again) = asyncio.run(start())
+    assert (created, created_again) == (True, False)
+    assert first.items_total == 1
+    assert again.requested_at == first.requested_at
+    db.refresh(user)
+    assert user.is_active is False
+    # Kept until purged
+    assert db.get(Item, db.exec(select(Item.id).where(Item.owner_id == user.id)).one())
+
+
+def test_purge_user_in_batches(db: Session) -> None:
+    user = create_random_user(db)
+    user_id = user.id
+    for _ in range(5):
+        crud.create_item(session=db, item_in=ItemCreate(title="x"), owner_id=user_id)
+    db.add(UserDeletion(user_id=user_id, email=user.email, items_total=5))
+    db.commit()
+    db_engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+
+    asyncio.run(purge_user(user_id, db_engine=db_engine, batch_size=2, pause=0))
+
+    db.expire_all()
+    assert db.get(User, user_id) is None
+    deletion = db.get(UserDeletion, user_id)
+    assert deletion
+    assert deletion.items_deleted == 5
+    assert deletion.finished_at is not None
+
+
+def test_resume_deletions(db: Session) -> None:
+    user = create_random_user(db)
+    user_id = user.id
+    crud.create_item(session=db, item_in=ItemCreate(title="x"), owner_id=user_id)
+    db.add(UserDeletion(user_id=user_id, email=user.email, items_total=1))
+    db.commit()
+    db_engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+
+    asyncio.run(resume_deletions(db_engine))
+
+    db.expire_all()
+    assert db.get(User, user_id) is None
+    deletion = db.get(UserDeletion, user_id)
+    assert deletion
+    assert deletion.finished_at is not None
+
+
+def test_purge_user_runs_once_at_a_time(db: Session) -> None:
+    user = create_random_user(db)
+    user_id = user.id
+    crud.create_item(session=db, item_in=ItemCreate(title="x"), owner_id=user_id)
+    db.add(UserDeletion(user_id=user_id, email=user.email, items_total=1))
+    db.commit()
+    db_engine = create_async_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI), poolclass=NullPool
+    )
+    lock_id = user_deletion._lock_id(user_id)
+
+    async def purge_while_locked() -> None:
+        # As if another worker were purging the same user
+        async with db_engine.connect() as other_worker:
+            await other_worker.scalar(select(func.pg_advisory_lock(lock_id)))
+            await purge_user(user_id, db_engine=db_engine, pause=0)
+            await other_worker.scalar(select(func.pg_advisory_unlock(lock_id)))
+
+    asyncio.run(purge_while_locked())
+    db.expire_all()
+    assert db.get(User, user_id) is not None
+
+    asyncio.run(purge_user(user_id, db_engine=db_engine, pause=0))
+    db.expire_all()
+    assert db.get(User, user_id) is None